@@ -0,0 +1,129 @@
+"""Times the hot paths against a synthetic restaurant, writing the results as JSON.
+
+Run from the repository root with:
+python benchmarks/bench_hotpaths.py [--tables N] [--bookings M] [--staff K] [--output results.json]
+
+Passing --compare baseline.json reports how each timing changed against a
+stored run, and exits with status 1 if any got slower by more than the tolerance"""
+import os, sys, time, json, random, argparse, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data, service, util, tableshapes, generate
+from constants import *
+
+# In seconds, how long each sample should take at least. Quick functions
+# are run several times per sample, so timer noise doesn't swamp them
+SAMPLE_TIME = 0.02
+
+def sample(function, number):
+	start = time.perf_counter()
+	for i in range(number):
+		function()
+	return time.perf_counter() - start
+
+def best(function, repeat):
+	"""Gives the fastest time of a function over several samples, in seconds"""
+	number = 1
+	while sample(function, number) < SAMPLE_TIME:
+		number *= 2
+	return min(sample(function, number) for i in range(repeat)) / number
+
+def run(tables, bookings, staff, seed=1, repeat=5):
+	"""Generates a database in a temporary directory and times each hot path,
+	returning {name: seconds}"""
+	now = time.time()
+	results = {}
+	with tempfile.TemporaryDirectory() as directory:
+		generate.generate(os.path.join(directory, DATABASE), tables, bookings, staff, seed, now)
+		data.migrate()
+
+		results["data.load_members"] = best(data.load_members, repeat)
+		results["data.load_tables"] = best(data.load_tables, repeat)
+		results["data.load_bookings"] = best(data.load_bookings, repeat)
+		data.loads.rebuild(data.members, data.bookings)
+
+		# Typed names are prefixes of real names, with a few that match no one
+		rng = random.Random(seed)
+		names = [(member["first_name"] + " " + member["last_name"])[:rng.randint(1, 12)]
+			for member in rng.sample(list(data.members.values()), min(len(data.members), 200))]
+		names += ["zz", "Qx", ""]
+		results["util.find_by_name"] = best(lambda: [util.find_by_name(name) for name in names], repeat)
+
+		members = list(data.members.values())
+		results["util.unique_name"] = best(lambda: [util.unique_name(member) for member in members], repeat)
+
+		# The chairs' cache would otherwise make every run after the first free
+		layout = list(data.tables.values())
+		def chairs():
+			tableshapes.relative_chairs.cache_clear()
+			for table in layout:
+				list(tableshapes.generate_chairs(table))
+		results["tableshapes.generate_chairs"] = best(chairs, repeat)
+		results["tableshapes.max_chairs"] = best(lambda: [tableshapes.max_chairs(table) for table in layout], repeat)
+
+		# What FloorPlan.check_bookings asks of every table
+		results["check_bookings matching"] = best(lambda: [
+			service.due_booking(table_id, None, True, now) for table_id in data.tables], repeat)
+
+		# Which tables fit 6 people for 2 hours, at times through the next day
+		times = [now + rng.uniform(0, 86400) for i in range(100)]
+		results["service.free_tables"] = best(lambda: [
+			service.free_tables(6, arrival, 7200) for arrival in times], repeat) / len(times)
+
+		# FloorPlan.commit with every table moved, until the write is saved
+		data.writer.start()
+		def commit():
+			for table in layout:
+				data.mark_table(table, "x_pos", "y_pos")
+			data.flush_tables()
+			data.writer.flush()
+		results["FloorPlan.commit"] = best(commit, repeat)
+		data.cleanup_db()
+	return results
+
+def compare(results, baseline, tolerance):
+	"""Prints each timing against the baseline, returning the names of
+	those which are slower by more than the tolerance, as a fraction"""
+	regressions = []
+	for name, seconds in results.items():
+		before = baseline.get(name)
+		if not before:
+			print("{:<32}{:10.3f} ms        (new)".format(name, seconds * 1000))
+			continue
+
+		change = seconds / before - 1
+		slower = change > tolerance
+		if slower:
+			regressions.append(name)
+		print("{:<32}{:10.3f} ms {:+7.1%}{}".format(name, seconds * 1000, change, "  REGRESSION" if slower else ""))
+	return regressions
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Times the hot paths against a synthetic restaurant")
+	parser.add_argument("--tables", type=int, default=200)
+	parser.add_argument("--bookings", type=int, default=20000)
+	parser.add_argument("--staff", type=int, default=50)
+	parser.add_argument("--seed", type=int, default=1)
+	parser.add_argument("--repeat", type=int, default=5)
+	parser.add_argument("--output", help="file to write the results to, as JSON")
+	parser.add_argument("--compare", help="results file to compare against")
+	parser.add_argument("--tolerance", type=float, default=0.2,
+		help="fraction slower than the baseline counted as a regression")
+	args = parser.parse_args()
+
+	sizes = {"tables": args.tables, "bookings": args.bookings, "staff": args.staff, "seed": args.seed}
+	results = run(args.tables, args.bookings, args.staff, args.seed, args.repeat)
+
+	if args.output:
+		with open(args.output, "w") as output:
+			json.dump({"sizes": sizes, "results": results}, output, indent=4)
+
+	if args.compare:
+		with open(args.compare, "r") as stored:
+			baseline = json.load(stored)
+		if baseline["sizes"] != sizes:
+			print("Warning: the baseline was run with {}".format(baseline["sizes"]))
+		if compare(results, baseline["results"], args.tolerance):
+			sys.exit(1)
+	else:
+		for name, seconds in results.items():
+			print("{:<32}{:10.3f} ms".format(name, seconds * 1000))
@@ -0,0 +1,50 @@
+"""Compares the memory use and load time of booking dicts against records.
+
+Run from the repository root with: python benchmarks/bench_records.py [count]"""
+import os, sys, time, random, tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import records
+
+def make_rows(count):
+	"""Generates rows like those returned by BookingRepository.list"""
+	random.seed(1)
+	return [(i, "Customer {}".format(i), random.randint(1, 50), random.randint(1, 400),
+		1700000000 + i * 60, random.randint(0, 5), 0) for i in range(count)]
+
+def load_dicts(rows):
+	"""How data.load_bookings built its cache before records"""
+	return {row[0]: {
+		"booking_id": row[0],
+		"customer": row[1],
+		"member_id": row[2],
+		"table_id": row[3],
+		"arrival": row[4],
+		"status": row[5],
+		"ping": row[6]
+	} for row in rows}
+
+def load_records(rows):
+	return {row[0]: records.Booking(*row) for row in rows}
+
+def measure(load, rows):
+	"""Gives the time taken to load, and the memory the cache uses"""
+	tracemalloc.start()
+	start = time.perf_counter()
+	cache = load(rows)
+	elapsed = time.perf_counter() - start
+	size = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+
+	# Time again without tracing, which slows allocation down
+	start = time.perf_counter()
+	load(rows)
+	return min(elapsed, time.perf_counter() - start), size
+
+if __name__ == "__main__":
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	rows = make_rows(count)
+
+	print("{} bookings".format(count))
+	for name, load in (("dict", load_dicts), ("record", load_records)):
+		elapsed, size = measure(load, rows)
+		print("{:>7}: {:8.1f} ms {:8.1f} MiB".format(name, elapsed * 1000, size / 1048576))
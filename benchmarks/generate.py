@@ -0,0 +1,69 @@
+"""Writes a synthetic restaurant database for benchmarking.
+
+Run from the repository root with:
+python benchmarks/generate.py [path] [--tables N] [--bookings M] [--staff K] [--seed S]"""
+import os, sys, time, random, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import repository, data, tableshapes
+from constants import *
+
+FIRST_NAMES = ["Sam", "Samuel", "Samantha", "Alex", "Alexander", "Jo", "Joanna", "Chris",
+	"Christopher", "Pat", "Patricia", "Lee", "Morgan", "Robin", "Jamie", "Charlie"]
+LAST_NAMES = ["Smith", "Smithson", "Jones", "Johnson", "Brown", "Browne", "Taylor", "Wilson",
+	"Walker", "Wright", "Evans", "Evanson", "Thomas", "Roberts", "Robertson", "Hall"]
+
+def generate(path, tables=200, bookings=20000, staff=50, seed=1, now=None):
+	"""Writes a database at the path with the given number of each row,
+	the same every time for the same seed. Bookings arrive from half a day
+	before now to a day and a half after, so they are all loaded"""
+	if os.path.exists(path):
+		os.remove(path)
+	repository.DATABASE = path
+	data.migrate()
+
+	rng = random.Random(seed)
+	now = time.time() if now is None else now
+	connection = repository.connection()
+
+	# Tables are laid out in a grid, a few floors at a time
+	rows = []
+	for i in range(tables):
+		shape = rng.randrange(len(tableshapes.SHAPES))
+		table = {"width": rng.choice((60, 100, 160, 240)), "height": rng.choice((60, 100, 160)), "shape": shape}
+		rows.append((str(i + 1), min(rng.randint(2, 10), tableshapes.max_chairs(table)),
+			(i % 20) * 300, (i // 20 % 10) * 260, table["width"], table["height"], shape,
+			DEFAULT_FLOOR if i < 200 else "Floor {}".format(i // 200 + 1)))
+	connection.executemany("INSERT INTO layout_table " \
+		"(table_number, capacity, x_pos, y_pos, width, height, shape, floor) " \
+		"VALUES (?, ?, ?, ?, ?, ?, ?, ?);", rows)
+
+	connection.executemany("INSERT INTO staff " \
+		"(first_name, last_name, phone_number, present, permission, password, salt, kdf) " \
+		"VALUES (?, ?, ?, ?, ?, x'', x'', '');",
+		[(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), "07{:09d}".format(rng.randrange(10**9)),
+			rng.random() < 0.6, i == 0) for i in range(staff)])
+
+	connection.executemany("INSERT INTO booking " \
+		"(customer, member_id, table_id, arrival, status, ping, party_size) " \
+		"VALUES (?, ?, ?, ?, ?, ?, ?);",
+		[("{} {}".format(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)),
+			rng.randint(1, staff) if staff and rng.random() < 0.3 else None,
+			rng.randint(1, tables), int(now + rng.uniform(-43200, 129600)),
+			rng.choice((EMPTY,) * 6 + (ARRIVED, ORDERED, EATING, PAYING, COMPLETED)), rng.random() < 0.05,
+			rng.randint(1, 8))
+			for i in range(bookings if tables else 0)])
+
+	connection.commit()
+	repository.close()
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Writes a synthetic restaurant database")
+	parser.add_argument("path", nargs="?", default=DATABASE)
+	parser.add_argument("--tables", type=int, default=200)
+	parser.add_argument("--bookings", type=int, default=20000)
+	parser.add_argument("--staff", type=int, default=50)
+	parser.add_argument("--seed", type=int, default=1)
+	args = parser.parse_args()
+
+	generate(args.path, args.tables, args.bookings, args.staff, args.seed)
+	print("Wrote {} tables, {} bookings and {} staff to {}".format(args.tables, args.bookings, args.staff, args.path))
@@ -1,6 +1,34 @@
-import data, tkinter, tkinter.messagebox, datetime
+import data, service, metrics, virtuallist, sqlite3, tkinter, tkinter.ttk, tkinter.messagebox, datetime
 from constants import *
 
+def table_number(booking):
+	"""Gives the number of a booking's table, or nothing if it was deleted"""
+	table = data.tables.get(booking["table_id"])
+	return table["table_number"] if table else ""
+
+def booking_text(booking):
+	"""The text of a booking's row in the list of bookings"""
+	return "{}  {} x{}  (Table {})".format(
+		datetime.datetime.fromtimestamp(booking["arrival"]).strftime(TIME_FORMAT),
+		booking["customer"], booking["party_size"], table_number(booking))
+
+def table_choices():
+	"""Gives each table number's table ID, and the numbers in the order
+	they are listed. Numbered tables come first, in numeric order"""
+	table_ids = {table["table_number"]: id for id, table in data.tables.items()}
+	return table_ids, sorted(table_ids,
+		key=lambda number: (not number.isnumeric(), int(number) if number.isnumeric() else 0, number))
+
+# How many people new bookings are for, until changed
+DEFAULT_PARTY_SIZE = 2
+
+# Ways the list of bookings can be sorted
+BOOKING_SORTS = {
+	"Arrival":  lambda booking: booking["arrival"],
+	"Customer": lambda booking: booking["customer"].lower(),
+	"Table":    lambda booking: table_number(booking)
+}
+
 class BookingForm(tkinter.LabelFrame):
 	def __init__(self, master=None, text=None):
 		tkinter.LabelFrame.__init__(self, master, text=text)
@@ -14,41 +42,45 @@ class BookingForm(tkinter.LabelFrame):
 
 		tkinter.Label(self, text="Table").grid(row=1, sticky=E)
 		self.table = tkinter.StringVar(self)
-		self.table_menu = tkinter.OptionMenu(self, self.table, ())
+		self.table_menu = tkinter.ttk.Combobox(self, textvariable=self.table)
 		self.table_menu.grid(row=1, column=1, sticky=EW)
+		self.table_ids = {} # Table number -> table ID
 
 		tkinter.Label(self, text="Time").grid(row=2, sticky=E)
 		self.arrival = tkinter.Entry(self)
 		self.arrival.grid(row=2, column=1, sticky=EW)
 		tkinter.Label(self, text="YYYY-MM-DD HH:MM").grid(row=3, column=1, sticky=W)
 
-	def populate_tables(self):
-		"""Populates the menu of the table picker"""
-		self.table_menu["menu"].delete(0, END)
+		tkinter.Label(self, text="People").grid(row=4, sticky=E)
+		self.party_size = tkinter.Spinbox(self, from_=1, to=99)
+		self.party_size.grid(row=4, column=1, sticky=EW)
 
-		for id, table in data.tables.items():
-			table_number = table["table_number"]
+		tkinter.Label(self, text="Duration").grid(row=5, sticky=E)
+		self.duration = tkinter.Entry(self)
+		self.duration.grid(row=5, column=1, sticky=EW)
+		tkinter.Label(self, text="minutes").grid(row=5, column=2, sticky=W, padx=5)
 
-			self.table_menu["menu"].add_command(label=table_number,
-				command=lambda n=table_number: self.table.set(n))
+	def populate_tables(self):
+		"""Populates the menu of the table picker"""
+		self.table_ids, self.table_menu["values"] = table_choices()
 
 	def clear_fields(self):
 		self.customer.delete(0, END)
 		self.table.set("")
 		self.arrival.delete(0, END)
+		self.party_size.delete(0, END)
+		self.duration.delete(0, END)
 
 	def load_booking(self, booking):
 		self.customer.insert(0, booking["customer"])
 		self.table.set(data.tables[booking["table_id"]]["table_number"])
 		self.arrival.insert(0, datetime.datetime.fromtimestamp(booking["arrival"]).strftime(TIME_FORMAT))
+		self.party_size.insert(0, booking["party_size"])
+		self.duration.insert(0, booking["duration"] // 60)
 
 	def get_table_id(self):
 		"""Converts the string in the table selector to an ID"""
-		table_id = -1
-		for table in data.tables:
-			if data.tables[table]["table_number"] == self.table.get():
-				table_id = table
-				break
+		table_id = self.table_ids.get(self.table.get(), -1)
 
 		if table_id == -1:
 			tkinter.messagebox.showerror("Invalid details", "You must specify a table.")
@@ -57,18 +89,65 @@ class BookingForm(tkinter.LabelFrame):
 	def get_arrival(self):
 		"""Converts the string in the date input box to a timestamp"""
 		try:
-			arrival = datetime.datetime.strptime(self.arrival.get(), TIME_FORMAT)
-			if arrival <= datetime.datetime.now(): raise ValueError()
+			arrival = service.parse_arrival(self.arrival.get())
 		except ValueError:
 			tkinter.messagebox.showerror("Invalid details", "You must provide a valid future date and time, in the format YYYY-MM-DD HH:MM.")
 			return -1
 
-		# A booking in the morning is likely to be a mistake
-		if arrival.hour < 12:
+		if service.unusual_arrival(arrival):
 			if not tkinter.messagebox.askyesno("Are you sure?", "You have specified a time in the morning. Are you sure this is correct?"):
 				return -1
 
-		return arrival.timestamp()
+		return arrival
+
+	def get_party_size(self):
+		"""Converts the number of people to an integer, or -1 if it isn't one"""
+		try:
+			party_size = int(self.party_size.get())
+		except ValueError:
+			party_size = -1
+		if party_size < 1:
+			tkinter.messagebox.showerror("Invalid details", "You must give how many people the booking is for.")
+			return -1
+		return party_size
+
+	def get_duration(self):
+		"""Converts the duration in minutes to seconds, or -1 if it isn't valid"""
+		try:
+			duration = int(float(self.duration.get()) * 60)
+		except ValueError:
+			duration = -1
+		if duration <= 0:
+			tkinter.messagebox.showerror("Invalid details", "You must give how many minutes the booking is for.")
+			return -1
+		return duration
+
+	def check_table(self, booking, booking_id=None):
+		"""Checks the table is big enough and free for the whole booking,
+		otherwise suggests tables which are"""
+		problem = service.booking_problem(booking["table_id"], booking["party_size"],
+			booking["arrival"], booking["duration"], booking_id)
+		if problem is None:
+			return True
+
+		free = service.free_tables(booking["party_size"], booking["arrival"], booking["duration"], booking_id)
+		if free:
+			problem += "\n\nTables free then: " + ", ".join(table["table_number"] for table in free[:10])
+		else:
+			problem += "\n\nNo tables big enough are free then."
+		tkinter.messagebox.showerror("Table not available", problem)
+		return False
+
+	def get_booking(self, booking_id=None):
+		"""Reads the form, giving the booking's details,
+		or None if they are invalid or its table isn't free"""
+		booking = {"customer": self.customer.get()}
+		for field, get in (("table_id", self.get_table_id), ("arrival", self.get_arrival),
+				("party_size", self.get_party_size), ("duration", self.get_duration)):
+			booking[field] = get()
+			if booking[field] == -1: return None
+
+		return booking if self.check_table(booking, booking_id) else None
 
 class AddBooking(BookingForm):
 	def __init__(self, addcallback, master=None):
@@ -77,23 +156,25 @@ class AddBooking(BookingForm):
 		self.addcallback = addcallback
 
 		self.submit = tkinter.Button(self, text="Add", command=self.add)
-		self.submit.grid(row=3, columnspan=2, pady=5, sticky=E)
+		self.submit.grid(row=6, columnspan=2, pady=5, sticky=E)
 
 		tkinter.Button(self, text="Now", command=self.fill_time).grid(row=2, column=2, sticky=W, padx=5)
 
 	def fill_time(self):
-		"""Fills the time input with the current date and time"""
+		"""Fills the time input with the current date and time,
+		and the party size and duration with their defaults"""
 		self.arrival.delete(0, END)
 		self.arrival.insert(0, datetime.datetime.now().strftime(TIME_FORMAT))
 
+		self.party_size.delete(0, END)
+		self.party_size.insert(0, DEFAULT_PARTY_SIZE)
+		self.duration.delete(0, END)
+		self.duration.insert(0, DEFAULT_DURATION // 60)
+
 	def add(self):
 		"""Processes submitting the form"""
-		booking = {
-			"customer": self.customer.get(),
-			"table_id": self.get_table_id(),
-			"arrival": self.get_arrival()
-		}
-		if booking["table_id"] == -1 or booking["arrival"] == -1: return
+		booking = self.get_booking()
+		if booking is None: return
 
 		self.addcallback(booking)
 		self.clear_fields()
@@ -112,11 +193,19 @@ class EditBooking(BookingForm):
 		customer_var.trace("w", lambda a, b, c: self.set_modified())
 		self.customer["textvariable"] = customer_var
 
+		party_var = tkinter.StringVar(self)
+		party_var.trace("w", lambda a, b, c: self.set_modified())
+		self.party_size["textvariable"] = party_var
+
+		duration_var = tkinter.StringVar(self)
+		duration_var.trace("w", lambda a, b, c: self.set_modified())
+		self.duration["textvariable"] = duration_var
+
 		self.modifycallback = modifycallback
 		self.deletecallback = deletecallback
 
 		buttons = tkinter.Frame(self)
-		buttons.grid(row=3, columnspan=2, sticky=NSEW)
+		buttons.grid(row=6, columnspan=2, sticky=NSEW)
 
 		self.modify = tkinter.Button(buttons, text="Modify", command=self.modify)
 		self.modify.pack(side=RIGHT, pady=5)
@@ -131,15 +220,11 @@ class EditBooking(BookingForm):
 
 	def modify(self):
 		"""Processes modifying a booking (clicking the modify button)"""
-		table_id = self.get_table_id()
-		if table_id == -1: return
-
-		arrival = self.get_arrival()
-		if arrival == -1: return
+		booking = self.get_booking(self.booking["booking_id"])
+		if booking is None: return
 
-		self.booking["customer"] = self.customer.get()
-		self.booking["table_id"] = table_id
-		self.booking["arrival"] = arrival
+		for field, value in booking.items():
+			self.booking[field] = value
 
 		self.modifycallback(self.booking)
 		self.set_modified(False)
@@ -157,27 +242,99 @@ class EditBooking(BookingForm):
 				return False
 		self.clear_fields()
 		if booking: self.load_booking(booking)
+		self["text"] = "Edit Booking #{}".format(booking["booking_id"]) if booking else "Edit Booking"
 
 		self.booking = booking
 		self.set_modified(False)
 
 		return True
 
+class PastBookings(tkinter.LabelFrame):
+	"""Looks up bookings by number, or by table and day, including
+	those which have been archived and are no longer in the cache"""
+	def __init__(self, selectcallback, master=None):
+		tkinter.LabelFrame.__init__(self, master, text="Past Bookings")
+		self.selectcallback = selectcallback # Called with bookings still in the cache
+		self.columnconfigure(1, weight=1)
+
+		tkinter.Label(self, text="Number").grid(sticky=E)
+		self.booking_id = tkinter.Entry(self)
+		self.booking_id.grid(row=0, column=1, sticky=EW)
+		self.booking_id.bind("<Return>", lambda e: self.find())
+		tkinter.Button(self, text="Find", command=self.find).grid(row=0, column=2, sticky=EW, padx=5)
+
+		tkinter.Label(self, text="Table").grid(row=1, sticky=E)
+		self.table = tkinter.StringVar(self)
+		self.table_menu = tkinter.ttk.Combobox(self, textvariable=self.table)
+		self.table_menu.grid(row=1, column=1, sticky=EW)
+		self.table_ids = {} # Table number -> table ID
+
+		tkinter.Label(self, text="Day").grid(row=2, sticky=E)
+		self.day = tkinter.Entry(self)
+		self.day.grid(row=2, column=1, sticky=EW)
+		self.day.insert(0, datetime.date.today().strftime(DATE_FORMAT))
+		tkinter.Button(self, text="Show", command=self.show_day).grid(row=2, column=2, sticky=EW, padx=5)
+
+		self.results = tkinter.Listbox(self, height=5, exportselection=False, activestyle="none")
+		self.results.grid(row=3, columnspan=3, sticky=EW, pady=5)
+		self.results.bind("<<ListboxSelect>>", self.on_select)
+		self.found = [] # The bookings in the results, in order
+
+	def populate_tables(self):
+		self.table_ids, self.table_menu["values"] = table_choices()
+
+	def show(self, bookings):
+		self.found = bookings
+		self.results.delete(0, END)
+		self.results.insert(END, *("#{}  {}  {}".format(booking["booking_id"], booking_text(booking),
+			STATUSES[booking["status"]]) for booking in bookings))
+
+	def find(self):
+		"""Shows the booking with the number given"""
+		number = self.booking_id.get().strip().lstrip("#")
+		booking = data.find_booking(int(number)) if number.isnumeric() else None
+		if booking is None:
+			tkinter.messagebox.showerror("Booking not found", "There is no booking with that number.")
+			return
+
+		self.show([booking])
+		if booking["booking_id"] in data.bookings:
+			self.selectcallback(booking["booking_id"])
+
+	def show_day(self):
+		"""Shows the archived bookings at a table on the day given"""
+		table_id = self.table_ids.get(self.table.get())
+		if table_id is None:
+			tkinter.messagebox.showerror("Invalid details", "You must specify a table.")
+			return
+		try:
+			start = datetime.datetime.strptime(self.day.get(), DATE_FORMAT)
+		except ValueError:
+			tkinter.messagebox.showerror("Invalid details", "You must provide a valid date, in the format YYYY-MM-DD.")
+			return
+
+		end = start + datetime.timedelta(days=1)
+		self.show(data.booking_history(table_id, start.timestamp(), end.timestamp()))
+
+	def on_select(self, e=None):
+		"""Opens a booking in the edit form, if it is still in the cache"""
+		selection = self.results.curselection()
+		if selection and self.found[selection[0]]["booking_id"] in data.bookings:
+			self.selectcallback(self.found[selection[0]]["booking_id"])
+
 class BookingManager(tkinter.Frame):
-	def __init__(self, master=None):
+	def __init__(self, changecallback, master=None):
 		tkinter.Frame.__init__(self, master)
+		self.changecallback = changecallback
 
 		panes = tkinter.PanedWindow(self, sashwidth=5, sashrelief=RAISED, sashpad=5)
 		panes.grid(padx=5, pady=5, sticky=NSEW)
 
-		self.bookings = tkinter.Listbox(panes)
-		self.booking_ids = []
-
-		self.populate_list()
-		self.bookings.bind("<<ListboxSelect>>", self.select)
+		self.bookings = virtuallist.VirtualList(data.bookings, booking_text, BOOKING_SORTS, self.select, panes)
 		panes.add(self.bookings)
 
 		self.init_forms(panes)
+		self.populate_tables() # Also fills the list
 
 		self.rowconfigure(0, weight=1)
 		self.columnconfigure(0, weight=1)
@@ -186,48 +343,64 @@ class BookingManager(tkinter.Frame):
 	def populate_tables(self):
 		self.add_booking.populate_tables()
 		self.edit_booking.populate_tables()
+		self.past_bookings.populate_tables()
+		self.populate_list() # Table numbers may have changed
 
+	@metrics.timed("bookings.populate_list")
 	def populate_list(self):
 		"""Grabs bookings from the database cache and adds them to the list"""
-		self.bookings.delete(0, END)
-		self.booking_ids.clear()
-
-		for booking in data.bookings.values():
-			self.bookings.insert(END, booking["customer"])
-			self.booking_ids.append(booking["booking_id"])
+		self.bookings.load()
 
 	# Callbacks for different forms
 
 	def booking_added(self, booking):
 		"""Adds a new booking to the database"""
 		if booking:
-			data.cursor.execute(data.ADD_BOOKING, (booking["customer"], booking["table_id"], booking["arrival"]))
-			data.database.commit()
+			try: # Needs to wait for the new ID
+				booking = service.add_booking(booking["customer"], booking["table_id"], booking["arrival"],
+					booking["party_size"], booking["duration"])
+			except sqlite3.Error:
+				return # The main window reports the error
 
-			booking["booking_id"] = data.cursor.lastrowid
-			booking["status"] = EMPTY
-			data.bookings[booking["booking_id"]] = booking
-
-			self.populate_list()
+			self.bookings.insert(booking["booking_id"])
+			self.changecallback(booking)
 
 	def booking_modified(self, booking):
 		"""Updates the given booking with the new information"""
 		if booking:
-			data.cursor.execute(data.MODIFY_BOOKING, (booking["customer"], booking["table_id"], booking["arrival"], booking["booking_id"]))
-
-			data.database.commit()
-			self.populate_list()
+			service.modify_booking(booking)
+			self.bookings.update(booking["booking_id"])
+			self.changecallback(booking)
 
 	def booking_deleted(self, booking):
 		"""Removes a booking from the database"""
 		if booking:
-			data.cursor.execute(data.DELETE_BOOKING, (booking["booking_id"], ))
-			data.database.commit()
+			service.delete_booking(booking)
+			self.bookings.remove(booking["booking_id"])
+			self.changecallback(booking)
+			self.select(None)
 
-			del data.bookings[booking["booking_id"]]
-			self.populate_list()
+	def bookings_archived(self, booking_ids):
+		"""Removes bookings from the list once they have been archived"""
+		selected = self.bookings.selected
+		self.bookings.remove(*(id for id in booking_ids if id in self.bookings.key_of))
+
+		if selected is not None and self.bookings.selected is None:
+			self.edit_booking.booking = None # Nothing left to save
 			self.select(None)
 
+	def bookings_changed(self, booking_ids):
+		"""Updates the rows of bookings changed by another program"""
+		self.bookings.refresh(booking_ids)
+
+		booking = self.edit_booking.booking
+		if booking and booking["booking_id"] in booking_ids:
+			if booking["booking_id"] not in data.bookings:
+				self.edit_booking.booking = None # Nothing left to save
+				self.select(None)
+			elif not self.edit_booking.modified:
+				self.edit_booking.load(booking)
+
 	# End callbacks
 
 	def init_forms(self, panes):
@@ -237,19 +410,18 @@ class BookingManager(tkinter.Frame):
 
 		self.add_booking  = AddBooking(self.booking_added, forms)
 		self.edit_booking = EditBooking(self.booking_modified, self.booking_deleted, forms)
+		self.past_bookings = PastBookings(self.bookings.select, forms)
 
 		self.add_booking.grid(row=1, sticky=EW)
 		self.edit_booking.grid(row=2, sticky=EW)
+		self.past_bookings.grid(row=3, sticky=EW)
 
 		panes.add(forms)
 
-	def select(self, event=None):
+	def select(self, booking_id=None):
 		"""Shows and hides the edit booking form when necessary"""
-		booking = self.bookings.curselection()
-		if booking:
+		if booking_id is not None:
 			self.edit_booking.grid()
-
-			booking = data.bookings[self.booking_ids[booking[0]]]
-			self.edit_booking.load(booking)
+			self.edit_booking.load(data.bookings[booking_id])
 		else:
 			self.edit_booking.grid_remove()
@@ -0,0 +1,28 @@
+import data, sqlite3
+from constants import *
+
+class ChangeFeed:
+	"""Periodically picks up changes other programs sharing the database
+	have made, applying them to the caches and handing the IDs changed
+	to the callback as {entity: set of IDs}"""
+	def __init__(self, widget, callback):
+		self.widget = widget
+		self.callback = callback
+		self.timer = None
+
+	def start(self):
+		self.timer = self.widget.after(CHANGE_POLL_INTERVAL, self.poll)
+
+	def poll(self):
+		try:
+			changed = data.apply_changes()
+		except sqlite3.Error:
+			changed = {} # Try again next time, the database was probably busy
+		if changed:
+			self.callback(changed)
+		self.timer = self.widget.after(CHANGE_POLL_INTERVAL, self.poll)
+
+	def stop(self):
+		if self.timer:
+			self.widget.after_cancel(self.timer)
+			self.timer = None
@@ -1,15 +1,21 @@
-from tkinter import RAISED, SUNKEN, DISABLED, NORMAL, \
-	E, W, EW, N, S, NS, NSEW, VERTICAL, CENTER, RIGHT, END
+# The same values as tkinter's constants, so that importing these
+# doesn't load tkinter in programs without a UI
+RAISED, SUNKEN = "raised", "sunken"
+DISABLED, NORMAL = "disabled", "normal"
+E, W, EW, N, S, NS, NSEW = "e", "w", "ew", "n", "s", "ns", "nsew"
+VERTICAL, CENTER, RIGHT, END = "vertical", "center", "right", "end"
 
 TIME_FORMAT = "%Y-%m-%d %H:%M"
+DATE_FORMAT = "%Y-%m-%d"
 
 # Indices for main window frames
 LOGIN         = 0
 ADD_MEMBER    = 1
 BOOKINGS      = 2
 FLOOR_PLAN    = 3
-CHOOSE_OPTION = 4
-BUTTONS = ["Log In", "Member Manager", "Booking Manager", "Floor Plan Manager"]
+STATISTICS    = 4
+CHOOSE_OPTION = 5
+BUTTONS = ["Log In", "Member Manager", "Booking Manager", "Floor Plan Manager", "Statistics"]
 
 NOT_LOGGED   = "Not logged in"
 LOGGED       = "Logged in as {}"
@@ -34,8 +40,51 @@ TABLE_FIELDS = (
 	("height", "Height")
 )
 
+# Floor which tables are put on unless they are given another
+DEFAULT_FLOOR = "Main"
+# How many floors to keep drawn on their canvases once they have been viewed
+FLOOR_CACHE_SIZE = 3
+
+# In milliseconds, how often table edits are saved while in edit mode.
+# Set to 0 to only save when editing ends
+AUTOSAVE_INTERVAL = 5000
+
+# In seconds, how long after their arrival bookings are kept loaded,
+# before being archived if they are completed or never turned up
+BOOKING_RETENTION = 86400
+# In milliseconds, how often old bookings are archived and the database tidied
+MAINTENANCE_INTERVAL = 3600000
+# How many runs in a row can fail, e.g. while the database is busy,
+# before the error is reported
+MAINTENANCE_FAILURES = 3
+
+# In milliseconds, how often to look for changes made by other programs
+# sharing the database
+CHANGE_POLL_INTERVAL = 1000
+# In seconds, how long changes are kept in the change log. Anything
+# left running longer than this without polling has to be restarted
+CHANGELOG_RETENTION = 86400
+
+# Whether counts, sizes and timings are collected from startup. Admins can
+# also turn this on and off from the statistics page
+METRICS_ENABLED = False
+# File the metrics are written to as JSON every METRICS_DUMP_INTERVAL
+# milliseconds while they are enabled. Leave empty to not write them
+METRICS_DUMP = ""
+METRICS_DUMP_INTERVAL = 60000
+
+# How new passwords are hashed, as "<name>$<parameters>". Either
+# pbkdf2_sha256$<iterations> or scrypt$<n>$<r>$<p>. Older passwords
+# are rehashed with this the next time their owner logs in
+PASSWORD_KDF = "pbkdf2_sha256$600000"
+
 MASK     = "\u2022" # U+2022 BULLET
 DATABASE = "restaurant.db"
+# In seconds, how long the write-behind worker waits for more writes
+# to group into the same transaction
+WRITE_BATCH_DELAY = 0.005
+# Which of repository.STORAGE_PROFILES to tune the database with
+STORAGE_PROFILE = "balanced"
 
 STATUSES = (
 	"Empty",
@@ -53,6 +102,12 @@ STATUS_TIMES = (
 	2400,
 	300
 )
+# In seconds, how long bookings are expected to take unless told otherwise.
+# Bookings made before durations were recorded are given this too
+DEFAULT_DURATION = sum(time for time in STATUS_TIMES if time != -1)
+
+# In seconds, how long before its arrival a booking is shown on its table
+ARRIVAL_HORIZON = 1200
 
 EMPTY     = 0
 ARRIVED   = 1
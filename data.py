@@ -1,149 +1,332 @@
-import sqlite3, os, hashlib
+import repository, writebehind, records, names, spatial, timetable, metrics, os, hashlib, bisect, datetime, workload, concurrent.futures
 from constants import *
 
-# Pre-defined SQL statements
+# Access to each table in the database
+staff_db   = repository.StaffRepository()
+table_db   = repository.TableRepository()
+booking_db = repository.BookingRepository()
+change_db  = repository.ChangeRepository()
 
-ADD_EMPLOYEE    = "INSERT INTO staff " \
-                  "(first_name, last_name, phone_number, permission, password, salt) " \
-                  "VALUES (?, ?, ?, ?, ?, ?);"
-
-MODIFY_EMPLOYEE = "UPDATE staff " \
-                  "SET first_name=?, last_name=?, phone_number=?, permission=? " \
-                  "WHERE member_id=?;"
-
-MODIFY_PASSWORD = "UPDATE staff " \
-                  "SET password=?, salt=? " \
-                  "WHERE member_id=?;"
-
-DELETE_EMPLOYEE = "DELETE FROM staff " \
-                  "WHERE member_id=?;"
-
-LIST_EMPLOYEES  = "SELECT member_id, first_name, last_name, phone_number, present, permission " \
-                  "FROM staff " \
-                  "ORDER BY first_name;"
-
-MARK_PRESENT    = "UPDATE staff " \
-                  "SET present=? " \
-                  "WHERE member_id=?;"
-
-GET_SALT        = "SELECT salt FROM staff WHERE member_id=?"
-CAN_LOGIN       = "SELECT CASE WHEN password=? THEN 1 ELSE 0 END " \
-                  "FROM staff " \
-                  "WHERE member_id=?;"
-
-ADD_TABLE       = "INSERT INTO layout_table " \
-                  "(table_number, capacity, x_pos, y_pos, width, height, shape) " \
-                  "VALUES (?, ?, ?, ?, ?, ?, ?);"
-
-DELETE_TABLE    = "DELETE FROM layout_table " \
-                  "WHERE table_id=?;"
-
-MODIFY_TABLE    = "UPDATE layout_table " \
-                  "SET table_number=?, capacity=?, x_pos=?, y_pos=?, width=?, height=?, shape=? " \
-                  "WHERE table_id=?;"
-
-LIST_TABLES     = "SELECT * " \
-                  "FROM layout_table;"
-
-ADD_BOOKING     = "INSERT INTO booking " \
-                  "(customer, table_id, arrival) " \
-                  "VALUES (?, ?, ?);"
-
-MODIFY_BOOKING  = "UPDATE booking " \
-                  "SET customer=?, table_id=?, arrival=? " \
-                  "WHERE booking_id=?;"
-
-DELETE_BOOKING  = "DELETE FROM booking " \
-                  "WHERE booking_id=?;"
-
-LIST_BOOKINGS   = "SELECT * " \
-                  "FROM booking;"
-
-SET_STATUS      = "UPDATE booking " \
-                  "SET status=? " \
-                  "WHERE booking_id=?;"
+# Writes are handed to this, so the UI doesn't wait for them to be saved
+writer = writebehind.WriteBehind()
+# Passwords are hashed on these threads, so a slow KDF doesn't freeze the UI
+hasher = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="hasher")
 
 # Hashes and salts are all handled as bytes objects
 
-def hash(password, salt):
-	"""Generates a hashed password for storing in the database"""
-	return hashlib.sha256(password.encode("utf-8") + salt).digest()
+def hash(password, salt, kdf=PASSWORD_KDF):
+	"""Generates a hashed password for storing in the database,
+	using the given key derivation function and parameters.
+
+	This can take a while, so should be kept off the UI thread"""
+	name, *params = kdf.split("$")
+	password = password.encode("utf-8")
 
-def get_salt(member_id):
-	"""Grabs salt for the given member from the database"""
-	cursor.execute(GET_SALT, (member_id, ))
-	return bytes(cursor.fetchone()[0])
+	if name == "pbkdf2_sha256":
+		return hashlib.pbkdf2_hmac("sha256", password, salt, int(params[0]))
+	elif name == "scrypt":
+		n, r, p = map(int, params)
+		return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=256*n*r + 1048576)
+	elif name == "sha256": # How passwords used to be hashed
+		return hashlib.sha256(password + salt).digest()
+	raise ValueError("Unknown key derivation function " + kdf)
 
 def gen_salt():
 	"""Generates a salt for use with hashing to prevent rainbow table use"""
 	return os.urandom(16)
 
-# Global database access
-database = sqlite3.connect(DATABASE)
-cursor   = database.cursor()
+# Schema changes, applied in order. The number at the start of each
+# file is the version the database is at once it has been run
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+def migrate():
+	"""Brings the database schema up to date, recording the version
+	reached in PRAGMA user_version"""
+	database = repository.connection()
+	version = database.execute("PRAGMA user_version;").fetchone()[0]
+
+	for name in sorted(os.listdir(MIGRATIONS)):
+		if not name.endswith(".sql"): continue
+		number = int(name.split("_")[0])
+		if number <= version: continue
+
+		with open(os.path.join(MIGRATIONS, name), "r") as script:
+			# Each migration is applied completely or not at all
+			database.executescript("BEGIN;\n{}\nPRAGMA user_version = {};\nCOMMIT;".format(script.read(), number))
 
 def init_db():
 	"""Handles loading all the data the program needs from the database"""
-	with open("setup.sql", "r") as script:
-		database.executescript(script.read())
+	migrate()
+	global revision # Read first, so changes made while loading are picked up later
+	revision = change_db.latest()
 	load_members()
 	load_tables()
 	load_bookings()
+	loads.rebuild(members, bookings)
+	writer.start()
 
 def cleanup_db():
-	cursor.close()
-	database.close()
+	hasher.shutdown(wait=True) # Passwords still being hashed are saved after
+	writer.stop() # Saves any writes still waiting
+	repository.close()
 
 # Caches of members, tables and bookings
 
 members = {}
-current_work = {}
+name_index = names.NameIndex() # For finding members by name
+display_names = names.DisplayNames() # Shortest name telling each member apart
+loads = workload.WorkloadTracker() # Tables served by each member
 
 def load_members():
 	"""Populates the cache of members from the database"""
 	global members
-	cursor.execute(LIST_EMPLOYEES)
-
 	members.clear()
-	for row in cursor.fetchall():
-		members[row[0]] = {
-			"present": row[-2],
-			"permission": row[-1]
-		}
-		for i in range(4): # Copy fields directly one at a time
-			members[row[0]][FIELDS[i][0]] = row[i]
-
-	current_work.update({id: 0 for id in members})
+	for row in staff_db.list():
+		members[row[0]] = records.Member(*row)
+	name_index.rebuild(members)
+	display_names.rebuild(members)
 
 tables = {}
+floor_spaces = {} # Floor -> where each of its tables and their chairs are
+
 def load_tables():
 	"""Populates the cache of tables from the database"""
 	global tables
-	cursor.execute(LIST_TABLES)
-
 	tables.clear()
-	for row in cursor.fetchall():
-		tables[row[0]] = {
-			"table_id": row[0],
-			"shape": row[-1] # Last item is shape
-		}
-		for i in range(1, len(row)-1): # Remaining fields
-			tables[row[0]][TABLE_FIELDS[i-1][0]] = row[i]
+	floor_spaces.clear()
+	for row in table_db.list():
+		table = tables[row[0]] = records.Table(*row)
+		floor_space(table["floor"]).update(table)
+	free_times.rebuild_tables(tables)
+
+def floor_space(floor):
+	"""Gets the spatial index of the tables on a floor"""
+	if floor not in floor_spaces:
+		floor_spaces[floor] = spatial.SpatialIndex()
+	return floor_spaces[floor]
+
+def floors():
+	"""Lists the floors which have tables on them, by name"""
+	return sorted({table["floor"] for table in tables.values()})
+
+# Fields of each table changed since they were last written to the database
+dirty_tables = {}
+
+def mark_table(table, *fields):
+	"""Records that the given fields of a table need saving"""
+	dirty_tables.setdefault(table["table_id"], set()).update(fields)
+	if "capacity" in fields:
+		free_times.set_capacity(table)
+
+def flush_tables():
+	"""Writes every table with unsaved changes, along with any other
+	pending statements, to the database in a single transaction"""
+	if not dirty_tables: return
+
+	# Copies are saved, as the tables may keep changing before they are written
+	writer.submit(table_db.modify_all, [dict(tables[id]) for id in dirty_tables if id in tables])
+	dirty_tables.clear()
 
 bookings = {}
 def load_bookings():
-	"""Populates the cache of bookings from the database"""
-	global bookings
-	cursor.execute(LIST_BOOKINGS)
+	"""Populates the cache of bookings from the database.
 
+	Older bookings are left in the database, see find_booking and booking_history"""
+	global bookings
+	cutoff = datetime.datetime.now().timestamp() - BOOKING_RETENTION
 	bookings.clear()
-	for row in cursor.fetchall():
-		bookings[row[0]] = {
-			"booking_id":  row[0],
-			"customer":   row[1],
-			"member_id": row[2],
-			"table_id": row[3],
-			"arrival": row[4],
-			"status": row[5],
-			"ping":  row[6]
-		}
+	booking_index.clear()
+	indexed_as.clear()
+	free_times.clear_bookings()
+
+	# Everything is built straight from the rows, and each list sorted once,
+	# which is much quicker than indexing bookings one by one
+	intervals = []
+	for row in booking_db.list(cutoff):
+		booking_id, customer, member_id, table_id, arrival, status, ping, party_size, duration = row
+		bookings[booking_id] = records.Booking(*row)
+		if status != COMPLETED:
+			key = (arrival, booking_id)
+			booking_index.setdefault(table_id, []).append(key)
+			indexed_as[booking_id] = (table_id, key)
+			intervals.append((arrival, arrival + duration, booking_id, table_id))
+	for entries in booking_index.values():
+		entries.sort()
+	free_times.load(intervals)
+
+def assign_waiter(booking, member_id):
+	"""Records which member is serving a booking, moving the load
+	of an open booking over from its previous waiter"""
+	if booking["member_id"] == member_id: return
+
+	if booking["status"] != COMPLETED:
+		loads.change(booking["member_id"], -1)
+		loads.change(member_id, 1)
+	booking["member_id"] = member_id
+
+	writer.submit(booking_db.set_waiter, booking["booking_id"], member_id)
+
+def find_booking(booking_id):
+	"""Gets a booking from the cache, or looks it up in the database
+	and the archive if it is too old to have been loaded"""
+	if booking_id in bookings:
+		return bookings[booking_id]
+
+	row = booking_db.find(booking_id)
+	return records.Booking(*row) if row else None
+
+def booking_history(table_id, start, end):
+	"""Lists the archived bookings at a table arriving in [start, end)"""
+	return [records.Booking(*row) for row in booking_db.history(table_id, start, end)]
+
+def forget_bookings(booking_ids):
+	"""Drops bookings which have been archived from the cache"""
+	for booking_id in booking_ids:
+		booking = bookings.pop(booking_id, None)
+		if booking:
+			unindex_booking(booking_id)
+			if booking["status"] != COMPLETED:
+				loads.change(booking["member_id"], -1)
+
+# Open bookings for each table, as sorted (arrival, booking_id) pairs.
+# Completed bookings are left out so lookups only see what's still to come
+booking_index = {}
+indexed_as = {} # booking_id -> (table_id, key) the booking was indexed under
+free_times = timetable.Timetable() # When each table is taken, for finding free ones
+
+def index_booking(booking):
+	"""Adds a booking to the arrival index and the times its table is taken,
+	or moves it if its table, arrival, duration or status have changed"""
+	unindex_booking(booking["booking_id"])
+
+	if booking["status"] != COMPLETED:
+		key = (booking["arrival"], booking["booking_id"])
+		bisect.insort(booking_index.setdefault(booking["table_id"], []), key)
+		indexed_as[booking["booking_id"]] = (booking["table_id"], key)
+	free_times.hold(booking)
+
+def unindex_booking(booking_id):
+	"""Removes a booking from the arrival index, if it is there"""
+	free_times.release(booking_id)
+	if booking_id in indexed_as:
+		table_id, key = indexed_as.pop(booking_id)
+		entries = booking_index[table_id]
+		del entries[bisect.bisect_left(entries, key)]
+
+def bookings_between(table_id, start=None, end=None):
+	"""Lists the open bookings at a table arriving in [start, end),
+	earliest first. Leaving out start or end leaves that side unbounded"""
+	entries = booking_index.get(table_id, ())
+	low = 0 if start is None else bisect.bisect_left(entries, (start, ))
+	high = len(entries) if end is None else bisect.bisect_left(entries, (end, ))
+
+	return [bookings[booking_id] for arrival, booking_id in entries[low:high]]
+
+# Changes made by other programs sharing the database
+
+revision = 0 # Latest change in the change log applied to the caches
+data_version = None # What PRAGMA data_version was when last checked
+
+def apply_changes():
+	"""Applies changes other programs have made to the database since
+	they were last looked at, returning the IDs changed as
+	{entity: set of IDs}, or an empty dict if nothing changed.
+
+	PRAGMA data_version only changes when another connection commits,
+	so checking it is cheap enough to do often"""
+	global revision, data_version
+	version = change_db.data_version()
+	if version == data_version:
+		return {}
+
+	changed = {}
+	latest = revision
+	for latest, entity, row_id, origin in change_db.since(revision):
+		if origin != repository.ORIGIN: # Already in the caches
+			changed.setdefault(entity, set()).add(row_id)
+
+	# Each row is read again once, however many times it changed
+	for member_id in changed.get(staff_db.ENTITY, ()):
+		refresh_member(member_id)
+	for table_id in changed.get(table_db.ENTITY, ()):
+		refresh_table(table_id)
+	for booking_id in changed.get(booking_db.ENTITY, ()):
+		refresh_booking(booking_id)
+
+	# Only once everything is applied, so nothing is missed if reading fails
+	revision, data_version = latest, version
+	return changed
+
+def refresh_member(member_id):
+	"""Reloads a member changed elsewhere, keeping the same record"""
+	row = staff_db.get(member_id)
+	member = members.get(member_id)
+
+	if row is None:
+		if member:
+			del members[member_id]
+			name_index.remove(member_id)
+			display_names.remove(member_id)
+			loads.remove(member_id)
+	elif member:
+		member.assign(*row)
+		name_index.update(member)
+		display_names.update(member)
+		loads.set_present(member_id, member["present"])
+	else:
+		member = members[member_id] = records.Member(*row)
+		name_index.add(member)
+		display_names.add(member)
+		loads.add(member_id, member["present"])
+
+def refresh_table(table_id):
+	"""Reloads a table changed elsewhere, keeping the same record"""
+	if table_id in dirty_tables:
+		return # Unsaved changes here are written over it anyway
+
+	row = table_db.get(table_id)
+	table = tables.get(table_id)
+	if table:
+		floor_space(table["floor"]).remove(table_id)
+
+	if row is None:
+		tables.pop(table_id, None)
+		free_times.remove_table(table_id)
+		return
+	elif table:
+		table.assign(*row)
+	else:
+		table = tables[table_id] = records.Table(*row)
+	floor_space(table["floor"]).update(table)
+	free_times.set_capacity(table)
+
+def refresh_booking(booking_id):
+	"""Reloads a booking changed elsewhere, keeping the same record
+	and moving its load between waiters"""
+	row = booking_db.get(booking_id)
+	booking = bookings.get(booking_id)
+	if booking and booking["status"] != COMPLETED:
+		loads.change(booking["member_id"], -1)
+
+	if row is None:
+		if booking:
+			del bookings[booking_id]
+			unindex_booking(booking_id)
+		return
+	elif booking:
+		booking.assign(*row)
+	else:
+		booking = bookings[booking_id] = records.Booking(*row)
+
+	index_booking(booking)
+	if booking["status"] != COMPLETED:
+		loads.change(booking["member_id"], 1)
+
+# Sizes of the caches, only worked out when the metrics are looked at
+metrics.gauge("cache.members", lambda: len(members))
+metrics.gauge("cache.tables", lambda: len(tables))
+metrics.gauge("cache.bookings", lambda: len(bookings))
+metrics.gauge("cache.booking_index", lambda: len(indexed_as))
+metrics.gauge("cache.free_times", lambda: len(free_times.held_as))
+metrics.gauge("cache.dirty_tables", lambda: len(dirty_tables))
+metrics.gauge("writer.queue", lambda: writer.queue.qsize())
@@ -1,4 +1,4 @@
-import tableshapes, data, util, tkinter, tkinter.ttk, sqlite3, datetime, math
+import tableshapes, render, spatial, records, data, service, metrics, util, tkinter, tkinter.ttk, sqlite3, datetime, math, collections
 from constants import *
 
 DEFAULT_TABLE = {
@@ -9,9 +9,22 @@ DEFAULT_TABLE = {
 	"shape": 0 # Oval
 }
 
+# Limits to how far the floor can be zoomed out and in, and how much each step zooms
+MIN_ZOOM  = 0.1
+MAX_ZOOM  = 4
+ZOOM_STEP = 1.25
+# Below this zoom, tables are drawn without their chairs
+DETAIL_ZOOM = 0.5
+# In pixels, how far past the edges of the screen tables are drawn,
+# so panning a little doesn't have to draw anything new
+VIEW_MARGIN = 200
+# In pixels, how far the mouse wheel pans
+PAN_STEP = 60
+
 class TableDetails(tkinter.LabelFrame):
-	def __init__(self, master=None):
+	def __init__(self, floorcallback, master=None):
 		tkinter.LabelFrame.__init__(self, master, text="Table Details")
+		self.floorcallback = floorcallback # Called to move a table to another floor
 
 		self.fields = {}
 		vcmd = (self.register(lambda text: not text or text.isnumeric()), "%S")
@@ -34,6 +47,15 @@ class TableDetails(tkinter.LabelFrame):
 		self.shape_menu = tkinter.OptionMenu(self, self.shape, *tableshapes.SHAPES)
 		self.shape_menu.grid(row=len(TABLE_FIELDS), column=1, sticky=EW)
 
+		# Only moves the table once a floor is picked or entered,
+		# rather than on every keystroke
+		tkinter.Label(self, text="Floor").grid(row=len(TABLE_FIELDS) + 1, sticky=E)
+		self.floor = tkinter.ttk.Combobox(self)
+		self.floor.grid(row=len(TABLE_FIELDS) + 1, column=1, sticky=EW)
+		self.floor.bind("<<ComboboxSelected>>", self.floor_edited)
+		self.floor.bind("<Return>", self.floor_edited)
+		self.floor.bind("<FocusOut>", self.floor_edited)
+
 		self.vars = {field: tkinter.StringVar() for field in self.fields}
 		for key in self.vars:
 			self.vars[key].trace("w", self.edited)
@@ -59,13 +81,41 @@ class TableDetails(tkinter.LabelFrame):
 		capacity = int(capacity) if capacity.isnumeric() else 0
 
 		# Don't have to validate integer (can be e.g. 5b)
-		self.table.table["table_number"] = self.fields["table_number"].get()
+		table_number = self.fields["table_number"].get()
+		if table_number != self.table.table["table_number"]:
+			self.table.table["table_number"] = table_number
+			data.mark_table(self.table.table, "table_number")
 
-		self.table.move(x, y, False)
+		self.table.move(x, y)
 		self.table.set_shape(tableshapes.SHAPES.index(self.shape.get()))
 		self.table.set_chairs(capacity)
 		self.table.resize(width, height)
 
+	def floor_edited(self, e=None):
+		if self.table and self.floor.get().strip():
+			self.floorcallback(self.table, self.floor.get().strip())
+
+	def refresh(self):
+		"""Shows any changes to the loaded table, such as it being dragged,
+		without reloading the fields whose values haven't changed"""
+		if not self.table: return
+		self.loading = True
+
+		for field in self.fields:
+			text = self.vars[field].get()
+			value = self.table.table[field]
+			if field != "table_number": # Compares numbers as they are read back in
+				text = int(text) if text.isnumeric() else 0
+
+			if text != value:
+				self.vars[field].set(value)
+
+		shape = tableshapes.SHAPES[self.table.table["shape"]]
+		if self.shape.get() != shape:
+			self.shape.set(shape)
+
+		self.loading = False
+
 	def load_table(self, table=None):
 		"""Loads the details from the given table into this form"""
 		self.table = table
@@ -77,94 +127,99 @@ class TableDetails(tkinter.LabelFrame):
 			self.fields[field].delete(0, END)
 			self.fields[field]["state"] = state
 		self.shape_menu["state"] = state
+		self.floor["state"] = state
 
 		if table:
 			for field in self.fields:
 				self.fields[field].insert(0, table.table[field])
 
 			self.shape.set(tableshapes.SHAPES[table.table["shape"]])
+			self.floor["values"] = data.floors()
+			self.floor.set(table.table["floor"])
 		else:
 			self.shape.set("")
+			self.floor.set("")
 
 		self.loading = False
 
 class Table:
-	def __init__(self, table, canvas, selectcallback, menucallback):
+	"""A table on the floor plan, and its current booking.
+
+	The table keeps track of its booking whether or not its floor is
+	being shown, and is only drawn while it is attached to a floor"""
+	def __init__(self, table, renderer, selectcallback, menucallback):
 		self.table = table
-		self.canvas = canvas
+		self.renderer = renderer
 		self.selectcallback = selectcallback
 		self.menucallback = menucallback
 
-		self.editing = False
-		self.chairs = []
-		self.shape = None
-		self.table_number = self.canvas.create_text(0, 0)
+		# Every item drawn for this table has its tag, so they can all be moved at once
+		self.tag = "table{}".format(table["table_id"])
+		self.floor = None
+		self.canvas = None
+		self.pings = None
+		self.forget_items()
 
+		self.editing = False
 		self.current_booking = None
 		self.status_since = -1 # Time since the status was last changed
 		self.waiter = None
+		self.ping = False
+
+		self.limit_chairs()
+		data.floor_space(table["floor"]).update(table)
+
+	def forget_items(self):
+		self.drawn = None # Position of the table on the canvas, once it has been drawn
+		self.chairs = []
+		self.shape = None
+		self.table_number = 0
 		self.waiter_text = 0
 		self.waiter_box = 0
 
-		# Set up the position of the table
-		self.move(table["x_pos"], table["y_pos"], False)
-		self.resize(table["width"], table["height"], False)
-		self.set_chairs(table["capacity"])
-		self.set_shape(table["shape"])
+	def attach(self, floor, chairs=None):
+		"""Draws the table on its floor's canvas straight away, with any precomputed chairs"""
+		self.floor = floor
+		self.canvas = floor.canvas
+		self.pings = floor.pings
 
-		self.update_position()
-		self.ping = False
+		self.table_number = self.canvas.create_text(0, 0, tags=self.tag)
+		self.render(render.EVERYTHING, chairs)
+
+	def detach(self):
+		"""Forgets the table's items once its floor's canvas is destroyed"""
+		self.renderer.discard(self)
+		self.floor = None
+		self.canvas = None
+		self.pings = None
+		self.forget_items()
+
+	def invalidate(self, *parts):
+		"""Marks parts of the table to be redrawn once Tk is idle, if it is drawn"""
+		if self.canvas:
+			self.renderer.invalidate(self, *parts)
 
 	def set_status(self, status):
 		"""Updates the database with the given status and calculates
 		a new estimated next status time"""
 		if self.current_booking:
-			data.cursor.execute(data.SET_STATUS, (status, self.current_booking["booking_id"]))
-			data.database.commit()
-			self.current_booking["status"] = status
-			self.status_since = datetime.datetime.now().timestamp()
-
+			self.status_since = service.set_status(self.current_booking, status)
 			self.update_text()
 
 	def set_waiter(self, waiter=None):
 		"""Assigns the given waiter to this table, displaying their name"""
-		if self.waiter: # Take load off of current waiter, if any
-			data.current_work[self.waiter["member_id"]] -= 1
-
 		if waiter:
 			self.waiter = waiter
-			# Add load to new waiter
-			data.current_work[waiter["member_id"]] += 1
-			name = util.unique_name(self.waiter)
-
-			if self.waiter_text: # Might never be true
-				self.canvas.dchars(self.waiter_text, 0, END)
-				self.canvas.insert(self.waiter_text, 0, name)
-
-				self.canvas.coords(self.waiter_text, self.table["x_pos"] + 5, self.table["y_pos"] + 5)
-
-				bounds = self.canvas.bbox(self.waiter_text)
-				bounds = (bounds[0] - 5, bounds[1] - 5, bounds[2] + 5, bounds[3] + 5)
-
-				self.canvas.coords(self.waiter_box, bounds)
-			else:
-				self.waiter_text = self.canvas.create_text(
-					self.table["x_pos"] + 5, self.table["y_pos"] + 5,
-					text=name, anchor=W, fill="white")
-
-				bounds = self.canvas.bbox(self.waiter_text)
-				bounds = (bounds[0] - 5, bounds[1] - 5, bounds[2] + 5, bounds[3] + 5)
-
-				self.waiter_box = self.canvas.create_rectangle(bounds, fill="red", outline="white", width="1")
-				self.canvas.tag_lower(self.waiter_box, self.waiter_text)
+			if self.current_booking: # Moves load over from any previous waiter
+				data.assign_waiter(self.current_booking, waiter["member_id"])
 		else:
-			self.canvas.delete(self.waiter_text)
-			self.canvas.delete(self.waiter_box)
-			self.waiter_text = 0
+			self.waiter = None
+		self.invalidate(render.WAITER)
 
 	def mouse_down(self, e):
 		if self.editing:
-			self.offset = (e.x - self.table["x_pos"], e.y - self.table["y_pos"])
+			x, y = self.floor.to_floor(e.x, e.y)
+			self.offset = (x - self.table["x_pos"], y - self.table["y_pos"])
 			self.selectcallback(self)
 
 	def right_down(self, e):
@@ -173,37 +228,44 @@ class Table:
 
 	def mouse_move(self, e):
 		if self.editing:
-			x = e.x_root - self.offset[0] - self.canvas.winfo_rootx()
-			y = e.y_root - self.offset[1] - self.canvas.winfo_rooty()
-			self.move(x, y)
-
-	def move(self, x, y, update=True):
-		self.table["x_pos"] = x
-		self.table["y_pos"] = y
-		if update:
-			self.update_position()
-
-	def resize(self, width, height, update=True):
-		self.table["width"] = min(width, 1000)
-		self.table["height"] = min(height, 1000)
-		if update:
-			self.update_position()
-
-	def set_bounds(self, left, top, right, bottom, update):
-		self.move(left, top, False)
-		self.resize(right-left, bottom-top, update)
+			x, y = self.floor.to_floor(e.x_root - self.canvas.winfo_rootx(), e.y_root - self.canvas.winfo_rooty())
+			self.move(round(x - self.offset[0]), round(y - self.offset[1]))
+
+	def mouse_up(self, e):
+		"""Moves a dropped table out from on top of any others"""
+		space = data.floor_space(self.table["floor"])
+		if self.editing and space.overlaps(self.table["table_id"]):
+			self.move(*space.free_position(self.table))
+
+	def move(self, x, y):
+		if (x, y) != (self.table["x_pos"], self.table["y_pos"]):
+			self.table["x_pos"] = x
+			self.table["y_pos"] = y
+			data.mark_table(self.table, "x_pos", "y_pos")
+			self.invalidate(render.POSITION)
+		data.floor_space(self.table["floor"]).update(self.table)
+
+	def resize(self, width, height):
+		width, height = min(width, 1000), min(height, 1000)
+		if (width, height) != (self.table["width"], self.table["height"]):
+			self.table["width"] = width
+			self.table["height"] = height
+			data.mark_table(self.table, "width", "height")
+			self.limit_chairs()
+			self.invalidate(render.SIZE)
+		data.floor_space(self.table["floor"]).update(self.table)
+
+	def set_bounds(self, left, top, right, bottom):
+		self.move(left, top)
+		self.resize(right-left, bottom-top)
 
 	def set_shape(self, shape):
 		"""Sets the visible shape of table"""
-		self.table["shape"] = shape
-		if not self.shape is None:
-			self.canvas.delete(self.shape)
-
-		self.shape = tableshapes.get_shape(self.canvas, shape)
-		self.canvas.tag_bind(self.shape, "<Button-1>", self.mouse_down)
-		self.canvas.tag_bind(self.shape, "<B1-Motion>", self.mouse_move)
-		self.canvas.tag_bind(self.shape, "<Button-3>", self.right_down)
-		self.canvas.lower(self.shape, self.table_number) # Move to back
+		if shape != self.table["shape"]:
+			self.table["shape"] = shape
+			data.mark_table(self.table, "shape")
+			self.limit_chairs()
+			self.invalidate(render.SHAPE)
 
 	# Brings the amount of chairs on a table to a number that fits
 	def limit_chairs(self):
@@ -212,93 +274,319 @@ class Table:
 		max_chairs = tableshapes.max_chairs(self.table)
 		if self.table["capacity"] > max_chairs:
 			self.table["capacity"] = max_chairs
+			data.mark_table(self.table, "capacity")
 
-	def set_chairs(self, count=None):
-		"""Redraws the chairs around the table, as well as
-		calculating their positions"""
-		if not count is None:
+	def set_chairs(self, count):
+		"""Sets the amount of chairs around the table, up to as many as fit"""
+		if count != self.table["capacity"]:
 			self.table["capacity"] = count
-		self.limit_chairs()
-
-		# Add new chairs if we don't have enough
-		if self.table["capacity"] > len(self.chairs):
-			for i in range(len(self.chairs), self.table["capacity"]):
-				self.chairs.append(self.canvas.create_oval(0, 0, 32, 32, fill="#DDD"))
-		else: # Remove any extra
-			while len(self.chairs) > self.table["capacity"]:
-				self.canvas.delete(self.chairs.pop())
-
-		i = 0
-		for point in tableshapes.generate_chairs(self.table):
-			self.canvas.coords(self.chairs[i],
-				point[0] - 16, point[1] - 16, point[0] + 16, point[1] + 16)
-			i += 1
-
-		self.canvas.lift(self.waiter_box)
-		self.canvas.lift(self.waiter_text)
+			data.mark_table(self.table, "capacity")
+			self.limit_chairs()
+			self.invalidate(render.CHAIRS)
 
 	def update_text(self):
 		"""Rewrites the text in the center of the table
 		based on the booking and the current mode"""
+		# The customers at this table have left
+		if not self.editing and self.current_booking \
+				and self.current_booking["status"] == COMPLETED:
+			self.set_ping(False)
+			self.current_booking = None
+			self.set_waiter(None)
+		self.invalidate(render.TEXT)
+
+	def render(self, parts, chairs=None):
+		"""Redraws the given parts of the table. Tables which have only been
+		moved are shifted as a whole, rather than being laid out again"""
+		if not self.canvas: return
+		if render.SHAPE in parts:
+			self.draw_shape()
+
+		layout = self.drawn is None or not parts.isdisjoint(render.LAYOUT)
+		if layout:
+			self.draw_layout(chairs)
+		elif render.POSITION in parts:
+			zoom = self.floor.zoom
+			self.canvas.move(self.tag,
+				(self.table["x_pos"] - self.drawn[0]) * zoom, (self.table["y_pos"] - self.drawn[1]) * zoom)
+		self.drawn = (self.table["x_pos"], self.table["y_pos"])
+
+		if not parts.isdisjoint((render.TEXT, render.SHAPE)):
+			self.draw_text()
+		if render.WAITER in parts or layout and self.waiter_text:
+			self.draw_waiter()
+
+	def draw_shape(self):
+		"""Replaces the shape on the canvas, if it is now a different type of item"""
+		shape_type = tableshapes.shape_type(self.table["shape"])
+		if self.shape is not None:
+			if self.canvas.type(self.shape) == shape_type:
+				return
+			self.canvas.delete(self.shape)
+
+		self.shape = tableshapes.get_shape(self.canvas, self.table["shape"], self.tag)
+		self.canvas.tag_bind(self.shape, "<Button-1>", self.mouse_down)
+		self.canvas.tag_bind(self.shape, "<B1-Motion>", self.mouse_move)
+		self.canvas.tag_bind(self.shape, "<ButtonRelease-1>", self.mouse_up)
+		self.canvas.tag_bind(self.shape, "<Button-3>", self.right_down)
+		self.canvas.lower(self.shape, self.table_number) # Move to back
+		for chair in self.chairs:
+			self.canvas.lower(chair, self.shape)
+
+		if self.ping: # The new shape needs the ping tag
+			self.pings.add(self)
+
+	def draw_layout(self, chairs=None):
+		"""Places the shape, chairs and text around the table's
+		current bounds, calculating the chairs unless they are given.
+
+		When the floor is zoomed out too far to make them out,
+		the chairs are left out"""
+		zoom = self.floor.zoom
+		left, top = self.floor.to_screen(self.table["x_pos"], self.table["y_pos"])
+		width, height = self.table["width"] * zoom, self.table["height"] * zoom
+		self.canvas.coords(self.shape, left, top, left + width, top + height)
+		self.canvas.coords(self.table_number, left + width / 2, top + height / 2)
+
+		count = self.table["capacity"] if self.floor.detailed() else 0
+		# Add new chairs if we don't have enough
+		while len(self.chairs) < count:
+			chair = self.canvas.create_oval(0, 0, 32, 32, fill="#DDD", tags=self.tag)
+			self.canvas.lower(chair, self.shape)
+			self.chairs.append(chair)
+		# Remove any extra
+		while len(self.chairs) > count:
+			self.canvas.delete(self.chairs.pop())
+
+		if chairs is None or len(chairs) != len(self.chairs):
+			chairs = tableshapes.generate_chairs(self.table)
+
+		radius = 16 * zoom
+		for chair, point in zip(self.chairs, chairs):
+			x, y = self.floor.to_screen(*point)
+			self.canvas.coords(chair, x - radius, y - radius, x + radius, y + radius)
+
+	def draw_text(self):
+		"""Draws the table number, and the booking unless editing"""
 		lines = ["Table " + self.table["table_number"]]
+		fill = "#EEE"
 
 		if not self.editing and self.current_booking:
-			# The customers at this table have left
-			if self.current_booking["status"] == COMPLETED:
-				self.current_booking = None
-				self.set_waiter(None)
-				self.canvas.itemconfig(self.shape, fill="#EEE")
-				self.ping = False
-			else:
-				lines.append(STATUSES[self.current_booking["status"]])
+			lines.append(STATUSES[self.current_booking["status"]])
 
-				# Adds time information
-				if self.current_booking["status"] == EMPTY:
-					lines.append(datetime.datetime.fromtimestamp(self.current_booking["arrival"]).strftime("%H:%M"))
-				else:
-					next_time = self.status_since + STATUS_TIMES[self.current_booking["status"]]
-					lines.append("{}-{}".format(
-						datetime.datetime.fromtimestamp(self.status_since).strftime("%H:%M"),
-						datetime.datetime.fromtimestamp(next_time).strftime("%H:%M")
-					))
-				self.canvas.itemconfig(self.shape, fill=TABLE_COLORS[self.current_booking["status"]])
-
-		self.canvas.coords(self.table_number, self.table["x_pos"] + self.table["width"] / 2, self.table["y_pos"] + self.table["height"] / 2)
+			# Adds time information
+			if self.current_booking["status"] == EMPTY:
+				lines.append(datetime.datetime.fromtimestamp(self.current_booking["arrival"]).strftime("%H:%M"))
+			else:
+				next_time = self.status_since + STATUS_TIMES[self.current_booking["status"]]
+				lines.append("{}-{}".format(
+					datetime.datetime.fromtimestamp(self.status_since).strftime("%H:%M"),
+					datetime.datetime.fromtimestamp(next_time).strftime("%H:%M")
+				))
+		if self.current_booking:
+			fill = TABLE_COLORS[self.current_booking["status"]]
 
+		self.canvas.itemconfig(self.shape, fill=fill)
 		self.canvas.dchars(self.table_number, 0, END)
 		self.canvas.insert(self.table_number, 0, '\n'.join(lines))
 
-	def update_position(self):
-		"""Visibly moves the shapes on the canvas when the table is moved"""
-		self.canvas.coords(self.shape, self.table["x_pos"], self.table["y_pos"],
-			self.table["x_pos"] + self.table["width"], self.table["y_pos"] + self.table["height"])
+	def draw_waiter(self):
+		"""Draws the waiter's name in the corner of the table"""
+		if not self.waiter:
+			self.canvas.delete(self.waiter_text)
+			self.canvas.delete(self.waiter_box)
+			self.waiter_text = 0
+			self.waiter_box = 0
+			return
+
+		name = util.unique_name(self.waiter)
+		x, y = self.floor.to_screen(self.table["x_pos"], self.table["y_pos"])
+		x, y = x + 5, y + 5
 
-		self.set_chairs()
-		self.update_text()
-		self.set_waiter(self.waiter)
-		self.selectcallback(self)
+		if self.waiter_text:
+			self.canvas.dchars(self.waiter_text, 0, END)
+			self.canvas.insert(self.waiter_text, 0, name)
+			self.canvas.coords(self.waiter_text, x, y)
+		else:
+			self.waiter_text = self.canvas.create_text(x, y,
+				text=name, anchor=W, fill="white", tags=self.tag)
+			self.waiter_box = self.canvas.create_rectangle(0, 0, 0, 0,
+				fill="red", outline="white", width="1", tags=self.tag)
+
+		bounds = self.canvas.bbox(self.waiter_text)
+		self.canvas.coords(self.waiter_box, bounds[0] - 5, bounds[1] - 5, bounds[2] + 5, bounds[3] + 5)
+
+		self.canvas.lift(self.waiter_box)
+		self.canvas.lift(self.waiter_text)
 
 	def set_editing(self, editing):
 		self.editing = editing
 		self.update_text()
 
-	def toggle_ping(self):
-		self.ping = not self.ping
+	def set_ping(self, ping):
+		"""Pings or unpings the table, saving it with the current booking"""
+		if self.current_booking:
+			service.set_ping(self.current_booking, ping)
+
+		self.ping = ping
+		if not self.pings:
+			pass # Shown once the floor is drawn
+		elif ping:
+			self.pings.add(self)
+		else:
+			self.pings.discard(self)
 
-	def set_flash(self, flash):
-		"""Sets the animation state of the table's ping"""
-		self.canvas.itemconfig(self.shape,
-			outline="red" if self.ping and flash else "black",
-			width=4 if self.ping else 2)
+	def toggle_ping(self):
+		self.set_ping(not self.ping)
 
 	def cleanup(self):
 		"""Deletes all the shapes this table used on the canvas"""
-		self.canvas.delete(self.shape)
-		self.canvas.delete(self.table_number)
-		self.canvas.delete(self.waiter_text)
+		if self.canvas:
+			self.pings.discard(self)
+			self.canvas.delete(self.tag)
+			self.detach()
+
+class Floor:
+	"""One floor or section of the restaurant, drawn on its own canvas.
+
+	The floor can be zoomed and panned, and only the tables in or
+	near the part of it on screen are drawn"""
+	def __init__(self, name, tables, drawcallback, master):
+		self.name = name
+		self.all_tables = tables # Table ID -> Table, for every floor
+		self.drawcallback = drawcallback # Called with newly drawn tables
+
+		self.canvas = tkinter.Canvas(master, border=1, relief=RAISED, bg="white")
+		self.pings = render.PingAnimator(self.canvas)
+		self.tables = set() # Tables drawn on this floor
+
+		self.zoom = 1
+		self.origin = (0, 0) # Point on the floor at the top left of the canvas
+		self.pan_from = None
+		self.pending = None
+
+		self.canvas.bind("<Configure>", self.view_changed)
+		self.canvas.bind("<ButtonPress-2>", self.pan_start)
+		self.canvas.bind("<B2-Motion>", self.pan_drag)
+		for event in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+			self.canvas.bind(event, self.wheel)
+
+	def to_screen(self, x, y):
+		"""Converts a point on the floor to a point on the canvas"""
+		return (x - self.origin[0]) * self.zoom, (y - self.origin[1]) * self.zoom
+
+	def to_floor(self, x, y):
+		"""Converts a point on the canvas to a point on the floor"""
+		return x / self.zoom + self.origin[0], y / self.zoom + self.origin[1]
+
+	def detailed(self):
+		"""Whether the floor is zoomed in far enough to draw chairs"""
+		return self.zoom >= DETAIL_ZOOM
+
+	def viewport(self, margin=0):
+		"""Gives the bounds of the floor on screen, plus a margin in pixels"""
+		width = max(self.canvas.winfo_width(), self.canvas.winfo_reqwidth())
+		height = max(self.canvas.winfo_height(), self.canvas.winfo_reqheight())
+		left, top = self.to_floor(-margin, -margin)
+		right, bottom = self.to_floor(width + margin, height + margin)
+		return left, top, right, bottom
+
+	def view_changed(self, e=None):
+		"""Updates which tables are drawn once Tk is idle"""
+		if self.pending is None:
+			self.pending = self.canvas.after_idle(self.update_view)
+
+	def update_view(self):
+		"""Draws the tables which have come into view, and deletes those
+		which have gone out of it"""
+		self.pending = None
+		ids = data.floor_space(self.name).query(self.viewport(VIEW_MARGIN))
+		showing = {self.all_tables[id] for id in ids}
+
+		for table in self.tables - showing:
+			table.cleanup()
+		new = [table for table in showing if table not in self.tables]
+		self.tables = showing
+
+		# Lays out all the new chairs at once
+		if self.detailed():
+			chairs = tableshapes.floor_chairs(table.table for table in new)
+		else:
+			chairs = [None] * len(new)
+		for table, points in zip(new, chairs):
+			table.attach(self, points)
 
-		for chair in self.chairs:
-			self.canvas.delete(chair)
+		if new:
+			self.drawcallback(new)
+
+	def add(self, table):
+		"""Draws a table straight away, such as a new one"""
+		self.tables.add(table)
+		table.attach(self)
+
+	def remove(self, table):
+		"""Deletes a table's drawing, such as when it is deleted"""
+		self.tables.discard(table)
+		table.cleanup()
+
+	def pan(self, dx, dy):
+		"""Pans the floor by the given number of pixels"""
+		self.origin = (self.origin[0] - dx / self.zoom, self.origin[1] - dy / self.zoom)
+		self.canvas.move("all", dx, dy)
+		self.view_changed()
+
+	def zoom_at(self, factor, x=None, y=None):
+		"""Zooms the floor, keeping the given point on the canvas,
+		or the center, in the same place"""
+		if x is None:
+			x, y = self.canvas.winfo_width() / 2, self.canvas.winfo_height() / 2
+
+		zoom = util.clamp(self.zoom * factor, MIN_ZOOM, MAX_ZOOM)
+		if zoom == self.zoom: return
+
+		floor_x, floor_y = self.to_floor(x, y)
+		self.set_view(zoom, (floor_x - x / zoom, floor_y - y / zoom))
+
+	def set_view(self, zoom, origin):
+		self.zoom = zoom
+		self.origin = origin
+
+		for table in self.tables:
+			table.invalidate(render.SIZE) # Everything has to be laid out again
+		self.view_changed()
+
+	def reset_view(self):
+		"""Goes back to the top left of the floor, at full size"""
+		self.set_view(1, (0, 0))
+
+	def pan_start(self, e):
+		self.pan_from = (e.x, e.y)
+
+	def pan_drag(self, e):
+		if self.pan_from:
+			self.pan(e.x - self.pan_from[0], e.y - self.pan_from[1])
+			self.pan_from = (e.x, e.y)
+
+	def wheel(self, e):
+		"""Scrolls with the mouse wheel, sideways with shift,
+		or zooms around the mouse with control"""
+		step = 1 if e.num == 4 or getattr(e, "delta", 0) > 0 else -1
+		if e.state & 0x4: # Control
+			self.zoom_at(ZOOM_STEP ** step, e.x, e.y)
+		elif e.state & 0x1: # Shift
+			self.pan(step * PAN_STEP, 0)
+		else:
+			self.pan(0, step * PAN_STEP)
+
+	def destroy(self):
+		"""Destroys the canvas, leaving the tables to be drawn again later"""
+		self.pings.stop()
+		if self.pending is not None:
+			self.canvas.after_cancel(self.pending)
+		for table in self.tables:
+			table.detach()
+		self.tables = set()
+		self.canvas.destroy()
 
 class FloorPlan(tkinter.Frame):
 	def __init__(self, callback, master=None):
@@ -306,9 +594,7 @@ class FloorPlan(tkinter.Frame):
 		self.callback = callback
 
 		self.init_toolbar()
-		self.floor_view = tkinter.Canvas(self, border=1, relief=RAISED, bg="white")
-		self.floor_view.grid(row=2, column=0, sticky=NSEW)
-		self.details = TableDetails(self)
+		self.details = TableDetails(self.move_to_floor, self)
 		self.details.grid(row=2, column=1, sticky=NSEW, padx=5, pady=5)
 
 		self.columnconfigure(0, weight=1)
@@ -316,11 +602,19 @@ class FloorPlan(tkinter.Frame):
 		self.rowconfigure(2, weight=1)
 
 		self.tables = []
+		self.by_id = {} # Table ID -> Table
+		self.selected = None
+		self.overlapping = set() # Tables shown overlapping another
+		self.autosave_timer = None
+		self.renderer = render.RenderScheduler(self, self.rendered)
+
+		# The most recently viewed floors are kept drawn, the last being on screen
+		self.floors = collections.OrderedDict() # Name -> Floor
+		self.floor = None
 		self.populate()
 		self.set_editing(False)
-		self.check_bookings(True)
-		self.flash = False
-		self.animate_pings()
+
+		self.check_bookings(allow_started=True) # Arrivals are then passed on by the main window
 		self.init_menu()
 
 	def init_toolbar(self):
@@ -342,15 +636,91 @@ class FloorPlan(tkinter.Frame):
 		self.delete_table.grid(row=1, column=4, padx=5)
 		self.find_button = tkinter.Button(top, text="Find Lost Tables", command=self.find_lost)
 		self.find_button.grid(row=1, column=5)
+		self.overlap_label = tkinter.Label(top, fg="red")
+		self.overlap_label.grid(row=1, column=6, padx=10)
+
+		# The mouse wheel also pans, and zooms with control held
+		top.columnconfigure(7, weight=1)
+		tkinter.Button(top, text="-", width=2, command=lambda: self.floor.zoom_at(1 / ZOOM_STEP)).grid(row=1, column=8)
+		tkinter.Button(top, text="+", width=2, command=lambda: self.floor.zoom_at(ZOOM_STEP)).grid(row=1, column=9)
+		tkinter.Button(top, text="Reset View", command=lambda: self.floor.reset_view()).grid(row=1, column=10, padx=5)
+
+		# Picking a floor or entering a new name shows that floor
+		tkinter.Label(top, text="Floor").grid(row=1, column=11, padx=5)
+		self.floor_picker = tkinter.ttk.Combobox(top)
+		self.floor_picker.grid(row=1, column=12, padx=5)
+		self.floor_picker.bind("<<ComboboxSelected>>", self.floor_picked)
+		self.floor_picker.bind("<Return>", self.floor_picked)
+
+	def floor_picked(self, e=None):
+		self.show_floor(self.floor_picker.get().strip() or DEFAULT_FLOOR)
+
+	def show_floor(self, name):
+		"""Shows a floor, drawing it unless it is one of the recently viewed floors"""
+		if self.floor and self.floor.name == name: return
+		if self.floor:
+			self.floor.canvas.grid_remove()
+
+		if name in self.floors:
+			self.floors.move_to_end(name)
+		else:
+			floor = self.floors[name] = Floor(name, self.by_id, self.floor_drawn, self)
+			floor.update_view()
 
-	def find_lost(self):
-		"""Finds and moves lost tables into the visible screen region"""
-		max_x = self.floor_view.winfo_width() - 41
-		max_y = self.floor_view.winfo_height() - 41
+			# Forgets the drawings of the floor viewed longest ago
+			while len(self.floors) > FLOOR_CACHE_SIZE:
+				old = self.floors.popitem(last=False)[1]
+				self.overlapping.difference_update(old.tables)
+				old.destroy()
 
-		for table in self.tables:
-			table.move(util.clamp(table.table["x_pos"], 41, max_x - table.table["width"]),
-				util.clamp(table.table["y_pos"], 41, max_y - table.table["height"]))
+		self.floor = self.floors[name]
+		self.floor.canvas.grid(row=2, column=0, sticky=NSEW)
+
+		self.floor_picker["values"] = sorted(set(data.floors()) | set(self.floors) | {DEFAULT_FLOOR})
+		self.floor_picker.set(name)
+
+		if self.selected and self.selected.table["floor"] != name:
+			self.select_table(None)
+		if self.editing:
+			self.check_overlaps(self.floor.tables)
+
+	def floor_drawn(self, tables):
+		"""Shows which tables which have just come into view overlap others"""
+		if self.editing:
+			self.check_overlaps(tables)
+
+	def move_to_floor(self, table, name):
+		"""Moves a table onto another floor, into free space there"""
+		if name == table.table["floor"]: return
+
+		data.floor_space(table.table["floor"]).remove(table.table["table_id"])
+		if table.floor:
+			table.floor.remove(table)
+
+		table.table["floor"] = name
+		data.mark_table(table.table, "floor")
+		table.move(*data.floor_space(name).free_position(table.table))
+
+		if name in self.floors:
+			self.floors[name].view_changed()
+		self.select_table(None)
+		self.check_overlaps(())
+
+	def find_lost(self):
+		"""Finds and moves lost tables into free space in the visible screen region"""
+		# Allows a 5px margin around the tables' chairs
+		left, top, right, bottom = self.floor.viewport(-5)
+		area = (math.ceil(left), math.ceil(top), math.floor(right), math.floor(bottom))
+		space = data.floor_space(self.floor.name)
+		lost = [self.by_id[id] for id, bounds in space.bounds.items()
+			if not spatial.contains(area, bounds)]
+
+		# Lost tables can't block each other's new places
+		for table in lost:
+			space.remove(table.table["table_id"])
+		for table, position in zip(lost, space.free_positions([table.table for table in lost], area)):
+			table.move(*position)
+		self.floor.view_changed()
 
 	def show_menu(self, table, x, y):
 		"""Shows the table right-click menu"""
@@ -362,19 +732,54 @@ class FloorPlan(tkinter.Frame):
 		self.selected = table
 		self.details.load_table(table)
 
+	def rendered(self, changes):
+		"""Keeps the details form up to date with the selected table,
+		and warns about moved tables landing on top of others"""
+		if self.selected in changes:
+			self.details.refresh()
+		if self.editing:
+			self.check_overlaps(changes)
+
+	def check_overlaps(self, tables):
+		"""Dashes the outlines of the given tables and any tables
+		they are on top of, if they overlap another table while editing"""
+		check = set(tables) | self.overlapping
+		for table in tables:
+			space = data.floor_space(table.table["floor"])
+			check.update(self.by_id[id] for id in space.overlaps(table.table["table_id"]))
+
+		for table in check:
+			if not table.canvas: # Not on a floor being drawn
+				self.overlapping.discard(table)
+			elif self.editing and data.floor_space(table.table["floor"]).overlaps(table.table["table_id"]):
+				self.overlapping.add(table)
+				table.canvas.itemconfig(table.shape, dash=(6, 4))
+			else:
+				self.overlapping.discard(table)
+				table.canvas.itemconfig(table.shape, dash="")
+
+		numbers = sorted(table.table["table_number"] for table in self.overlapping)
+		self.overlap_label["text"] = "Overlapping tables: " + ", ".join(numbers) if numbers else ""
+
 	def populate(self):
-		"""Adds all the tables from the database to the floor view"""
+		"""Adds all the tables from the database to the floor plan,
+		only drawing those on the first floor shown"""
 		now = datetime.datetime.now().timestamp()
+
 		for table in data.tables.values():
-			floor_table = Table(table, self.floor_view, self.select_table, self.show_menu)
+			floor_table = Table(table, self.renderer, self.select_table, self.show_menu)
 			floor_table.status_since = now
 			self.tables.append(floor_table)
+			self.by_id[table["table_id"]] = floor_table
+
+		floors = data.floors()
+		self.show_floor(DEFAULT_FLOOR if DEFAULT_FLOOR in floors or not floors else floors[0])
 
 	def add_table(self):
 		"""Adds a new default table to both the database and to the floor plan.
 
 		This function does not commit the database"""
-		new_table = dict(DEFAULT_TABLE)
+		new_table = records.Table(**DEFAULT_TABLE)
 
 		# Finds the lowest available table number
 		lowest = 1
@@ -391,53 +796,92 @@ class FloorPlan(tkinter.Frame):
 			# This loop will break once a number is found
 
 		new_table["table_number"] = str(lowest)
+		new_table["floor"] = self.floor.name
+
+		# Starts from the top left of the screen
+		left, top = self.floor.to_floor(0, 0)
+		new_table["x_pos"] += round(left)
+		new_table["y_pos"] += round(top)
+		new_table["x_pos"], new_table["y_pos"] = data.floor_space(self.floor.name).free_position(new_table)
 
 		# Upload the table
-		data.cursor.execute(data.ADD_TABLE, (
-			new_table["table_number"],
-			new_table["capacity"],
-			new_table["x_pos"], new_table["y_pos"],
-			new_table["width"], new_table["height"],
-			new_table["shape"]
-		))
-		new_table["table_id"] = data.cursor.lastrowid
+		try: # Needs to wait for the new ID
+			new_table["table_id"] = data.writer.submit(data.table_db.add, dict(new_table)).result()
+		except sqlite3.Error:
+			return # The main window reports the error
 		data.tables[new_table["table_id"]] = new_table # Add to the local cache
+		data.free_times.set_capacity(new_table)
 
 		# Convert to a canvas table
-		canvas_table = Table(new_table, self.floor_view, self.select_table, self.show_menu)
+		canvas_table = Table(new_table, self.renderer, self.select_table, self.show_menu)
+		self.floor.add(canvas_table)
 		canvas_table.set_editing(True)
 		self.tables.append(canvas_table)
+		self.by_id[new_table["table_id"]] = canvas_table
+		self.select_table(canvas_table)
 
 	def delete_table(self):
 		"""Removes the selected table from both the database and the floor plan.
 
 		This function does not commit the database"""
 		if self.selected:
-			self.selected.cleanup()
 			id = self.selected.table["table_id"]
 
 			# Delete from the db
-			data.cursor.execute(data.DELETE_TABLE, (id, ))
+			data.writer.submit(data.table_db.delete, id)
 
 			del data.tables[id] # Remove from the local cache
-			self.tables.remove(self.selected)
+			data.dirty_tables.pop(id, None)
+			data.floor_space(self.selected.table["floor"]).remove(id)
+			data.free_times.remove_table(id)
+			self.forget_table(self.selected)
+
+	def forget_table(self, table):
+		"""Takes a deleted table off the floor plan"""
+		if table.floor:
+			table.floor.remove(table)
+		self.tables.remove(table)
+		del self.by_id[table.table["table_id"]]
+		self.overlapping.discard(table)
+		if table is self.selected:
 			self.select_table(None)
+		self.check_overlaps(())
+
+	def tables_changed(self, table_ids):
+		"""Adds, redraws or removes tables changed by another program,
+		once their changes are in the cache"""
+		for id in table_ids:
+			table = data.tables.get(id)
+			floor_table = self.by_id.get(id)
+
+			if table is None:
+				if floor_table:
+					self.forget_table(floor_table)
+			elif floor_table is None:
+				floor_table = Table(table, self.renderer, self.select_table, self.show_menu)
+				floor_table.set_editing(self.editing)
+				self.tables.append(floor_table)
+				self.by_id[id] = floor_table
+			else:
+				if floor_table.floor and floor_table.floor.name != table["floor"]:
+					floor_table.floor.remove(floor_table)
+				floor_table.invalidate(*render.EVERYTHING)
+
+		# Draws tables which have moved into view, or onto a floor
+		for floor in self.floors.values():
+			floor.view_changed()
+		self.floor_picker["values"] = sorted(set(data.floors()) | set(self.floors) | {DEFAULT_FLOOR})
+		self.callback() # Table numbers may have changed
 
 	def commit(self):
-		"""Uploads changes to properties and commits to the db"""
-		for table in data.tables.values():
-			# Tables don't keep track of if they have been changed,
-			# so all are updated
-			data.cursor.execute(data.MODIFY_TABLE, (
-				table["table_number"],
-				table["capacity"],
-				table["x_pos"], table["y_pos"],
-				table["width"], table["height"],
-				table["shape"],
-				table["table_id"]
-			))
-
-		data.database.commit()
+		"""Uploads changed tables and commits to the db"""
+		data.flush_tables()
+
+	def autosave(self):
+		"""Periodically saves table edits while in edit mode,
+		so they are not lost if the program stops"""
+		self.commit()
+		self.autosave_timer = self.after(AUTOSAVE_INTERVAL, self.autosave)
 
 	def toggle_editing(self):
 		self.set_editing(not self.editing)
@@ -449,18 +893,25 @@ class FloorPlan(tkinter.Frame):
 
 		for table in self.tables:
 			table.set_editing(editing)
+		self.check_overlaps(self.floor.tables if editing else ())
 
 		if self.editing:
 			self.new_table.grid()
 			self.delete_table.grid()
 			self.find_button.grid()
 			self.details.grid()
+
+			if AUTOSAVE_INTERVAL and not self.autosave_timer:
+				self.autosave_timer = self.after(AUTOSAVE_INTERVAL, self.autosave)
 		else:
 			self.new_table.grid_remove()
 			self.delete_table.grid_remove()
 			self.find_button.grid_remove()
 			self.details.grid_remove()
 
+			if self.autosave_timer:
+				self.after_cancel(self.autosave_timer)
+				self.autosave_timer = None
 			self.commit()
 			self.callback()
 
@@ -469,9 +920,13 @@ class FloorPlan(tkinter.Frame):
 		if not self.selected or not self.selected.current_booking: return
 
 		if status is None:
-			status = self.selected.current_booking["status"] + 1
+			status = service.next_status(self.selected.current_booking)
 		self.selected.set_status(status)
 
+		# A booking which clashed with the last one can now be shown
+		if not self.selected.current_booking:
+			self.check_bookings([self.selected])
+
 	def toggle_ping(self):
 		"""Toggles ping on the selected table"""
 		if not self.selected or not self.selected.current_booking: return
@@ -489,42 +944,59 @@ class FloorPlan(tkinter.Frame):
 		self.menu.add_command(label="Next status", command=self.change_status)
 		self.menu.add_command(label="Toggle ping", command=self.toggle_ping)
 
-	def check_bookings(self, allow_started=False):
-		"""Starts a periodic cycle of checking for bookings that are
-		coming up soon, and displaying them on their tables"""
-		threshold = datetime.datetime.now().timestamp() + 1200 # 10 minutes in the future
-		soon = list(filter(lambda b: b["arrival"] < threshold, data.bookings.values()))
-
-		for table in self.tables:
-			for booking in soon:
-				if booking["table_id"] == table.table["table_id"] \
-						and table.current_booking != booking \
-						and booking["status"] != COMPLETED:
-					# A new booking is starting soon at this table
-					if table.current_booking and not allow_started:
-						args = (
-							table.table["table_number"],
-							datetime.datetime.fromtimestamp(table.current_booking["arrival"]).strftime("%H:%M")
-						)
-						tkinter.messagebox.showerror("Booking Clash", "There is a booking at table {} for {}, but this table is still occupied.".format(*args))
-					else:
-						table.current_booking = booking
-						table.update_text()
-
-						# Don't allocate someone who isn't here
-						possible = list(filter(lambda k: data.members[k]["present"], data.current_work.keys()))
-						if possible:
-							waiter = data.members[min(possible, key=data.current_work.get)]
-							table.set_waiter(waiter)
-					soon.remove(booking)
-					break
-		# Set a delay before calling this again
-		self.after(10000, self.check_bookings)
-
-	def animate_pings(self):
-		"""Periodically tells all the tables with pings to flash"""
-		self.flash = not self.flash
+	def bookings_changed(self, booking_ids):
+		"""Updates the tables showing bookings which have been added,
+		changed or deleted, once their changes are in the cache"""
+		affected = set()
+		for id in booking_ids:
+			booking = data.bookings.get(id)
+			if booking and booking["table_id"] in self.by_id:
+				affected.add(self.by_id[booking["table_id"]])
 
 		for table in self.tables:
-			table.set_flash(self.flash)
-		self.after(500, self.animate_pings)
+			booking = table.current_booking
+			if not booking or booking["booking_id"] not in booking_ids: continue
+			affected.add(table)
+
+			if data.bookings.get(booking["booking_id"]) is not booking \
+					or booking["table_id"] != table.table["table_id"]:
+				# Deleted or moved to another table
+				table.current_booking = None
+				table.set_ping(False)
+				table.set_waiter(None)
+			else:
+				table.set_ping(bool(booking["ping"]))
+				table.set_waiter(data.members.get(booking["member_id"]))
+			table.update_text()
+
+		self.check_bookings(affected)
+
+	def bookings_due(self, bookings):
+		"""Called by the scheduler when bookings are coming up soon"""
+		table_ids = {booking["table_id"] for booking in bookings}
+		self.check_bookings([table for table in self.tables if table.table["table_id"] in table_ids])
+
+	@metrics.timed("floorplan.check_bookings")
+	def check_bookings(self, tables=None, allow_started=False):
+		"""Checks for bookings that are coming up soon at the given tables,
+		or all tables, and displays them on their tables"""
+		now = service.now()
+
+		for table in self.tables if tables is None else tables:
+			booking, clash = service.due_booking(table.table["table_id"], table.current_booking, allow_started, now)
+
+			# A new booking is starting soon at this table
+			if clash:
+				args = (
+					table.table["table_number"],
+					datetime.datetime.fromtimestamp(table.current_booking["arrival"]).strftime("%H:%M")
+				)
+				tkinter.messagebox.showerror("Booking Clash", "There is a booking at table {} for {}, but this table is still occupied.".format(*args))
+			elif booking:
+				table.current_booking = booking
+				table.set_ping(bool(booking["ping"])) # Pings are kept over restarts
+				table.update_text()
+
+				waiter = service.pick_waiter(booking)
+				if waiter:
+					table.set_waiter(waiter)
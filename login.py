@@ -1,14 +1,32 @@
-import data, util, tkinter, sqlite3
+import data, util, tkinter, hmac
 from constants import *
 
 member = None # The currently logged in member
 
 def can_login(member_id, password):
-	salt = data.get_salt(member_id)
-	password = data.hash(password, salt)
+	"""Checks a member's password. Runs on a data.hasher thread.
 
-	data.cursor.execute(data.CAN_LOGIN, (sqlite3.Binary(password), member_id))
-	return bool(data.cursor.fetchone()[0])
+	Passwords hashed with an older KDF are rehashed with the current one"""
+	data.writer.flush() # The password may have just been changed
+	stored = data.staff_db.get_login(member_id)
+	if not stored: return False
+
+	hashed, salt, kdf = stored
+	if not kdf or not hmac.compare_digest(data.hash(password, salt, kdf), hashed):
+		return False
+
+	if kdf != PASSWORD_KDF:
+		save_password(member_id, password)
+	return True
+
+def save_password(member_id, password):
+	"""Hashes and saves a new password. Runs on a data.hasher thread"""
+	salt = data.gen_salt()
+	data.writer.submit(data.staff_db.set_password, member_id, data.hash(password, salt), salt, PASSWORD_KDF)
+
+def set_password(member_id, password):
+	"""Saves a new password for a member without waiting for it to be hashed"""
+	data.hasher.submit(save_password, member_id, password)
 
 class LoginForm(tkinter.Frame):
 	def __init__(self, callback, master=None):
@@ -16,7 +34,9 @@ class LoginForm(tkinter.Frame):
 		self.callback = callback
 
 		tkinter.Label(self, text="User ID").grid(row=0, sticky=E)
-		self.name = tkinter.Entry(self)
+		self.name_var = tkinter.StringVar(self)
+		self.name_var.trace("w", lambda a, b, c: self.show_candidates())
+		self.name = tkinter.Entry(self, textvariable=self.name_var)
 		self.name.grid(row=0, column=1, sticky=EW)
 
 		tkinter.Label(self, text="Password").grid(row=1, sticky=E)
@@ -26,6 +46,15 @@ class LoginForm(tkinter.Frame):
 		self.submit = tkinter.Button(self, text="Log In", command=self.login)
 		self.submit.grid(row=2, column=0, columnspan=2, pady=5, sticky=E)
 
+		# Members matching the name typed so far
+		self.candidates = tkinter.Listbox(self, height=5, exportselection=False)
+		self.candidates.grid(row=3, column=1, sticky=EW)
+		self.candidates.bind("<<ListboxSelect>>", self.pick_candidate)
+		self.candidate_ids = []
+		self.show_candidates()
+
+		self.checking = False # Whether a password is being checked
+
 		self.columnconfigure(1, weight=1)
 		self.columnconfigure(2, weight=2)
 
@@ -34,8 +63,32 @@ class LoginForm(tkinter.Frame):
 		self.password.bind("<Return>", self.login)
 		self.submit.bind("<Return>", self.login)
 
+	def show_candidates(self):
+		"""Lists the members whose names start with what has been typed"""
+		name = self.name_var.get()
+		self.candidate_ids = data.name_index.candidates(name) \
+			if name and not name.isnumeric() else []
+
+		self.candidates.delete(0, END)
+		for id in self.candidate_ids:
+			self.candidates.insert(END, "{first_name} {last_name} ({member_id})".format(**data.members[id]))
+
+		if self.candidate_ids:
+			self.candidates.grid()
+		else:
+			self.candidates.grid_remove()
+
+	def pick_candidate(self, e=None):
+		"""Fills in the ID of the member picked from the candidates"""
+		selection = self.candidates.curselection()
+		if selection:
+			self.name_var.set(str(self.candidate_ids[selection[0]]))
+			self.password.focus_set()
+
 	def login(self, e=None):
 		"""Processes submitting the login form"""
+		if self.checking: return
+
 		name = self.name.get()
 		# Need to have an ID to look up in the db
 		if not name.isnumeric():
@@ -44,16 +97,31 @@ class LoginForm(tkinter.Frame):
 			member_id = int(name)
 
 		if member_id in data.members:
-			member = data.members[member_id]
-
-			if can_login(member_id, self.password.get()):
-				self.callback(member)
-				tkinter.messagebox.showinfo("Login Successful", "You are now logged in as {}, member ID {}".format(util.unique_name(member), member["member_id"]))
-				# A successful login clears the name field
-				self.name.delete(0, END)
-			else:
-				tkinter.messagebox.showerror("Login failed", "Invalid password for {first_name} {last_name}.".format(**member))
+			self.checking = True
+			self.wait(data.hasher.submit(can_login, member_id, self.password.get()), data.members[member_id])
 		else:
 			tkinter.messagebox.showerror("Login failed", "Member \"{}\" not found.".format(self.name.get()))
+			self.password.delete(0, END)
+
+	def wait(self, future, member):
+		"""Waits for the password to be checked without blocking the UI"""
+		if not future.done():
+			self.after(20, self.wait, future, member)
+			return
+		self.checking = False
+
+		try:
+			logged_in = future.result()
+		except Exception as error: # E.g. the database was busy, or the password's KDF is unknown
+			logged_in = None
+			tkinter.messagebox.showerror("Login failed", "The password could not be checked:\n{}".format(error))
+
+		if logged_in:
+			self.callback(member)
+			tkinter.messagebox.showinfo("Login Successful", "You are now logged in as {}, member ID {}".format(util.unique_name(member), member["member_id"]))
+			# A successful login clears the name field
+			self.name.delete(0, END)
+		elif logged_in is not None:
+			tkinter.messagebox.showerror("Login failed", "Invalid password for {first_name} {last_name}.".format(**member))
 		# Both successful and unsuccessful logins clear the password field
 		self.password.delete(0, END)
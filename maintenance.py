@@ -0,0 +1,80 @@
+import data, repository, sqlite3, threading, datetime
+from constants import *
+
+def archive(now):
+	"""Moves old completed and expired bookings into the history table,
+	returning the IDs of the bookings that were moved"""
+	return data.booking_db.archive(now - BOOKING_RETENTION, now)
+
+def prune(now):
+	"""Deletes changes old enough that everyone has picked them up"""
+	data.change_db.prune(now - CHANGELOG_RETENTION)
+
+def tidy():
+	"""Refreshes the query planner's statistics and frees unused pages"""
+	connection = repository.connection()
+
+	# Databases made before incremental vacuuming was turned on need one
+	# full vacuum before it applies
+	if connection.execute("PRAGMA auto_vacuum;").fetchone()[0] != 2:
+		connection.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+		connection.execute("VACUUM;")
+
+	connection.execute("ANALYZE;")
+	connection.execute("PRAGMA incremental_vacuum;").fetchall()
+
+class Maintenance:
+	"""Periodically runs the archive and tidy jobs on a background thread,
+	then hands the archived bookings to the callback on the main thread.
+	Errors which keep happening are passed to the error callback"""
+	def __init__(self, widget, callback, errorcallback):
+		self.widget = widget
+		self.callback = callback
+		self.errorcallback = errorcallback
+
+		self.thread = None
+		self.archived = []
+		self.error = None
+		self.failures = 0 # Runs in a row which have failed
+		self.timer = None
+
+	def start(self, delay=10000):
+		"""Runs the first maintenance shortly after startup"""
+		self.timer = self.widget.after(delay, self.run)
+
+	def run(self):
+		self.thread = threading.Thread(target=self.work, daemon=True)
+		self.thread.start()
+		self.timer = self.widget.after(200, self.poll)
+
+	def work(self):
+		try: # Runs on this thread's own connection
+			now = datetime.datetime.now().timestamp()
+			self.archived = archive(now)
+			prune(now)
+			tidy()
+		except sqlite3.Error as error:
+			self.error = error # Tried again next time, the database was probably busy
+		finally:
+			repository.close()
+
+	def poll(self):
+		"""Waits on the main thread for the background job to finish"""
+		if self.thread.is_alive():
+			self.timer = self.widget.after(200, self.poll)
+			return
+
+		archived, self.archived = self.archived, []
+		if archived:
+			self.callback(archived)
+
+		error, self.error = self.error, None
+		self.failures = self.failures + 1 if error else 0
+		if self.failures == MAINTENANCE_FAILURES: # Only reported once until it works again
+			self.errorcallback(error)
+		self.timer = self.widget.after(MAINTENANCE_INTERVAL, self.run)
+
+	def stop(self):
+		"""Waits for a running job to finish, so it isn't cut off on exit"""
+		if self.thread:
+			self.thread.join()
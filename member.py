@@ -1,6 +1,15 @@
-import login, data, tkinter, sqlite3
+import login, data, records, metrics, virtuallist, tkinter, sqlite3
 from constants import *
 
+def member_text(member):
+	"""The text of a member's row in the list of members"""
+	return "{first_name} {last_name}".format(**member)
+
+# Members are listed by name
+MEMBER_SORTS = {
+	"Name": lambda member: (member["first_name"].lower(), member["last_name"].lower())
+}
+
 class MemberForm(tkinter.LabelFrame):
 	def __init__(self, add_id, master=None, text=None):
 		tkinter.LabelFrame.__init__(self, master, text=text)
@@ -160,11 +169,8 @@ class MemberManager(tkinter.Frame):
 		panes.grid(padx=5, pady=5, sticky=NSEW)
 
 		# Left pane, list of members
-		self.members = tkinter.Listbox(panes)
-		self.member_ids = []
-
+		self.members = virtuallist.VirtualList(data.members, member_text, MEMBER_SORTS, self.select, panes)
 		self.populate_list()
-		self.members.bind("<<ListboxSelect>>", self.select)
 		panes.add(self.members)
 
 		self.init_forms(panes)
@@ -174,60 +180,71 @@ class MemberManager(tkinter.Frame):
 		self.select()
 		self.set_show()
 
+	@metrics.timed("members.populate_list")
 	def populate_list(self):
 		"""Grabs members from the database cache and adds them to the list"""
-		self.members.delete(0, END)
-		self.member_ids.clear()
-
-		for member in data.members.values():
-			self.members.insert(END, member["first_name"])
-			self.member_ids.append(member["member_id"])
+		self.members.load()
 
 	# Callbacks for different forms
 
 	def member_added(self, member):
 		"""Adds a new member to the database"""
-		salt = data.gen_salt()
-		password = data.hash(member["password"], salt)
-		data.cursor.execute(data.ADD_EMPLOYEE, (member["first_name"], member["last_name"], member["phone_number"], member["permission"], sqlite3.Binary(password), sqlite3.Binary(salt)))
-		data.database.commit()
-
-		member["member_id"] = data.cursor.lastrowid
+		member = records.Member(**member)
+		try: # Needs to wait for the new ID
+			member["member_id"] = data.writer.submit(data.staff_db.add, dict(member)).result()
+		except sqlite3.Error:
+			return # The main window reports the error
+
+		# The password is hashed and saved in the background
+		login.set_password(member["member_id"], member["password"])
 		member["password"] = ""
 		data.members[member["member_id"]] = member
-		data.current_work[member["member_id"]] = 0
+		data.name_index.add(member)
+		data.display_names.add(member)
+		data.loads.add(member["member_id"])
 
 		if len(data.members) == 1: # Can log out from default admin
 			self.login_callback(member)
 			self.add_member.admin_button["state"] = NORMAL
 
-		self.populate_list()
+		self.members.insert(member["member_id"])
 
 	def member_modified(self, member):
 		"""Updates the given member with the new information"""
-		data.cursor.execute(data.MODIFY_EMPLOYEE, (member["first_name"], member["last_name"], member["phone_number"], member["permission"], member["member_id"]))
+		data.writer.submit(data.staff_db.modify, dict(member))
 
 		# Updates the member's password, when necessary
 		if member["password"]:
-			salt = data.gen_salt()
-			password = data.hash(member["password"], salt)
-			data.cursor.execute(data.MODIFY_PASSWORD, (sqlite3.Binary(password), sqlite3.Binary(salt), member["member_id"]))
-
+			login.set_password(member["member_id"], member["password"])
 			member["password"] = ""
 
-		data.database.commit()
-		self.populate_list()
+		data.name_index.update(member)
+		data.display_names.update(member)
+		self.members.update(member["member_id"])
 
 	def member_deleted(self, member):
 		"""Removes a member from the database"""
-		data.cursor.execute(data.DELETE_EMPLOYEE, (member["member_id"], ))
-		data.database.commit()
+		data.writer.submit(data.staff_db.delete, member["member_id"])
 
 		del data.members[member["member_id"]]
-		del data.current_work[member["member_id"]]
-		self.populate_list()
+		data.name_index.remove(member["member_id"])
+		data.display_names.remove(member["member_id"])
+		data.loads.remove(member["member_id"])
+		self.members.remove(member["member_id"])
 		self.select()
 
+	def members_changed(self, member_ids):
+		"""Updates the rows of members changed by another program"""
+		self.members.refresh(member_ids)
+
+		member = self.edit_member.member
+		if member and member["member_id"] in member_ids:
+			if member["member_id"] not in data.members:
+				self.edit_member.member = None # Nothing left to save
+				self.select()
+			elif not self.edit_member.modified:
+				self.edit_member.load(member)
+
 	# End callbacks
 
 	def set_show(self):
@@ -252,13 +269,10 @@ class MemberManager(tkinter.Frame):
 
 		panes.add(forms)
 
-	def select(self, event=None):
+	def select(self, member_id=None):
 		"""Shows and hides the edit member form when necessary"""
-		member = self.members.curselection()
-		if member:
+		if member_id is not None:
 			self.edit_member.grid()
-
-			member = data.members[self.member_ids[member[0]]]
-			self.edit_member.load(member)
+			self.edit_member.load(data.members[member_id])
 		else:
 			self.edit_member.grid_remove()
@@ -0,0 +1,137 @@
+import time, json, os, bisect, threading, functools
+from constants import *
+
+# Collects counts, sizes and timings of the program's hot paths.
+# While disabled, instrumented code only checks the enabled flag,
+# and gauges are only read when a snapshot is taken
+
+enabled = METRICS_ENABLED
+
+# In milliseconds, the upper bounds of the buckets of each histogram
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf"))
+
+class Counter:
+	def __init__(self):
+		self.value = 0
+
+	def add(self, amount=1):
+		self.value += amount
+
+	def snapshot(self):
+		return {"type": "counter", "value": self.value}
+
+	def reset(self):
+		self.value = 0
+
+class Gauge:
+	"""A value which is read when it is wanted, such as the size of a cache"""
+	def __init__(self, function):
+		self.function = function
+
+	def snapshot(self):
+		return {"type": "gauge", "value": self.function()}
+
+	def reset(self):
+		pass
+
+class Histogram:
+	"""Counts how many times fell into each of BUCKETS, along with the
+	total and longest time, so percentiles can be estimated"""
+	def __init__(self):
+		self.lock = threading.Lock() # Statements are timed on several threads
+		self.reset()
+
+	def observe(self, seconds):
+		milliseconds = seconds * 1000
+		with self.lock:
+			self.counts[bisect.bisect_left(BUCKETS, milliseconds)] += 1
+			self.count += 1
+			self.total += milliseconds
+			self.longest = max(self.longest, milliseconds)
+
+	def percentile(self, fraction):
+		"""Gives the bucket bound below which the fraction of times fell"""
+		wanted = fraction * self.count
+		seen = 0
+		for bound, count in zip(BUCKETS, self.counts):
+			seen += count
+			if seen >= wanted:
+				return min(bound, self.longest)
+		return self.longest
+
+	def snapshot(self):
+		with self.lock:
+			return {
+				"type": "histogram",
+				"count": self.count,
+				"total_ms": self.total,
+				"mean_ms": self.total / self.count if self.count else 0,
+				"p50_ms": self.percentile(0.5),
+				"p95_ms": self.percentile(0.95),
+				"max_ms": self.longest,
+				"buckets": {str(bound): count for bound, count in zip(BUCKETS, self.counts) if count}
+			}
+
+	def reset(self):
+		with self.lock:
+			self.counts = [0] * len(BUCKETS)
+			self.count = 0
+			self.total = 0
+			self.longest = 0
+
+class Registry:
+	"""Every metric by name. Asking for a metric again gives the same one"""
+	def __init__(self):
+		self.metrics = {}
+
+	def get(self, name, kind, *args):
+		if name not in self.metrics:
+			self.metrics[name] = kind(*args)
+		return self.metrics[name]
+
+	def snapshot(self):
+		"""Gives the current value of every metric, by name"""
+		return {name: metric.snapshot() for name, metric in sorted(self.metrics.items())}
+
+	def reset(self):
+		for metric in self.metrics.values():
+			metric.reset()
+
+registry = Registry()
+
+def counter(name):
+	return registry.get(name, Counter)
+
+def gauge(name, function):
+	return registry.get(name, Gauge, function)
+
+def histogram(name):
+	return registry.get(name, Histogram)
+
+def observe(name, seconds):
+	histogram(name).observe(seconds)
+
+def timed(name):
+	"""Decorates a function so the time of each call is recorded while enabled"""
+	def decorate(function):
+		times = histogram(name)
+
+		@functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			if not enabled:
+				return function(*args, **kwargs)
+			start = time.perf_counter()
+			try:
+				return function(*args, **kwargs)
+			finally:
+				times.observe(time.perf_counter() - start)
+		return wrapper
+	return decorate
+
+def dump(path):
+	"""Writes a snapshot of every metric to a file as JSON. The file is
+	replaced in one go, so readers never see half of it"""
+	temporary = path + ".tmp"
+	with open(temporary, "w") as output:
+		json.dump({"time": time.time(), "metrics": registry.snapshot()}, output, indent=1)
+	os.replace(temporary, path)
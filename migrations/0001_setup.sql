@@ -1,3 +1,7 @@
+/* Lets the maintenance job hand back free pages a few at a time.
+Only takes effect when the database is first created */
+PRAGMA auto_vacuum = INCREMENTAL;
+
 /* Stores the floor plan layout */
 CREATE TABLE IF NOT EXISTS layout_table (
 	table_id     INTEGER     PRIMARY KEY,
@@ -32,3 +36,16 @@ CREATE TABLE IF NOT EXISTS booking (
 	status       INTEGER     NOT NULL DEFAULT 0,
 	ping         BOOLEAN     NOT NULL DEFAULT 0
 );
+
+
+/* Stores bookings which have been completed or have expired */
+CREATE TABLE IF NOT EXISTS booking_history (
+	booking_id   INTEGER     PRIMARY KEY,
+	customer     CHAR(16)    NOT NULL DEFAULT "",
+	member_id    INTEGER,
+	table_id     INTEGER     NOT NULL,
+	arrival      INTEGER     NOT NULL,
+	status       INTEGER     NOT NULL DEFAULT 0,
+	ping         BOOLEAN     NOT NULL DEFAULT 0,
+	archived     INTEGER     NOT NULL
+);
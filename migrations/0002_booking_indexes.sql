@@ -0,0 +1,5 @@
+/* Indexes for the booking queries which run most often */
+CREATE INDEX IF NOT EXISTS booking_arrival ON booking (arrival);
+CREATE INDEX IF NOT EXISTS booking_status ON booking (status);
+
+CREATE INDEX IF NOT EXISTS booking_history_table_arrival ON booking_history (table_id, arrival);
@@ -0,0 +1,3 @@
+/* Records how each password was hashed, so the cost can be raised later.
+Passwords saved before this were hashed with a single SHA-256 */
+ALTER TABLE staff ADD COLUMN kdf VARCHAR(64) NOT NULL DEFAULT 'sha256';
@@ -0,0 +1,5 @@
+/* Splits the floor plan into separately shown floors or sections.
+Tables laid out before this are all put on the main floor */
+ALTER TABLE layout_table ADD COLUMN floor VARCHAR(64) NOT NULL DEFAULT 'Main';
+
+CREATE INDEX IF NOT EXISTS layout_table_floor ON layout_table (floor);
@@ -0,0 +1,13 @@
+/* Records every change to the staff, tables and bookings, so each
+program sharing the database can pick up the others' changes.
+origin is the program which made the change, changed is when */
+CREATE TABLE IF NOT EXISTS changelog (
+	revision     INTEGER     PRIMARY KEY AUTOINCREMENT,
+	entity       VARCHAR(16) NOT NULL,
+	row_id       INTEGER     NOT NULL,
+	action       VARCHAR(8)  NOT NULL,
+	origin       VARCHAR(32) NOT NULL,
+	changed      REAL        NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS changelog_changed ON changelog (changed);
@@ -0,0 +1,8 @@
+/* Records how many people each booking is for and how long, in seconds,
+they are expected to stay. Bookings made before this are for one person,
+staying as long as the estimated time between each status adds up to */
+ALTER TABLE booking ADD COLUMN party_size INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE booking ADD COLUMN duration INTEGER NOT NULL DEFAULT 4200;
+
+ALTER TABLE booking_history ADD COLUMN party_size INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE booking_history ADD COLUMN duration INTEGER NOT NULL DEFAULT 4200;
@@ -0,0 +1,39 @@
+/* Stops booking IDs being handed out again once the newest bookings are
+archived, which would clash with them in booking_history. Only AUTOINCREMENT
+keeps track of the highest ID used, so the table is rebuilt with it */
+CREATE TABLE booking_new (
+	booking_id   INTEGER     PRIMARY KEY AUTOINCREMENT,
+	customer     CHAR(16)    NOT NULL DEFAULT "",
+	member_id    INTEGER,
+	table_id     INTEGER     NOT NULL,
+	arrival      INTEGER     NOT NULL,
+	status       INTEGER     NOT NULL DEFAULT 0,
+	ping         BOOLEAN     NOT NULL DEFAULT 0,
+	party_size   INTEGER     NOT NULL DEFAULT 1,
+	duration     INTEGER     NOT NULL DEFAULT 4200
+);
+
+/* New IDs start after the highest used by either table */
+INSERT INTO sqlite_sequence (name, seq)
+SELECT 'booking_new', MAX(
+	(SELECT COALESCE(MAX(booking_id), 0) FROM booking),
+	(SELECT COALESCE(MAX(booking_id), 0) FROM booking_history));
+
+INSERT INTO booking_new (booking_id, customer, member_id, table_id, arrival, status, ping, party_size, duration)
+SELECT booking_id, customer, member_id, table_id, arrival, status, ping, party_size, duration
+FROM booking
+WHERE booking_id NOT IN (SELECT booking_id FROM booking_history);
+
+/* Bookings which already reused an archived booking's ID are given new ones */
+INSERT INTO booking_new (customer, member_id, table_id, arrival, status, ping, party_size, duration)
+SELECT customer, member_id, table_id, arrival, status, ping, party_size, duration
+FROM booking
+WHERE booking_id IN (SELECT booking_id FROM booking_history)
+ORDER BY booking_id;
+
+DROP TABLE booking;
+ALTER TABLE booking_new RENAME TO booking;
+
+CREATE INDEX IF NOT EXISTS booking_arrival ON booking (arrival);
+CREATE INDEX IF NOT EXISTS booking_status ON booking (status);
+/* booking_table_arrival is left out, as no query used it */
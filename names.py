@@ -0,0 +1,170 @@
+import bisect
+
+class NameIndex:
+	"""A sorted index of members' full names for looking people up by name.
+
+	Names are stored lowercased, so the closest match to a typed name
+	is always next to where it would be inserted"""
+	def __init__(self):
+		self.names = []   # Lowercased full names, sorted
+		self.entries = [] # (rank, member_id) for each name
+		self.keys = {}    # member_id -> (name, rank) it is stored under
+		self.next_rank = 0
+
+	def full_name(self, member):
+		return (member["first_name"] + " " + member["last_name"]).lower()
+
+	def rebuild(self, members):
+		"""Indexes every member, ranking them in the order given"""
+		self.keys = {id: (self.full_name(member), rank)
+			for rank, (id, member) in enumerate(members.items())}
+		self.next_rank = len(self.keys)
+
+		pairs = sorted((name, (rank, id)) for id, (name, rank) in self.keys.items())
+		self.names = [name for name, entry in pairs]
+		self.entries = [entry for name, entry in pairs]
+
+	def add(self, member, rank=None):
+		"""Indexes a new member. Members added later lose ties to earlier ones"""
+		if rank is None:
+			rank = self.next_rank
+			self.next_rank += 1
+
+		name = self.full_name(member)
+		i = bisect.bisect_left(self.names, name)
+		while i < len(self.names) and self.names[i] == name and self.entries[i][0] < rank:
+			i += 1
+
+		self.names.insert(i, name)
+		self.entries.insert(i, (rank, member["member_id"]))
+		self.keys[member["member_id"]] = (name, rank)
+
+	def remove(self, member_id):
+		"""Removes a deleted member"""
+		name, rank = self.keys.pop(member_id)
+		i = bisect.bisect_left(self.names, name)
+		while self.entries[i] != (rank, member_id):
+			i += 1
+
+		del self.names[i]
+		del self.entries[i]
+
+	def update(self, member):
+		"""Moves a renamed member, keeping their place in any ties"""
+		rank = self.keys[member["member_id"]][1]
+		self.remove(member["member_id"])
+		self.add(member, rank)
+
+	def span(self, prefix):
+		"""Gives the range of names starting with the prefix"""
+		return bisect.bisect_left(self.names, prefix), \
+			bisect.bisect_left(self.names, prefix + "\U0010ffff")
+
+	def find(self, name):
+		"""Finds the member whose full name shares the longest prefix
+		with the given name, case-insensitively, or -1 if none do.
+
+		Ties go to whoever was indexed first, the same as util.find_by_name"""
+		name = name.lower()
+		i = bisect.bisect_left(self.names, name)
+
+		# The longest shared prefix is always with one of the neighbours
+		longest = 0
+		for neighbour in self.names[max(i - 1, 0):i + 1]:
+			longest = max(longest, common_prefix(name, neighbour))
+		if not longest:
+			return -1
+
+		low, high = self.span(name[:longest])
+		return min(self.entries[low:high])[1]
+
+	def candidates(self, prefix, limit=5):
+		"""Lists the IDs of members whose names start with the prefix,
+		in alphabetical order"""
+		low, high = self.span(prefix.lower())
+		return [id for rank, id in self.entries[low:min(high, low + limit)]]
+
+class DisplayNames:
+	"""Keeps the shortest name which tells each member apart from the rest.
+
+	Only members sharing a first name affect each other, so when one is
+	added, renamed or deleted only their first name group is worked out again"""
+	def __init__(self):
+		self.names = {}  # member_id -> display name
+		self.groups = {} # first name -> {member_id: member}
+		self.first = {}  # member_id -> first name they are grouped under
+
+	def __getitem__(self, member_id):
+		return self.names[member_id]
+
+	def __contains__(self, member_id):
+		return member_id in self.names
+
+	def rebuild(self, members):
+		self.names.clear()
+		self.groups.clear()
+		self.first.clear()
+
+		for member in members.values():
+			self.groups.setdefault(member["first_name"], {})[member["member_id"]] = member
+			self.first[member["member_id"]] = member["first_name"]
+		for first_name in self.groups:
+			self.refresh(first_name)
+
+	def add(self, member):
+		self.remove(member["member_id"]) # Handles renames
+		self.groups.setdefault(member["first_name"], {})[member["member_id"]] = member
+		self.first[member["member_id"]] = member["first_name"]
+		self.refresh(member["first_name"])
+
+	def remove(self, member_id):
+		if member_id not in self.first: return
+		first_name = self.first.pop(member_id)
+		del self.names[member_id]
+		del self.groups[first_name][member_id]
+		self.refresh(first_name)
+
+	def update(self, member):
+		"""Moves a renamed member, reworking their old and new groups"""
+		self.add(member)
+
+	def refresh(self, first_name):
+		"""Works out the display names of everyone with a first name"""
+		group = self.groups.get(first_name)
+		if not group:
+			self.groups.pop(first_name, None)
+			return
+
+		# A last name's longest shared prefix is with a neighbour once sorted
+		ordered = sorted(group.values(), key=lambda member: member["last_name"])
+		for i, member in enumerate(ordered):
+			shared = -1 # No one else shares the first name
+			for other in ordered[max(i - 1, 0):i] + ordered[i + 1:i + 2]:
+				shared = max(shared, common_prefix(member["last_name"], other["last_name"]))
+			self.names[member["member_id"]] = display_name(member, shared)
+
+	def compute(self, member):
+		"""Works out a display name for someone who isn't indexed"""
+		shared = -1
+		for other in self.groups.get(member["first_name"], {}).values():
+			if other is not member:
+				shared = max(shared, common_prefix(member["last_name"], other["last_name"]))
+		return display_name(member, shared)
+
+def display_name(member, shared):
+	"""Builds a member's display name, given the longest prefix their last
+	name shares with anyone else with the same first name, or -1 if no one"""
+	name = member["first_name"]
+	if shared == -1:
+		return name
+	elif shared < len(member["last_name"]):
+		return name + " " + member["last_name"][:shared + 1]
+	else: # Can't be told apart by name
+		return name + " " + member["last_name"] + " " + str(member["member_id"])
+
+def common_prefix(a, b):
+	"""Finds the length of the common prefix of a and b"""
+	high = min(len(a), len(b))
+	for i in range(high):
+		if a[i] != b[i]: return i
+	return high
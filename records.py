@@ -0,0 +1,86 @@
+from constants import *
+
+class Record:
+	"""A compact record with a fixed set of fields.
+
+	Records use __slots__ rather than a dict per row, but can still be
+	indexed by field name like the dicts the rest of the program uses.
+	Fields are in the same order as the columns the database returns"""
+	__slots__ = ()
+
+	def __getitem__(self, key):
+		try:
+			return getattr(self, key)
+		except (AttributeError, TypeError):
+			raise KeyError(key)
+
+	def __setitem__(self, key, value):
+		try:
+			setattr(self, key, value)
+		except AttributeError:
+			raise KeyError(key)
+
+	def __contains__(self, key):
+		return key in self.__slots__
+
+	def get(self, key, default=None):
+		return getattr(self, key, default) if key in self.__slots__ else default
+
+	def keys(self):
+		return self.__slots__
+
+	def assign(self, *values):
+		"""Overwrites fields in column order, keeping the same record"""
+		for name, value in zip(self.__slots__, values):
+			setattr(self, name, value)
+
+	def __repr__(self):
+		return "{}({})".format(type(self).__name__,
+			", ".join("{}={!r}".format(name, getattr(self, name)) for name in self.__slots__))
+
+# Each record takes its fields either in column order or by name.
+# Unknown names are ignored, so forms can pass in extra fields
+
+class Member(Record):
+	__slots__ = ("member_id", "first_name", "last_name", "phone_number", "present", "permission", "password")
+
+	def __init__(self, member_id=None, first_name="", last_name="", phone_number="",
+			present=False, permission=False, password="", **ignored):
+		self.member_id = member_id
+		self.first_name = first_name
+		self.last_name = last_name
+		self.phone_number = phone_number
+		self.present = present
+		self.permission = permission
+		self.password = password # Only set while a new password is being saved
+
+class Table(Record):
+	__slots__ = ("table_id", "table_number", "capacity", "x_pos", "y_pos", "width", "height", "shape", "floor")
+
+	def __init__(self, table_id=None, table_number="", capacity=0, x_pos=0, y_pos=0,
+			width=100, height=100, shape=0, floor=DEFAULT_FLOOR, **ignored):
+		self.table_id = table_id
+		self.table_number = table_number
+		self.capacity = capacity
+		self.x_pos = x_pos
+		self.y_pos = y_pos
+		self.width = width
+		self.height = height
+		self.shape = shape
+		self.floor = floor
+
+class Booking(Record):
+	__slots__ = ("booking_id", "customer", "member_id", "table_id", "arrival", "status", "ping",
+		"party_size", "duration")
+
+	def __init__(self, booking_id=None, customer="", member_id=None, table_id=None,
+			arrival=0, status=EMPTY, ping=False, party_size=1, duration=DEFAULT_DURATION, **ignored):
+		self.booking_id = booking_id
+		self.customer = customer
+		self.member_id = member_id
+		self.table_id = table_id
+		self.arrival = arrival
+		self.status = status
+		self.ping = ping
+		self.party_size = party_size
+		self.duration = duration # In seconds
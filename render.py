@@ -0,0 +1,93 @@
+# Parts of a table which can need redrawing
+POSITION = "position"
+SIZE     = "size"
+SHAPE    = "shape"
+CHAIRS   = "chairs"
+TEXT     = "text"
+WAITER   = "waiter"
+
+EVERYTHING = frozenset((POSITION, SIZE, SHAPE, CHAIRS, TEXT, WAITER))
+# Changes which mean the table has to be laid out again, rather than just moved
+LAYOUT = frozenset((SIZE, SHAPE, CHAIRS))
+
+class RenderScheduler:
+	"""Collects which parts of each table have changed, and redraws
+	every changed table once when Tk is next idle.
+
+	Dragging a table or typing in its details can change it many times
+	between frames, but only the last state needs drawing"""
+	def __init__(self, widget, callback=None):
+		self.widget = widget
+		self.callback = callback # Called with the changes once they are drawn
+
+		self.changes = {} # Table -> set of parts to redraw
+		self.pending = None
+
+	def invalidate(self, table, *parts):
+		"""Marks parts of a table to be redrawn"""
+		self.changes.setdefault(table, set()).update(parts)
+		if self.pending is None:
+			self.pending = self.widget.after_idle(self.flush)
+
+	def discard(self, table):
+		"""Forgets the changes to a table which has been removed"""
+		self.changes.pop(table, None)
+
+	def flush(self):
+		"""Redraws every changed table straight away"""
+		if self.pending is not None:
+			self.widget.after_cancel(self.pending)
+			self.pending = None
+
+		changes, self.changes = self.changes, {}
+		for table, parts in changes.items():
+			table.render(parts)
+
+		if changes and self.callback:
+			self.callback(changes)
+
+# In milliseconds, how often pinged tables flash
+PING_INTERVAL = 500
+# Tag given to the shapes of pinged tables, so they can be flashed together
+PING_TAG = "pinged"
+
+class PingAnimator:
+	"""Flashes the outlines of pinged tables.
+
+	Only the pinged tables are restyled, all with a single itemconfig,
+	and the timer only runs while at least one table is pinged"""
+	def __init__(self, canvas):
+		self.canvas = canvas
+
+		self.tables = set()
+		self.flash = False
+		self.timer = None
+
+	def add(self, table):
+		"""Starts flashing a table, or retags it after its shape is replaced"""
+		self.tables.add(table)
+		self.canvas.addtag_withtag(PING_TAG, table.shape)
+		self.canvas.itemconfig(table.shape, outline="red" if self.flash else "black", width=4)
+
+		if self.timer is None:
+			self.timer = self.canvas.after(PING_INTERVAL, self.animate)
+
+	def discard(self, table):
+		"""Stops flashing a table"""
+		if table not in self.tables: return
+		self.tables.remove(table)
+		self.canvas.dtag(table.shape, PING_TAG)
+		self.canvas.itemconfig(table.shape, outline="black", width=2)
+
+		if not self.tables:
+			self.stop()
+
+	def animate(self):
+		self.flash = not self.flash
+		self.canvas.itemconfig(PING_TAG, outline="red" if self.flash else "black")
+		self.timer = self.canvas.after(PING_INTERVAL, self.animate)
+
+	def stop(self):
+		if self.timer:
+			self.canvas.after_cancel(self.timer)
+			self.timer = None
@@ -0,0 +1,417 @@
+import sqlite3, threading, uuid, time, metrics
+from constants import *
+
+# Named sets of pragmas to tune the database for different machines.
+# cache_size is negative to give a size in KiB rather than pages
+STORAGE_PROFILES = {
+	# Survives power loss without losing a committed change
+	"safe": {
+		"journal_mode": "WAL",
+		"synchronous": "FULL",
+		"cache_size": -8000,
+		"mmap_size": 0
+	},
+	# WAL with NORMAL sync can only lose the last few commits on power loss
+	"balanced": {
+		"journal_mode": "WAL",
+		"synchronous": "NORMAL",
+		"cache_size": -32000,
+		"mmap_size": 268435456
+	},
+	# For large databases on machines with plenty of memory
+	"fast": {
+		"journal_mode": "WAL",
+		"synchronous": "OFF",
+		"cache_size": -131072,
+		"mmap_size": 1073741824
+	}
+}
+profile = STORAGE_PROFILE
+
+# Each thread gets its own connection, as a connection can't be shared
+local = threading.local()
+
+# Identifies this program's changes in the change log
+ORIGIN = uuid.uuid4().hex
+# What happened to each row in the change log
+ADDED, MODIFIED, DELETED = "add", "modify", "delete"
+
+def connect():
+	"""Opens a new connection to the database using the current profile"""
+	connection = sqlite3.connect(DATABASE, timeout=30, cached_statements=256)
+
+	# Has to come before the journal mode, which writes to a new database
+	connection.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+	for pragma, value in STORAGE_PROFILES[profile].items():
+		connection.execute("PRAGMA {} = {};".format(pragma, value)).fetchall()
+	return connection
+
+def connection():
+	"""Gets the calling thread's connection, opening it the first time"""
+	if getattr(local, "connection", None) is None:
+		local.connection = connect()
+	return local.connection
+
+def close():
+	"""Closes the calling thread's connection, if it has one"""
+	if getattr(local, "connection", None) is not None:
+		local.connection.close()
+		local.connection = None
+
+def timed_commit(connection):
+	"""Commits a connection, recording how long it took"""
+	if not metrics.enabled:
+		return connection.commit()
+
+	start = time.perf_counter()
+	connection.commit()
+	metrics.observe("sql.commit", time.perf_counter() - start)
+
+class Repository:
+	"""Runs one table's statements on the calling thread's connection.
+
+	Statements are kept as constant strings on each class, so sqlite3
+	reuses their compiled versions from the connection's statement cache.
+	Every change is also written to the change log, in the same transaction"""
+	ENTITY = None # Name of the table in the change log
+
+	LOG = "INSERT INTO changelog " \
+	      "(entity, row_id, action, origin, changed) " \
+	      "VALUES (?, ?, ?, ?, ?);"
+
+	names = {} # Statement -> name its time is recorded under
+
+	@classmethod
+	def name_statements(cls):
+		"""Names every statement constant after its class, such as "sql.StaffRepository.ADD" """
+		for name, value in vars(cls).items():
+			if name.isupper() and isinstance(value, str):
+				Repository.names.setdefault(value, "sql.{}.{}".format(cls.__name__, name))
+
+	def __init_subclass__(cls):
+		cls.name_statements()
+
+	def execute(self, statement, args=()):
+		if not metrics.enabled:
+			return connection().execute(statement, args)
+
+		start = time.perf_counter()
+		cursor = connection().execute(statement, args)
+		metrics.observe(self.names.get(statement, "sql.other"), time.perf_counter() - start)
+		return cursor
+
+	def execute_many(self, statement, rows):
+		if not metrics.enabled:
+			return connection().executemany(statement, rows)
+
+		start = time.perf_counter()
+		cursor = connection().executemany(statement, rows)
+		metrics.observe(self.names.get(statement, "sql.other"), time.perf_counter() - start)
+		return cursor
+
+	def log(self, action, *row_ids):
+		"""Records that rows were added, modified or deleted"""
+		changed = time.time()
+		self.execute_many(self.LOG, [(self.ENTITY, id, action, ORIGIN, changed) for id in row_ids])
+
+	def commit(self):
+		"""Commits the calling thread's connection, unless it is writing
+		a batch, in which case the batch is committed once it is done"""
+		if not getattr(local, "batch", False):
+			timed_commit(connection())
+
+Repository.name_statements()
+
+class StaffRepository(Repository):
+	ENTITY = "staff"
+
+	ADD    = "INSERT INTO staff " \
+	         "(first_name, last_name, phone_number, permission, password, salt, kdf) " \
+	         "VALUES (?, ?, ?, ?, ?, ?, ?);"
+
+	MODIFY = "UPDATE staff " \
+	         "SET first_name=?, last_name=?, phone_number=?, permission=? " \
+	         "WHERE member_id=?;"
+
+	MODIFY_PASSWORD = "UPDATE staff " \
+	         "SET password=?, salt=?, kdf=? " \
+	         "WHERE member_id=?;"
+
+	DELETE = "DELETE FROM staff " \
+	         "WHERE member_id=?;"
+
+	LIST   = "SELECT member_id, first_name, last_name, phone_number, present, permission " \
+	         "FROM staff " \
+	         "ORDER BY first_name;"
+
+	GET    = "SELECT member_id, first_name, last_name, phone_number, present, permission " \
+	         "FROM staff " \
+	         "WHERE member_id=?;"
+
+	MARK_PRESENT = "UPDATE staff " \
+	         "SET present=? " \
+	         "WHERE member_id=?;"
+
+	# Everything needed to check a password, in one query
+	GET_LOGIN = "SELECT password, salt, kdf " \
+	         "FROM staff " \
+	         "WHERE member_id=?;"
+
+	def add(self, member, password=b"", salt=b"", kdf=""):
+		"""Adds a member, returning their new ID.
+
+		Without a password nobody can log in as them until one is set"""
+		cursor = self.execute(self.ADD, (member["first_name"], member["last_name"], member["phone_number"],
+			member["permission"], sqlite3.Binary(password), sqlite3.Binary(salt), kdf))
+		self.log(ADDED, cursor.lastrowid)
+		self.commit()
+		return cursor.lastrowid
+
+	def modify(self, member):
+		"""Updates a member's details, other than their password"""
+		self.execute(self.MODIFY, (member["first_name"], member["last_name"], member["phone_number"],
+			member["permission"], member["member_id"]))
+		self.log(MODIFIED, member["member_id"])
+		self.commit()
+
+	def set_password(self, member_id, password, salt, kdf):
+		self.execute(self.MODIFY_PASSWORD, (sqlite3.Binary(password), sqlite3.Binary(salt), kdf, member_id))
+		self.log(MODIFIED, member_id)
+		self.commit()
+
+	def delete(self, member_id):
+		self.execute(self.DELETE, (member_id, ))
+		self.log(DELETED, member_id)
+		self.commit()
+
+	def mark_present(self, member_id, present):
+		self.execute(self.MARK_PRESENT, (present, member_id))
+		self.log(MODIFIED, member_id)
+		self.commit()
+
+	def list(self):
+		return self.execute(self.LIST).fetchall()
+
+	def get(self, member_id):
+		return self.execute(self.GET, (member_id, )).fetchone()
+
+	def get_login(self, member_id):
+		"""Gets a member's hashed password, salt and KDF, or None"""
+		row = self.execute(self.GET_LOGIN, (member_id, )).fetchone()
+		return (bytes(row[0]), bytes(row[1]), row[2]) if row else None
+
+class TableRepository(Repository):
+	ENTITY = "layout_table"
+
+	ADD    = "INSERT INTO layout_table " \
+	         "(table_number, capacity, x_pos, y_pos, width, height, shape, floor) " \
+	         "VALUES (?, ?, ?, ?, ?, ?, ?, ?);"
+
+	DELETE = "DELETE FROM layout_table " \
+	         "WHERE table_id=?;"
+
+	MODIFY = "UPDATE layout_table " \
+	         "SET table_number=?, capacity=?, x_pos=?, y_pos=?, width=?, height=?, shape=?, floor=? " \
+	         "WHERE table_id=?;"
+
+	# In the same order as the fields of records.Table
+	LIST   = "SELECT table_id, table_number, capacity, x_pos, y_pos, width, height, shape, floor " \
+	         "FROM layout_table;"
+
+	GET    = "SELECT table_id, table_number, capacity, x_pos, y_pos, width, height, shape, floor " \
+	         "FROM layout_table " \
+	         "WHERE table_id=?;"
+
+	def add(self, table):
+		"""Adds a table, returning its new ID.
+
+		This function does not commit the database"""
+		table_id = self.execute(self.ADD, (
+			table["table_number"],
+			table["capacity"],
+			table["x_pos"], table["y_pos"],
+			table["width"], table["height"],
+			table["shape"],
+			table["floor"]
+		)).lastrowid
+		self.log(ADDED, table_id)
+		return table_id
+
+	def delete(self, table_id):
+		"""Deletes a table. This function does not commit the database"""
+		self.execute(self.DELETE, (table_id, ))
+		self.log(DELETED, table_id)
+
+	def modify_all(self, tables):
+		"""Updates several tables, committing them along with
+		any uncommitted adds and deletes in one transaction"""
+		self.execute_many(self.MODIFY, [(
+			table["table_number"],
+			table["capacity"],
+			table["x_pos"], table["y_pos"],
+			table["width"], table["height"],
+			table["shape"],
+			table["floor"],
+			table["table_id"]
+		) for table in tables])
+		self.log(MODIFIED, *(table["table_id"] for table in tables))
+		self.commit()
+
+	def list(self):
+		return self.execute(self.LIST).fetchall()
+
+	def get(self, table_id):
+		return self.execute(self.GET, (table_id, )).fetchone()
+
+class BookingRepository(Repository):
+	ENTITY = "booking"
+
+	# In the same order as the fields of records.Booking
+	COLUMNS = "booking_id, customer, member_id, table_id, arrival, status, ping, party_size, duration"
+
+	ADD    = "INSERT INTO booking " \
+	         "(customer, table_id, arrival, party_size, duration) " \
+	         "VALUES (?, ?, ?, ?, ?);"
+
+	MODIFY = "UPDATE booking " \
+	         "SET customer=?, table_id=?, arrival=?, party_size=?, duration=? " \
+	         "WHERE booking_id=?;"
+
+	DELETE = "DELETE FROM booking " \
+	         "WHERE booking_id=?;"
+
+	SET_STATUS = "UPDATE booking " \
+	         "SET status=? " \
+	         "WHERE booking_id=?;"
+
+	SET_PING = "UPDATE booking " \
+	         "SET ping=? " \
+	         "WHERE booking_id=?;"
+
+	SET_WAITER = "UPDATE booking " \
+	         "SET member_id=? " \
+	         "WHERE booking_id=?;"
+
+	# Only loads recent bookings and those still being served
+	LIST   = "SELECT " + COLUMNS + " " \
+	         "FROM booking " \
+	         "WHERE arrival>=? OR status BETWEEN ? AND ?;"
+
+	GET    = "SELECT " + COLUMNS + " " \
+	         "FROM booking " \
+	         "WHERE booking_id=?;"
+
+	FIND   = "SELECT " + COLUMNS + " FROM booking WHERE booking_id=? " \
+	         "UNION ALL " \
+	         "SELECT " + COLUMNS + " FROM booking_history WHERE booking_id=?;"
+
+	HISTORY = "SELECT " + COLUMNS + " " \
+	         "FROM booking_history " \
+	         "WHERE table_id=? AND arrival>=? AND arrival<? " \
+	         "ORDER BY arrival;"
+
+	# Completed bookings, and ones which never turned up, are archived
+	# once they are older than the retention period
+	ARCHIVED_WHERE = "WHERE arrival<? AND status IN (?, ?)"
+
+	LIST_ARCHIVABLE = "SELECT booking_id FROM booking " + ARCHIVED_WHERE + ";"
+
+	ARCHIVE = "INSERT INTO booking_history (" + COLUMNS + ", archived) " \
+	         "SELECT " + COLUMNS + ", ? " \
+	         "FROM booking " + ARCHIVED_WHERE + ";"
+
+	DELETE_ARCHIVED = "DELETE FROM booking " + ARCHIVED_WHERE + ";"
+
+	def add(self, booking):
+		"""Adds a booking, returning its new ID"""
+		cursor = self.execute(self.ADD, (booking["customer"], booking["table_id"], booking["arrival"],
+			booking["party_size"], booking["duration"]))
+		self.log(ADDED, cursor.lastrowid)
+		self.commit()
+		return cursor.lastrowid
+
+	def modify(self, booking):
+		self.execute(self.MODIFY, (booking["customer"], booking["table_id"], booking["arrival"],
+			booking["party_size"], booking["duration"], booking["booking_id"]))
+		self.log(MODIFIED, booking["booking_id"])
+		self.commit()
+
+	def delete(self, booking_id):
+		self.execute(self.DELETE, (booking_id, ))
+		self.log(DELETED, booking_id)
+		self.commit()
+
+	def set_status(self, booking_id, status):
+		self.execute(self.SET_STATUS, (status, booking_id))
+		self.log(MODIFIED, booking_id)
+		self.commit()
+
+	def set_ping(self, booking_id, ping):
+		self.execute(self.SET_PING, (ping, booking_id))
+		self.log(MODIFIED, booking_id)
+		self.commit()
+
+	def set_waiter(self, booking_id, member_id):
+		self.execute(self.SET_WAITER, (member_id, booking_id))
+		self.log(MODIFIED, booking_id)
+		self.commit()
+
+	def get(self, booking_id):
+		return self.execute(self.GET, (booking_id, )).fetchone()
+
+	def list(self, since):
+		"""Lists bookings arriving since the given time, along with
+		any earlier ones which are still being served"""
+		return self.execute(self.LIST, (since, ARRIVED, PAYING)).fetchall()
+
+	def find(self, booking_id):
+		"""Looks up a booking in either the current or archived bookings"""
+		return self.execute(self.FIND, (booking_id, booking_id)).fetchone()
+
+	def history(self, table_id, start, end):
+		return self.execute(self.HISTORY, (table_id, start, end)).fetchall()
+
+	def archive(self, before, now):
+		"""Moves completed and expired bookings arriving before the given
+		time into the history table, returning their IDs"""
+		args = (before, EMPTY, COMPLETED)
+
+		with connection(): # One transaction, so no booking is copied twice or lost
+			self.execute("BEGIN IMMEDIATE;")
+			archived = [row[0] for row in self.execute(self.LIST_ARCHIVABLE, args)]
+			if archived:
+				self.execute(self.ARCHIVE, (now, ) + args)
+				self.execute(self.DELETE_ARCHIVED, args)
+				self.log(DELETED, *archived)
+		return archived
+
+class ChangeRepository(Repository):
+	LATEST = "SELECT COALESCE(MAX(revision), 0) " \
+	         "FROM changelog;"
+
+	SINCE  = "SELECT revision, entity, row_id, origin " \
+	         "FROM changelog " \
+	         "WHERE revision>? " \
+	         "ORDER BY revision;"
+
+	DATA_VERSION = "PRAGMA data_version;"
+
+	PRUNE  = "DELETE FROM changelog " \
+	         "WHERE changed<?;"
+
+	def latest(self):
+		"""Gets the revision of the latest change"""
+		return self.execute(self.LATEST).fetchone()[0]
+
+	def since(self, revision):
+		"""Lists every change after a revision, in order"""
+		return self.execute(self.SINCE, (revision, )).fetchall()
+
+	def data_version(self):
+		"""Gets a number which changes whenever another connection commits"""
+		return self.execute(self.DATA_VERSION).fetchone()[0]
+
+	def prune(self, before):
+		"""Deletes changes made before the given time"""
+		self.execute(self.PRUNE, (before, ))
+		self.commit()
@@ -1,6 +1,20 @@
-import login, member, booking, floorplan, data, util, tkinter, tkinter.messagebox
+import time
+started = time.perf_counter() # Before anything else, so the imports are timed
+
+import login, member, booking, floorplan, stats, maintenance, changefeed, scheduler, service, data, repository, metrics, util
+import tkinter, tkinter.ttk, tkinter.messagebox, threading, sys
 from constants import *
 
+# Run with --startup-profile to see how long each part of starting up takes
+PROFILE = "--startup-profile" in sys.argv
+
+def report(stage, since):
+	"""Prints how long a stage of starting up took, when profiling"""
+	if PROFILE:
+		print("{:<28}{:8.1f} ms".format(stage, (time.perf_counter() - since) * 1000), file=sys.stderr)
+
+report("Imports", started)
+
 class MainWindow(tkinter.Frame):
 	def __init__(self, master=None):
 		tkinter.Frame.__init__(self, master)
@@ -13,38 +27,112 @@ class MainWindow(tkinter.Frame):
 		self.grid(sticky=NSEW, padx=5, pady=5)
 		self.master.geometry("800x600")
 
+		self.loaded = False # Pages can't be used until the database is loaded
 		self.init_frames()
 		self.init_menu()
 
 		self.login() # Updates login status to not logged in
 		self.selected = LOGIN
 
+		self.maintenance = maintenance.Maintenance(self, self.bookings_archived, self.maintenance_failed)
+		self.changes = changefeed.ChangeFeed(self, self.changes_applied)
+		# Kept here rather than on the floor plan, so arrivals are served
+		# even if the floor plan has never been opened
+		self.scheduler = scheduler.ArrivalScheduler(self, self.bookings_due)
+		self.check_writes()
+
+		# The window is shown before the database is loaded
+		self.loader = None
+		self.load_error = None
+		self.after_idle(self.load)
+
+	def load(self):
+		"""Loads the database on a background thread, while the window shows progress"""
+		self.update_idletasks() # Paints the window first
+		self.loading_started = time.perf_counter()
+		report("First paint", started)
+		self.loader = threading.Thread(target=self.load_data, daemon=True)
+		self.loader.start()
+		self.after(50, self.poll_load)
+
+	def load_data(self):
+		try:
+			service.start()
+		except Exception as error: # Anything half loaded can't be used
+			self.load_error = error
+		finally:
+			repository.close() # This thread's connection
+
+	def poll_load(self):
+		"""Waits on the main thread for the database to finish loading"""
+		if self.loader.is_alive():
+			self.after(50, self.poll_load)
+			return
+		if self.load_error:
+			tkinter.messagebox.showerror("Could not open database",
+				"The database could not be loaded:\n{}".format(self.load_error))
+			self.master.destroy()
+			return
+		report("Database load", self.loading_started)
+
+		self.progress.stop()
+		self.loading.grid_remove()
+		self.progress.grid_remove()
+		self.loaded = True
+		self.login() # Enables the pages
+
+		self.maintenance.start()
+		self.changes.start()
+		service.assign_due() # Catches up on bookings due while closed
+		self.scheduler.load()
+		if METRICS_DUMP:
+			self.after(METRICS_DUMP_INTERVAL, self.dump_metrics)
+		report("Ready", started)
+		self.first_run()
+
+	def first_run(self):
+		"""Logs in as 'default' admin when there are no existing admins"""
+		if len(data.members) == 0:
+			# The simplest admin account possible, doesn't exist in database
+			self.login({"first_name": "administrator", "permission": True})
+			self.loginbutton["state"] = DISABLED
+
+			members = self.page(ADD_MEMBER)
+			members.add_member.admin.set(True)
+			members.add_member.admin_button["state"] = DISABLED
+
+			tkinter.messagebox.showinfo("First time run",
+				"As there are no staff members, you have been logged in as the default administrator.\n" \
+				"You can add staff members in the member manager.\n\n" \
+				"Make sure you do not forget all the admin passwords, as you will no longer be able to log in.")
+
 	def login(self, member=None):
 		"""Sets the system-wide logged in member to the given member"""
 		self.present_button["state"] = NORMAL
 		login.member = member
 
 		if member:
-			self.buttons[LOGIN]["state"]       = DISABLED
-			self.frames[LOGIN].submit["state"] = DISABLED
+			self.buttons[LOGIN]["state"] = DISABLED
 
 			self.logged["text"] = LOGGED.format(util.unique_name(member))
 			self.loginbutton["text"] = LOGOUT_TAG
 			self.loginbutton["command"] = self.login
-			self.frames[ADD_MEMBER].select() # Prevent deleting yourself
+			# Reload the selected member to prevent deleting yourself
+			if ADD_MEMBER in self.frames:
+				self.frames[ADD_MEMBER].select(self.frames[ADD_MEMBER].members.selected)
 
 			permission = member["permission"]
 			self.present.set(member["present"])
 		else:
-			self.buttons[LOGIN]["state"]       = NORMAL
-			self.frames[LOGIN].submit["state"] = NORMAL
+			self.buttons[LOGIN]["state"] = NORMAL if self.loaded else DISABLED
 
 			self.logged["text"] = NOT_LOGGED
 			self.loginbutton["text"] = LOGIN_TAG
 			self.loginbutton["command"] = lambda: self.frame(LOGIN)
 
 			if self.buttons[ADD_MEMBER]["relief"] == SUNKEN \
-					or self.buttons[BOOKINGS]["relief"] == SUNKEN:
+					or self.buttons[BOOKINGS]["relief"] == SUNKEN \
+					or self.buttons[STATISTICS]["relief"] == SUNKEN:
 				# Switch to a valid page
 				self.frame(LOGIN)
 
@@ -53,14 +141,24 @@ class MainWindow(tkinter.Frame):
 			self.present_button["state"] = DISABLED
 
 		state = NORMAL if permission else DISABLED
-		self.buttons[ADD_MEMBER]["state"]     = state
-		self.buttons[BOOKINGS]["state"]       = state
-		self.frames[FLOOR_PLAN].edit["state"] = state
+		self.buttons[ADD_MEMBER]["state"] = state
+		self.buttons[BOOKINGS]["state"]   = state
+		self.buttons[STATISTICS]["state"] = state
+		self.buttons[FLOOR_PLAN]["state"] = NORMAL if self.loaded else DISABLED
+		self.update_frames()
+
+		self.loginbutton["state"] = NORMAL if self.loaded else DISABLED
 
-		if not permission: # Make sure we're not editing already
-			self.frames[FLOOR_PLAN].set_editing(False)
+	def update_frames(self):
+		"""Enables the parts of the pages built so far that the logged in member can use"""
+		permission = bool(login.member and login.member["permission"])
 
-		self.loginbutton["state"] = NORMAL
+		if LOGIN in self.frames:
+			self.frames[LOGIN].submit["state"] = DISABLED if login.member else NORMAL
+		if FLOOR_PLAN in self.frames:
+			self.frames[FLOOR_PLAN].edit["state"] = NORMAL if permission else DISABLED
+			if not permission: # Make sure we're not editing already
+				self.frames[FLOOR_PLAN].set_editing(False)
 
 	def frame(self, frame):
 		"""Selects a frame by bringing it to the front"""
@@ -72,7 +170,7 @@ class MainWindow(tkinter.Frame):
 			self.toggle_menu()
 
 		self.selected = frame
-		self.frames[frame].lift()
+		self.page(frame).lift()
 		self.framewrapper["text"] = BUTTONS[frame]
 
 	def mark_present(self):
@@ -82,11 +180,72 @@ class MainWindow(tkinter.Frame):
 				and tkinter.messagebox.askyesno("Log out?", "You have been marked as not present. Do you want to log out?")
 
 			login.member["present"] = self.present.get()
-			data.cursor.execute(data.MARK_PRESENT, (login.member["present"], login.member["member_id"]))
-			data.database.commit()
+			data.writer.submit(data.staff_db.mark_present, login.member["member_id"], login.member["present"])
+			data.loads.set_present(login.member["member_id"], login.member["present"])
 
 			if logout: self.login()
 
+	def check_writes(self):
+		"""Periodically reports any changes which couldn't be saved"""
+		for error in data.writer.take_errors():
+			tkinter.messagebox.showerror("Could not save changes",
+				"A change could not be saved to the database:\n{}".format(error))
+		self.after(250, self.check_writes)
+
+	def dump_metrics(self):
+		"""Periodically writes the metrics to METRICS_DUMP, while they are enabled"""
+		if metrics.enabled:
+			try:
+				metrics.dump(METRICS_DUMP)
+			except OSError:
+				pass # Try again next time
+		self.after(METRICS_DUMP_INTERVAL, self.dump_metrics)
+
+	def maintenance_failed(self, error):
+		tkinter.messagebox.showerror("Could not archive bookings",
+			"Old bookings could not be archived, and will be tried again later:\n{}".format(error))
+
+	def bookings_due(self, bookings):
+		"""Called by the scheduler when bookings are coming up soon"""
+		if FLOOR_PLAN in self.frames:
+			self.frames[FLOOR_PLAN].bookings_due(bookings)
+		else:
+			service.assign_due({booking["table_id"] for booking in bookings})
+
+	def bookings_archived(self, booking_ids):
+		"""Drops bookings moved to the archive by maintenance from the caches"""
+		data.forget_bookings(booking_ids)
+		if BOOKINGS in self.frames:
+			self.frames[BOOKINGS].bookings_archived(booking_ids)
+
+	def changes_applied(self, changed):
+		"""Refreshes what is shown of the rows other programs have changed.
+		Tables go first, so changed bookings can find their tables"""
+		floor_plan = self.frames.get(FLOOR_PLAN)
+		bookings = self.frames.get(BOOKINGS)
+		members = self.frames.get(ADD_MEMBER)
+
+		# Pages which haven't been built yet are built from the caches later
+		table_ids = changed.get(data.table_db.ENTITY)
+		if table_ids:
+			if floor_plan: floor_plan.tables_changed(table_ids)
+			elif bookings: bookings.populate_tables() # Table numbers may have changed
+
+		booking_ids = changed.get(data.booking_db.ENTITY)
+		if booking_ids:
+			for id in booking_ids:
+				if id in data.bookings:
+					self.scheduler.push(data.bookings[id]) # Queues any new arrivals
+			if bookings: bookings.bookings_changed(booking_ids)
+			if floor_plan: floor_plan.bookings_changed(booking_ids)
+
+		member_ids = changed.get(data.staff_db.ENTITY)
+		if member_ids:
+			if members: members.members_changed(member_ids)
+			if login.member and login.member.get("member_id") in member_ids \
+					and login.member["member_id"] not in data.members:
+				self.login() # Deleted by someone else
+
 	def init_menu(self):
 		"""Initializes the menu and login frames"""
 		# Present toggle
@@ -119,6 +278,13 @@ class MainWindow(tkinter.Frame):
 				command=lambda i=i: self.frame(i)))
 			self.buttons[i].grid(row=i+1, column=1, sticky=NSEW, pady=2)
 
+		# Shown until the database has loaded
+		self.loading = tkinter.Label(self.menu, text="Loading...", bg="white")
+		self.loading.grid(row=len(BUTTONS)+2, column=1)
+		self.progress = tkinter.ttk.Progressbar(self.menu, mode="indeterminate")
+		self.progress.grid(row=len(BUTTONS)+3, column=1, sticky=EW, pady=5)
+		self.progress.start()
+
 		self.menu.place(relx=0.5, rely=0.5, anchor=CENTER)
 
 		# Menu button
@@ -143,37 +309,52 @@ class MainWindow(tkinter.Frame):
 		self.framewrapper.rowconfigure(0, weight=1)
 		self.framewrapper.columnconfigure(0, weight=1)
 
-		# Create the actual frames
-		bookings = booking.BookingManager(self.framewrapper)
-		self.frames = [
-			login.LoginForm(self.login, self.framewrapper),
-			member.MemberManager(self.login, self.framewrapper),
-			bookings,
-			floorplan.FloorPlan(bookings.populate_tables, self.framewrapper),
-			tkinter.Label(self.framewrapper, text="Choose a menu option",
+		# Each page is built the first time it is shown, from the caches.
+		# Pages look each other up when called, as they may not be built yet
+		self.builders = [
+			lambda: login.LoginForm(self.login, self.framewrapper),
+			lambda: member.MemberManager(self.login, self.framewrapper),
+			lambda: booking.BookingManager(self.booking_changed, self.framewrapper),
+			lambda: floorplan.FloorPlan(self.tables_edited, self.framewrapper),
+			lambda: stats.StatsPanel(self.framewrapper),
+			lambda: tkinter.Label(self.framewrapper, text="Choose a menu option",
 				relief=SUNKEN, bg="#DDD")
 		]
-
-		# Overlap all the frames on one another
-		for frame in self.frames:
+		self.frames = {} # Index -> page, once built
+		self.page(CHOOSE_OPTION)
+
+	def page(self, index):
+		"""Gets a page, building it and overlapping it on the others the first time"""
+		if index not in self.frames:
+			building = time.perf_counter()
+			frame = self.frames[index] = self.builders[index]()
 			frame.grid(row=0, column=0, sticky=NSEW)
-
-data.init_db()
+			self.update_frames()
+			report("Build " + (BUTTONS[index] if index < len(BUTTONS) else "placeholder"), building)
+		return self.frames[index]
+
+	def booking_changed(self, booking):
+		"""Requeues a booking after it has been added, modified or deleted
+		here, and updates the floor plan the same way as for other programs"""
+		self.scheduler.push(booking)
+		if FLOOR_PLAN in self.frames:
+			self.frames[FLOOR_PLAN].bookings_changed({booking["booking_id"]})
+
+	def tables_edited(self):
+		"""Shows table changes in the booking forms, once editing is finished"""
+		if BOOKINGS in self.frames:
+			self.frames[BOOKINGS].populate_tables()
+
+building = time.perf_counter()
 window = MainWindow()
-
-# Logs in as 'default' admin when there are no existing admins
-if len(data.members) == 0:
-	# The simplest admin account possible, doesn't exist in database
-	window.login({"first_name": "administrator", "permission": True})
-	window.loginbutton["state"] = DISABLED
-
-	window.frames[ADD_MEMBER].add_member.admin.set(True)
-	window.frames[ADD_MEMBER].add_member.admin_button["state"] = DISABLED
-
-	tkinter.messagebox.showinfo("First time run",
-		"As there are no staff members, you have been logged in as the default administrator.\n" \
-		"You can add staff members in the member manager.\n\n" \
-		"Make sure you do not forget all the admin passwords, as you will no longer be able to log in.")
+report("Build main window", building)
 
 window.mainloop()
-data.cleanup_db()
+if window.loader: # Closed while still loading
+	window.loader.join()
+window.scheduler.stop()
+window.changes.stop()
+window.maintenance.stop()
+service.stop()
+if METRICS_DUMP and metrics.enabled: # Includes the last writes
+	metrics.dump(METRICS_DUMP)
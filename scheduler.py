@@ -0,0 +1,81 @@
+import data, heapq, datetime
+from constants import *
+
+# Longest time to sleep between wake ups, in milliseconds.
+# Guards against the system clock jumping while we wait
+MAX_SLEEP = 60000
+
+class ArrivalScheduler:
+	"""Keeps a priority queue of the times at which bookings should be shown
+	on their tables, and only wakes up when the earliest of these is due"""
+	def __init__(self, widget, callback):
+		self.widget = widget
+		self.callback = callback # Called with the due bookings
+
+		self.deadlines = [] # Heap of (deadline, booking_id, arrival)
+		self.timer = None
+
+	def deadline(self, booking):
+		"""The time at which a booking should be shown on its table"""
+		return booking["arrival"] - ARRIVAL_HORIZON
+
+	def load(self, now=None):
+		"""Queues every open booking which is not yet due"""
+		if now is None:
+			now = datetime.datetime.now().timestamp()
+
+		self.deadlines = [(self.deadline(booking), booking["booking_id"], booking["arrival"])
+			for booking in data.bookings.values()
+			if booking["status"] != COMPLETED and self.deadline(booking) > now]
+		heapq.heapify(self.deadlines)
+		self.rearm()
+
+	def push(self, booking):
+		"""Queues a new or modified booking and re-arms the timer.
+
+		Entries for the booking's old arrival are left in the queue
+		and skipped once they come up"""
+		if booking["booking_id"] in data.bookings and booking["status"] != COMPLETED:
+			heapq.heappush(self.deadlines, (self.deadline(booking), booking["booking_id"], booking["arrival"]))
+			self.rearm()
+
+	def is_current(self, booking_id, arrival):
+		"""Checks a queue entry still refers to an open booking at that time"""
+		booking = data.bookings.get(booking_id)
+		return booking is not None and booking["arrival"] == arrival \
+			and booking["status"] != COMPLETED
+
+	def wake(self):
+		"""Pops every due entry and passes the bookings on to the callback"""
+		self.timer = None
+		now = datetime.datetime.now().timestamp()
+
+		due = []
+		while self.deadlines and self.deadlines[0][0] <= now:
+			deadline, booking_id, arrival = heapq.heappop(self.deadlines)
+			if self.is_current(booking_id, arrival):
+				due.append(data.bookings[booking_id])
+
+		if due:
+			self.callback(due)
+		self.rearm()
+
+	def rearm(self):
+		"""Sleeps until the earliest deadline in the queue, if there is one"""
+		if self.timer:
+			self.widget.after_cancel(self.timer)
+			self.timer = None
+
+		# Drop stale entries so they don't cause needless wake ups
+		while self.deadlines and not self.is_current(*self.deadlines[0][1:]):
+			heapq.heappop(self.deadlines)
+
+		if self.deadlines:
+			delay = self.deadlines[0][0] - datetime.datetime.now().timestamp()
+			delay = min(max(int(delay * 1000), 0), MAX_SLEEP)
+			self.timer = self.widget.after(delay, self.wake)
+
+	def stop(self):
+		if self.timer:
+			self.widget.after_cancel(self.timer)
+			self.timer = None
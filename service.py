@@ -0,0 +1,146 @@
+import data, records, datetime
+from constants import *
+
+# The restaurant's rules, kept apart from the UI so they can also be used
+# by batch jobs, tests and servers without a display. Nothing here may
+# import tkinter, so this module loads quickly wherever it runs
+
+def start():
+	"""Opens the database, loads everything into memory and starts saving writes"""
+	data.init_db()
+
+def stop():
+	"""Saves any writes still waiting and closes the database"""
+	data.cleanup_db()
+
+def now():
+	return datetime.datetime.now().timestamp()
+
+# Bookings
+
+def parse_arrival(text, current=None):
+	"""Converts an arrival time given as TIME_FORMAT to a timestamp.
+
+	Raises ValueError unless it is a valid time after the current one"""
+	arrival = datetime.datetime.strptime(text, TIME_FORMAT).timestamp()
+	if arrival <= (now() if current is None else current):
+		raise ValueError("Arrival time is not in the future")
+	return arrival
+
+def unusual_arrival(arrival):
+	"""Checks for a booking in the morning, which is likely to be a mistake"""
+	return datetime.datetime.fromtimestamp(arrival).hour < 12
+
+def booking_problem(table_id, party_size, arrival, duration, booking_id=None):
+	"""Checks a booking fits at its table, and that the table isn't taken
+	by another booking for any of its time. Gives what is wrong as a
+	sentence, or None if nothing is"""
+	if party_size < 1:
+		return "A booking must be for at least one person."
+	if duration <= 0:
+		return "A booking must last some time."
+
+	table = data.tables[table_id]
+	if party_size > table["capacity"]:
+		return "Table {} only seats {}.".format(table["table_number"], table["capacity"])
+
+	clashes = data.free_times.clashes(table_id, arrival, arrival + duration, booking_id)
+	if clashes:
+		other = data.bookings[clashes[0]]
+		return "Table {} is booked by {} from {}.".format(table["table_number"], other["customer"],
+			datetime.datetime.fromtimestamp(other["arrival"]).strftime("%H:%M"))
+	return None
+
+def free_tables(party_size, arrival, duration, booking_id=None):
+	"""Lists the tables which could take a booking instead, smallest first"""
+	return [data.tables[id] for id in data.free_times.free_tables(party_size, arrival, arrival + duration, booking_id)]
+
+def add_booking(customer, table_id, arrival, party_size=1, duration=DEFAULT_DURATION):
+	"""Saves a new booking, waiting for its ID, and returns it"""
+	booking = records.Booking(customer=customer, table_id=table_id, arrival=arrival,
+		party_size=party_size, duration=duration)
+	booking["booking_id"] = data.writer.submit(data.booking_db.add, dict(booking)).result()
+
+	data.bookings[booking["booking_id"]] = booking
+	data.index_booking(booking)
+	return booking
+
+def modify_booking(booking):
+	"""Saves a booking's changed customer, table, arrival, party size or duration"""
+	data.writer.submit(data.booking_db.modify, dict(booking))
+	data.index_booking(booking)
+
+def delete_booking(booking):
+	"""Deletes a booking, unless it has already gone from the cache"""
+	if data.bookings.get(booking["booking_id"]) is not booking: return
+	data.writer.submit(data.booking_db.delete, booking["booking_id"])
+
+	del data.bookings[booking["booking_id"]]
+	if booking["status"] != COMPLETED: # Its waiter no longer serves it
+		data.loads.change(booking["member_id"], -1)
+	data.unindex_booking(booking["booking_id"])
+
+# Serving bookings
+
+def next_status(booking):
+	return min(booking["status"] + 1, COMPLETED)
+
+def set_status(booking, status):
+	"""Moves a booking on to a new status, freeing up its waiter once
+	it is completed, and returns the time it changed. A booking which
+	has been deleted or archived only has its record changed, as its
+	waiter's load was already given back"""
+	if data.bookings.get(booking["booking_id"]) is not booking:
+		booking["status"] = status
+		return now()
+	data.writer.submit(data.booking_db.set_status, booking["booking_id"], status)
+
+	was_open = booking["status"] != COMPLETED
+	if was_open != (status != COMPLETED):
+		data.loads.change(booking["member_id"], -1 if was_open else 1)
+
+	booking["status"] = status
+	data.index_booking(booking)
+	return now()
+
+def set_ping(booking, ping):
+	"""Saves whether a booking's table is asking for a waiter"""
+	if bool(booking["ping"]) != ping:
+		booking["ping"] = ping
+		data.writer.submit(data.booking_db.set_ping, booking["booking_id"], ping)
+
+def due_booking(table_id, current=None, allow_started=False, at=None):
+	"""Finds which open booking arriving within ARRIVAL_HORIZON should
+	be shown on a table, given the booking it is showing now.
+
+	Returns (booking, clash). The booking is the one to show, if any. If
+	the table is still occupied by the current booking, unless a booking
+	that has already started is allowed to replace it, the next booking
+	is returned as a clash instead"""
+	threshold = (now() if at is None else at) + ARRIVAL_HORIZON
+
+	# Only open bookings due before the threshold are looked at
+	for booking in data.bookings_between(table_id, end=threshold):
+		if booking is current:
+			continue
+		if current and not allow_started:
+			return None, booking
+		return booking, None
+	return None, None
+
+def pick_waiter(booking):
+	"""Keeps any waiter already serving a booking, otherwise
+	picks whoever present has the fewest tables"""
+	return data.members.get(booking["member_id"]) \
+		or data.members.get(data.loads.least_loaded())
+
+def assign_due(table_ids=None, at=None):
+	"""Gives the next booking due at each of the given tables, or all
+	tables, a waiter. Keeps arrivals served while the floor plan isn't open"""
+	at = now() if at is None else at
+	for table_id in data.tables if table_ids is None else table_ids:
+		booking, clash = due_booking(table_id, at=at)
+		if booking:
+			waiter = pick_waiter(booking)
+			if waiter:
+				data.assign_waiter(booking, waiter["member_id"])
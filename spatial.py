@@ -0,0 +1,205 @@
+# How far chairs reach out from the edges of a table:
+# they are 20px out from the edge, with a 16px radius
+CLEARANCE = 36
+# Width and height of each cell of the grid, about the size of a table
+CELL_SIZE = 256
+# How many positions along each axis to try per step of a free space search
+SPOT_LIMIT = 32
+
+def table_bounds(table):
+	"""Gives the bounds of a table including its chairs, as (left, top, right, bottom)"""
+	return (
+		table["x_pos"] - CLEARANCE, table["y_pos"] - CLEARANCE,
+		table["x_pos"] + table["width"] + CLEARANCE, table["y_pos"] + table["height"] + CLEARANCE
+	)
+
+def intersects(a, b):
+	"""Checks whether two bounds overlap. Bounds which only touch don't"""
+	return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def contains(outer, inner):
+	"""Checks whether the inner bounds are entirely inside the outer bounds"""
+	return outer[0] <= inner[0] and inner[2] <= outer[2] \
+		and outer[1] <= inner[1] and inner[3] <= outer[3]
+
+class Batch:
+	"""What searches for free spots in an area learn, kept while tables are
+	only being added so it carries over from one table's search to the next"""
+	def __init__(self):
+		self.blocked = set() # (x, y, width, height) of spots found blocked
+		self.full = []       # (width, height) of sizes which fit nowhere in the area
+
+	def fits(self, width, height):
+		return not any(width >= full[0] and height >= full[1] for full in self.full)
+
+class SpatialIndex:
+	"""A uniform grid over the bounds of tables and their chairs.
+
+	Each table is listed in every cell its bounds cover, so finding what
+	overlaps an area only looks at the tables in the cells around it"""
+	def __init__(self, cell_size=CELL_SIZE):
+		self.cell_size = cell_size
+		self.cells = {}  # (column, row) -> set of table IDs
+		self.bounds = {} # table ID -> bounds
+
+	def cells_of(self, bounds):
+		size = self.cell_size
+		for column in range(int(bounds[0] // size), int(bounds[2] // size) + 1):
+			for row in range(int(bounds[1] // size), int(bounds[3] // size) + 1):
+				yield column, row
+
+	def rebuild(self, tables):
+		self.cells.clear()
+		self.bounds.clear()
+		for table in tables:
+			self.update(table)
+
+	def update(self, table):
+		"""Indexes a new table, or one which has been moved or resized"""
+		self.place(table["table_id"], table_bounds(table))
+
+	def place(self, key, bounds):
+		if self.bounds.get(key) == bounds: return
+		self.remove(key)
+
+		self.bounds[key] = bounds
+		for cell in self.cells_of(bounds):
+			self.cells.setdefault(cell, set()).add(key)
+
+	def remove(self, key):
+		"""Removes a deleted table, if it was indexed"""
+		bounds = self.bounds.pop(key, None)
+		if bounds is None: return
+
+		for cell in self.cells_of(bounds):
+			keys = self.cells[cell]
+			keys.discard(key)
+			if not keys:
+				del self.cells[cell]
+
+	def query(self, bounds, exclude=None):
+		"""Finds every table overlapping the given bounds, other than the excluded one"""
+		found = set()
+		for cell in self.cells_of(bounds):
+			for key in self.cells.get(cell, ()):
+				if key != exclude and key not in found and intersects(bounds, self.bounds[key]):
+					found.add(key)
+		return found
+
+	def blocked(self, bounds, exclude=None):
+		"""Checks whether any table other than the excluded one overlaps the bounds"""
+		cells, tables = self.cells, self.bounds
+		for cell in self.cells_of(bounds):
+			for key in cells.get(cell, ()):
+				if key != exclude and intersects(bounds, tables[key]):
+					return True
+		return False
+
+	def overlaps(self, key):
+		"""Finds every table overlapping the given table"""
+		if key not in self.bounds:
+			return set()
+		return self.query(self.bounds[key], key)
+
+	def free_spot(self, bounds, exclude=None, area=None, batch=None):
+		"""Finds the closest top left corner to put the bounds at
+		where they overlap no other table, keeping within the area if given.
+
+		A free spot is always either where the bounds already are, or lined
+		up against the edges of nearby tables, so only those are tried.
+		The search widens until one is found. A batch skips what earlier
+		searches found, see free_positions"""
+		width, height = bounds[2] - bounds[0], bounds[3] - bounds[1]
+		low_x, low_y, high_x, high_y = area or (float("-inf"), float("-inf"), float("inf"), float("inf"))
+
+		start_x = max(min(bounds[0], high_x - width), low_x)
+		start_y = max(min(bounds[1], high_y - height), low_y)
+
+		if not self.blocked((start_x, start_y, start_x + width, start_y + height), exclude):
+			return start_x, start_y # Also covers an empty floor, which has no extent to search
+
+		def closest(values, start, low, high, reach):
+			values = [value for value in values if low <= value <= high and abs(value - start) <= reach]
+			return sorted(values, key=lambda value: abs(value - start))[:SPOT_LIMIT]
+
+		if batch is None:
+			batch = Batch() # Only kept for this search
+
+		def blocked(x, y):
+			if (x, y, width, height) in batch.blocked:
+				return True
+			if self.blocked((x, y, x + width, y + height), exclude):
+				batch.blocked.add((x, y, width, height))
+				return True
+			return False
+
+		reach = max(width, height, self.cell_size)
+		tried = -1 # Spots this close were tried by the last step
+		extent = self.extent() if batch.fits(width, height) else 0 # Else skips past the other tables
+		while reach < extent:
+			around = (start_x - reach, start_y - reach, start_x + width + reach, start_y + height + reach)
+			nearby = [self.bounds[key] for key in self.query(around, exclude)]
+
+			xs = closest({start_x}.union(*((other[2], other[0] - width) for other in nearby)),
+				start_x, low_x, high_x - width, reach)
+			ys = closest({start_y}.union(*((other[3], other[1] - height) for other in nearby)),
+				start_y, low_y, high_y - height, reach)
+
+			for distance, x, y in sorted(((x - start_x)**2 + (y - start_y)**2, x, y) for x in xs for y in ys):
+				if distance > reach * reach:
+					break # Tables further away than this haven't been looked at yet
+				if distance > tried and not blocked(x, y):
+					return x, y
+
+			if area and contains(around, area):
+				batch.full.append((width, height))
+				break # Every spot in the area has been tried
+			tried = reach * reach
+			reach *= 2
+
+		# Crowded enough to search everywhere, so go past the edge of every table
+		left, top, right, bottom = self.extent_bounds(exclude)
+		spots = sorted(((x - start_x)**2 + (y - start_y)**2, x, y) for x, y in (
+			(right, start_y), (left - width, start_y), (start_x, bottom), (start_x, top - height))
+			if low_x <= x <= high_x - width and low_y <= y <= high_y - height)
+		for distance, x, y in spots:
+			if not blocked(x, y):
+				return x, y
+		return start_x, start_y # Nowhere in the area is free
+
+	def extent_bounds(self, exclude=None):
+		"""Gives the bounds around every table"""
+		bounds = [bounds for key, bounds in self.bounds.items() if key != exclude] or [(0, 0, 0, 0)]
+		return (min(bounds[0] for bounds in bounds), min(bounds[1] for bounds in bounds),
+			max(bounds[2] for bounds in bounds), max(bounds[3] for bounds in bounds))
+
+	def extent(self):
+		"""Gives how far apart the furthest tables could be, from the cells in use"""
+		if not self.cells:
+			return 0
+		columns = [cell[0] for cell in self.cells]
+		rows = [cell[1] for cell in self.cells]
+		return (max(max(columns) - min(columns), max(rows) - min(rows)) + 1) * self.cell_size
+
+	def free_position(self, table, area=None):
+		"""Finds the closest position to put a table where neither it
+		nor its chairs overlap another table, as (x_pos, y_pos)"""
+		x, y = self.free_spot(table_bounds(table), table["table_id"], area)
+		return x + CLEARANCE, y + CLEARANCE
+
+	def free_positions(self, tables, area=None):
+		"""Finds free positions for several tables in turn, as (x_pos, y_pos),
+		indexing each in its new place before the next is looked for.
+
+		As the floor only fills up, spots found blocked stay blocked and
+		sizes which fit nowhere in the area never will, so these are kept
+		across the batch rather than searched for again. The tables should
+		be removed from the index first"""
+		batch = Batch()
+		positions = []
+		for table in tables:
+			bounds = table_bounds(table)
+			x, y = self.free_spot(bounds, table["table_id"], area, batch)
+			self.place(table["table_id"], (x, y, x + bounds[2] - bounds[0], y + bounds[3] - bounds[1]))
+			positions.append((x + CLEARANCE, y + CLEARANCE))
+		return positions
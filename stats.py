@@ -0,0 +1,56 @@
+import metrics, tkinter, tkinter.ttk
+from constants import *
+
+# In milliseconds, how often the statistics shown are updated
+STATS_REFRESH = 1000
+
+class StatsPanel(tkinter.Frame):
+	"""Shows every metric, for admins to see what is slow or growing"""
+	def __init__(self, master=None):
+		tkinter.Frame.__init__(self, master)
+
+		self.enabled = tkinter.IntVar(self, metrics.enabled)
+		tkinter.Checkbutton(self, text="Collect statistics", variable=self.enabled,
+			command=self.toggle).grid(row=0, column=0, sticky=W)
+		tkinter.Button(self, text="Reset", command=self.reset).grid(row=0, column=1, sticky=E)
+
+		columns = ("count", "value", "mean", "p95", "max")
+		self.tree = tkinter.ttk.Treeview(self, columns=columns)
+		self.tree.heading("#0", text="Metric")
+		for column, heading in zip(columns, ("Count", "Value / Total ms", "Mean ms", "95% ms", "Max ms")):
+			self.tree.heading(column, text=heading)
+			self.tree.column(column, width=90, anchor=E)
+		self.tree.grid(row=1, column=0, columnspan=2, sticky=NSEW, pady=5)
+
+		scrollbar = tkinter.Scrollbar(self, command=self.tree.yview)
+		scrollbar.grid(row=1, column=2, sticky=NS, pady=5)
+		self.tree["yscrollcommand"] = scrollbar.set
+
+		self.columnconfigure(0, weight=1)
+		self.rowconfigure(1, weight=1)
+		self.refresh()
+
+	def toggle(self):
+		metrics.enabled = bool(self.enabled.get())
+
+	def reset(self):
+		metrics.registry.reset()
+		self.refresh(False)
+
+	def refresh(self, repeat=True):
+		"""Updates each metric's row in place, while the window is showing"""
+		if repeat:
+			self.after(STATS_REFRESH, self.refresh)
+		if not self.winfo_viewable(): return
+
+		for i, (name, value) in enumerate(metrics.registry.snapshot().items()):
+			if value["type"] == "histogram":
+				row = (value["count"], "{:.1f}".format(value["total_ms"]), "{:.3f}".format(value["mean_ms"]),
+					"{:.3f}".format(value["p95_ms"]), "{:.3f}".format(value["max_ms"]))
+			else:
+				row = ("", value["value"], "", "", "")
+
+			if self.tree.exists(name):
+				self.tree.item(name, values=row)
+			else:
+				self.tree.insert("", i, iid=name, text=name, values=row)
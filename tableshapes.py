@@ -1,4 +1,7 @@
-import math
+import metrics, math, functools
+
+# How many table layouts to remember the chair positions of
+CHAIR_CACHE_SIZE = 1024
 
 def generate_oval(table):
 	"""Generates the positions of the chairs around an oval table"""
@@ -97,11 +100,15 @@ def max_chairs(table):
 
 	return max_chairs
 
-def get_shape(canvas, shape):
+def shape_type(shape):
+	"""Gives the type of canvas item used to draw a shape"""
+	return "oval" if shape == 0 else "rectangle"
+
+def get_shape(canvas, shape, tags=()):
 	if shape == 0:
-		return canvas.create_oval(0, 0, 0, 0, width=2, fill="#EEE")
+		return canvas.create_oval(0, 0, 0, 0, width=2, fill="#EEE", tags=tags)
 	else:
-		return canvas.create_rectangle(0, 0, 0, 0, width=2, fill="#EEE")
+		return canvas.create_rectangle(0, 0, 0, 0, width=2, fill="#EEE", tags=tags)
 
 SHAPES = (
 	"Oval",
@@ -114,6 +121,30 @@ GENERATORS = (
 	generate_four_side
 )
 
+@functools.lru_cache(maxsize=CHAIR_CACHE_SIZE)
+def relative_chairs(shape, width, height, capacity):
+	"""Calculates chair positions relative to the top left of a table.
+
+	These only depend on the table's shape, size and capacity,
+	so are cached and moved along with the table"""
+	if capacity <= 0:
+		return ()
+
+	origin = {"x_pos": 0, "y_pos": 0, "width": width, "height": height, "capacity": capacity}
+	return tuple(GENERATORS[shape](origin))
+
+metrics.gauge("cache.relative_chairs", lambda: relative_chairs.cache_info().currsize)
+
 def generate_chairs(table):
-	if table["capacity"] > 0:
-		yield from GENERATORS[table["shape"]](table)
+	x, y = table["x_pos"], table["y_pos"]
+	for dx, dy in relative_chairs(table["shape"], table["width"], table["height"], table["capacity"]):
+		yield (x + dx, y + dy)
+
+def floor_chairs(tables):
+	"""Calculates the chair positions for every given table at once, limiting
+	each to the chairs that fit. Gives a list of (x, y) points per table.
+
+	The layouts are cached, so each table's only need moving into place"""
+	return [[(table["x_pos"] + dx, table["y_pos"] + dy) for dx, dy in relative_chairs(table["shape"],
+			table["width"], table["height"], min(table["capacity"], max_chairs(table)))]
+		for table in tables]
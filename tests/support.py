@@ -0,0 +1,18 @@
+"""Helpers shared by the tests"""
+import os, sys, tempfile, unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import repository, data
+from constants import *
+
+class DatabaseTest(unittest.TestCase):
+	"""Runs each test against a newly migrated database in a temporary directory"""
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.database = repository.DATABASE
+		repository.DATABASE = os.path.join(self.directory.name, DATABASE)
+		data.migrate()
+
+	def tearDown(self):
+		repository.close()
+		repository.DATABASE = self.database
+		self.directory.cleanup()
@@ -0,0 +1,54 @@
+"""Checks archiving bookings, and that their IDs are never handed out again"""
+import unittest, threading, sqlite3
+import support, data, maintenance
+from constants import *
+
+def booking(arrival):
+	return {"customer": "Test", "table_id": 1, "arrival": arrival, "party_size": 2, "duration": DEFAULT_DURATION}
+
+class ArchiveTest(support.DatabaseTest):
+	def test_archives_old_bookings(self):
+		old = data.booking_db.add(booking(100))
+		data.booking_db.set_status(old, COMPLETED)
+		new = data.booking_db.add(booking(10000))
+
+		self.assertEqual(data.booking_db.archive(5000, 20000), [old])
+		self.assertEqual([row[0] for row in data.booking_db.list(0)], [new])
+		self.assertEqual(data.booking_db.find(old)[0], old)
+		self.assertEqual([row[0] for row in data.booking_db.history(1, 0, 5000)], [old])
+
+	def test_ids_are_not_reused(self):
+		"""Archiving the newest booking used to let the next one take its ID,
+		which then could never be archived"""
+		first = data.booking_db.add(booking(100))
+		self.assertEqual(data.booking_db.archive(5000, 20000), [first])
+
+		second = data.booking_db.add(booking(200))
+		self.assertNotEqual(second, first)
+		self.assertEqual(data.booking_db.archive(5000, 20000), [second])
+		self.assertEqual(data.booking_db.find(first)[4], 100)
+		self.assertEqual(data.booking_db.find(second)[4], 200)
+
+class Widget:
+	"""Stands in for a tkinter widget, never running what is scheduled"""
+	def after(self, delay, callback):
+		return None
+
+class MaintenanceTest(unittest.TestCase):
+	def test_reports_repeated_failures_once(self):
+		errors = []
+		job = maintenance.Maintenance(Widget(), None, errors.append)
+		job.thread = threading.Thread(target=lambda: None)
+		job.thread.start()
+		job.thread.join()
+
+		for run in range(MAINTENANCE_FAILURES * 2):
+			job.error = sqlite3.IntegrityError("run {}".format(run))
+			job.poll()
+		self.assertEqual([str(error) for error in errors], ["run {}".format(MAINTENANCE_FAILURES - 1)])
+
+		job.poll() # Works again
+		self.assertEqual(job.failures, 0)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,64 @@
+"""Checks passwords are checked and upgraded, and that failures reach the user"""
+import unittest, unittest.mock, concurrent.futures, sqlite3
+import support, repository, data, login
+from constants import *
+
+class PasswordTest(support.DatabaseTest):
+	def setUp(self):
+		support.DatabaseTest.setUp(self)
+		salt = data.gen_salt()
+		connection = repository.connection()
+		connection.execute("INSERT INTO staff (member_id, first_name, password, salt, kdf) " \
+			"VALUES (1, 'Sam', ?, ?, 'sha256');", (data.hash("secret", salt, "sha256"), salt))
+		connection.commit()
+		data.writer.start()
+
+	def tearDown(self):
+		data.writer.stop()
+		support.DatabaseTest.tearDown(self)
+
+	def test_old_passwords_are_upgraded(self):
+		self.assertFalse(login.can_login(1, "wrong"))
+		self.assertEqual(data.staff_db.get_login(1)[2], "sha256")
+
+		self.assertTrue(login.can_login(1, "secret"))
+		data.writer.flush()
+		self.assertEqual(data.staff_db.get_login(1)[2], PASSWORD_KDF)
+		self.assertTrue(login.can_login(1, "secret"))
+
+	def test_unknown_members(self):
+		self.assertFalse(login.can_login(2, "secret"))
+
+class Entry:
+	def __init__(self, text):
+		self.text = text
+
+	def delete(self, first, last=None):
+		self.text = ""
+
+class Form:
+	"""Stands in for a LoginForm, without a display"""
+	def __init__(self):
+		self.checking = True
+		self.name = Entry("Sam")
+		self.password = Entry("secret")
+		self.callback = unittest.mock.Mock()
+
+class WaitTest(unittest.TestCase):
+	def test_failed_checks_are_reported(self):
+		"""An error checking the password used to escape into tkinter,
+		leaving the password typed in"""
+		future = concurrent.futures.Future()
+		future.set_exception(sqlite3.OperationalError("database is locked"))
+		form = Form()
+
+		with unittest.mock.patch("tkinter.messagebox.showerror") as showerror:
+			login.LoginForm.wait(form, future, {"first_name": "Sam", "last_name": ""})
+		showerror.assert_called_once()
+		self.assertIn("database is locked", showerror.call_args[0][1])
+		self.assertEqual(form.password.text, "")
+		self.assertFalse(form.checking)
+		form.callback.assert_not_called()
+
+if __name__ == "__main__":
+	unittest.main()
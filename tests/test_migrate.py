@@ -0,0 +1,53 @@
+"""Checks the database is brought up to date from any earlier version"""
+import unittest, os, shutil, tempfile
+import support, repository, data
+from constants import *
+
+class MigrateTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.database = repository.DATABASE
+		self.migrations = data.MIGRATIONS
+		repository.DATABASE = os.path.join(self.directory.name, DATABASE)
+
+	def tearDown(self):
+		repository.close()
+		repository.DATABASE = self.database
+		data.MIGRATIONS = self.migrations
+		self.directory.cleanup()
+
+	def version(self):
+		return repository.connection().execute("PRAGMA user_version;").fetchone()[0]
+
+	def test_new_database(self):
+		latest = max(int(name.split("_")[0]) for name in os.listdir(data.MIGRATIONS) if name.endswith(".sql"))
+		data.migrate()
+		self.assertEqual(self.version(), latest)
+
+		data.migrate() # Nothing left to do
+		self.assertEqual(self.version(), latest)
+
+	def test_upgrade_keeps_rows(self):
+		# Set up a database as it was before party sizes were added
+		data.MIGRATIONS = os.path.join(self.directory.name, "migrations")
+		os.mkdir(data.MIGRATIONS)
+		for name in sorted(os.listdir(self.migrations)):
+			if name.endswith(".sql") and int(name.split("_")[0]) < 6:
+				shutil.copy(os.path.join(self.migrations, name), data.MIGRATIONS)
+		data.migrate()
+		self.assertEqual(self.version(), 5)
+
+		connection = repository.connection()
+		connection.execute("INSERT INTO booking (booking_id, customer, table_id, arrival) VALUES (3, 'Old', 1, 100);")
+		connection.commit()
+
+		data.MIGRATIONS = self.migrations
+		data.migrate()
+		self.assertEqual(connection.execute("SELECT booking_id, customer, arrival, party_size FROM booking;").fetchall(),
+			[(3, "Old", 100, 1)])
+		# Later bookings carry on from the highest ID
+		self.assertEqual(data.booking_db.add({"customer": "New", "table_id": 1, "arrival": 200,
+			"party_size": 2, "duration": DEFAULT_DURATION}), 4)
+
+if __name__ == "__main__":
+	unittest.main()
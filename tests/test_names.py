@@ -0,0 +1,78 @@
+"""Checks looking members up by name, and their display names"""
+import random, unittest
+import support, names, records
+
+FIRST_NAMES = ["Sam", "Samuel", "Samantha", "Jo", "Joanna", "Alex"]
+LAST_NAMES = ["Smith", "Smithson", "Jones", "Johnson", "Brown", ""]
+
+class NameIndexTest(unittest.TestCase):
+	def setUp(self):
+		self.rng = random.Random(1)
+		self.members = {}
+		self.ranks = {} # Who was indexed first wins ties
+		self.index = names.NameIndex()
+
+	def member(self, member_id):
+		return records.Member(member_id=member_id, first_name=self.rng.choice(FIRST_NAMES),
+			last_name=self.rng.choice(LAST_NAMES))
+
+	def expected(self, name):
+		"""The member sharing the longest prefix, found by looking at everyone"""
+		name = name.lower()
+		best = max(((names.common_prefix(name, self.index.full_name(member)), -self.ranks[id], id)
+			for id, member in self.members.items()), default=(0, 0, -1))
+		return best[2] if best[0] else -1
+
+	def test_find(self):
+		for id in range(30):
+			self.members[id] = self.member(id)
+			self.ranks[id] = id
+		self.index.rebuild(self.members)
+
+		for step in range(300):
+			id = self.rng.choice(list(self.members))
+			if step % 3 == 0: # Renamed, keeping their place in ties
+				self.members[id] = self.member(id)
+				self.index.update(self.members[id])
+			elif step % 3 == 1: # Deleted and a new member added
+				self.index.remove(id)
+				del self.members[id]
+				new = 100 + step
+				self.members[new] = self.member(new)
+				self.ranks[new] = new
+				self.index.add(self.members[new])
+
+			typed = self.rng.choice(FIRST_NAMES + ["zz", "S", "jo", "Sam Sm", "alex b"])
+			self.assertEqual(self.index.find(typed), self.expected(typed), typed)
+
+	def test_candidates(self):
+		for id, (first, last) in enumerate((("Sam", "Smith"), ("Sam", "Jones"), ("Samuel", "Brown"), ("Jo", "Smith"))):
+			self.members[id] = records.Member(member_id=id, first_name=first, last_name=last)
+		self.index.rebuild(self.members)
+
+		self.assertEqual(self.index.candidates("sam"), [1, 0, 2])
+		self.assertEqual(self.index.candidates("sam", limit=1), [1])
+		self.assertEqual(self.index.candidates("x"), [])
+
+class DisplayNamesTest(unittest.TestCase):
+	def test_shortest_distinct_names(self):
+		members = {id: records.Member(member_id=id, first_name=first, last_name=last) for id, first, last in (
+			(1, "Sam", "Smith"), (2, "Sam", "Smithson"), (3, "Sam", "Jones"), (4, "Jo", "Smith"), (5, "Jo", "Smith"))}
+		display = names.DisplayNames()
+		display.rebuild(members)
+
+		self.assertEqual([display[id] for id in range(1, 6)],
+			["Sam Smith 1", "Sam Smiths", "Sam J", "Jo Smith 4", "Jo Smith 5"])
+
+		members[3]["first_name"] = "Alex" # Renamed out of the group
+		display.update(members[3])
+		self.assertEqual(display[3], "Alex")
+		self.assertEqual(display[1], "Sam Smith 1") # Still a prefix of Smithson
+
+		display.remove(2)
+		self.assertEqual(display[1], "Sam")
+		self.assertNotIn(2, display)
+		self.assertEqual(display.compute(records.Member(member_id=6, first_name="Sam", last_name="Sims")), "Sam Si")
+
+if __name__ == "__main__":
+	unittest.main()
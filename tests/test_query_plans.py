@@ -0,0 +1,65 @@
+"""Checks the booking queries which run most often are answered from
+the indexes added in migrations/0002_booking_indexes.sql.
+
+Run from the repository root with:
+python -m pytest tests"""
+import random, unittest
+import support, repository
+from constants import *
+
+# Enough rows for the planner to prefer an index, once they are analyzed
+ROWS = 2000
+
+class QueryPlanTest(support.DatabaseTest):
+	def setUp(self):
+		support.DatabaseTest.setUp(self)
+
+		rng = random.Random(1)
+		rows = [(i + 1, str(i), rng.randint(1, 50), i * 60, rng.randrange(len(STATUSES)), 2, DEFAULT_DURATION)
+			for i in range(ROWS)]
+		connection = repository.connection()
+		connection.executemany("INSERT INTO booking " \
+			"(booking_id, customer, table_id, arrival, status, party_size, duration) " \
+			"VALUES (?, ?, ?, ?, ?, ?, ?);", rows)
+		connection.executemany("INSERT INTO booking_history " \
+			"(booking_id, customer, table_id, arrival, status, party_size, duration, archived) " \
+			"VALUES (?, ?, ?, ?, ?, ?, ?, 0);", rows)
+		connection.execute("ANALYZE;")
+		connection.commit()
+
+	def plan(self, statement, args):
+		"""Gives the details of each step of a statement's query plan"""
+		return [row[3] for row in repository.connection().execute("EXPLAIN QUERY PLAN " + statement, args)]
+
+	def assertUses(self, plan, *indexes):
+		"""Checks the plan uses one of the indexes and never scans the table"""
+		self.assertFalse([step for step in plan if step.startswith("SCAN")], plan)
+		self.assertTrue([step for step in plan if any("USING INDEX " + index in step for index in indexes)], plan)
+
+	def plans(self):
+		B = repository.BookingRepository
+		return [self.plan(B.LIST, (ROWS * 30, ARRIVED, PAYING)), self.plan(B.HISTORY, (3, 0, ROWS * 30)),
+			self.plan(B.LIST_ARCHIVABLE, (ROWS * 30, EMPTY, COMPLETED))]
+
+	def test_list(self):
+		plan = self.plan(repository.BookingRepository.LIST, (ROWS * 30, ARRIVED, PAYING))
+		self.assertUses(plan, "booking_arrival")
+		self.assertUses(plan, "booking_status")
+
+	def test_history(self):
+		plan = self.plan(repository.BookingRepository.HISTORY, (3, 0, ROWS * 30))
+		self.assertUses(plan, "booking_history_table_arrival")
+
+	def test_list_archivable(self):
+		plan = self.plan(repository.BookingRepository.LIST_ARCHIVABLE, (ROWS * 30, EMPTY, COMPLETED))
+		self.assertUses(plan, "booking_arrival", "booking_status")
+
+	def test_every_index_is_used(self):
+		"""Indexes which no query uses only slow down writes"""
+		indexes = {row[0] for row in repository.connection().execute("SELECT name FROM sqlite_master " \
+			"WHERE type='index' AND tbl_name IN ('booking', 'booking_history') AND sql IS NOT NULL;")}
+		steps = " ".join(step for plan in self.plans() for step in plan)
+		self.assertEqual({index for index in indexes if "USING INDEX " + index + " " not in steps}, set())
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,85 @@
+"""Checks bookings are handed on once they are due, and only while current"""
+import unittest, datetime
+import support, data, scheduler, records
+from constants import *
+
+class Widget:
+	"""Records the timer set instead of running it"""
+	def __init__(self):
+		self.timers = {} # Delays in milliseconds
+		self.functions = {}
+		self.count = 0
+
+	def after(self, delay, function):
+		self.count += 1
+		self.timers[self.count] = delay
+		self.functions[self.count] = function
+		return self.count
+
+	def after_cancel(self, timer):
+		del self.timers[timer], self.functions[timer]
+
+	def fire(self):
+		"""Runs the timer as if it were due"""
+		timer, = self.timers
+		function = self.functions[timer]
+		del self.timers[timer], self.functions[timer]
+		function()
+
+class SchedulerTest(unittest.TestCase):
+	def setUp(self):
+		self.bookings = data.bookings
+		data.bookings = {}
+		self.now = datetime.datetime.now().timestamp()
+		self.widget = Widget()
+		self.due = []
+		self.scheduler = scheduler.ArrivalScheduler(self.widget, self.due.extend)
+
+	def tearDown(self):
+		self.scheduler.stop()
+		data.bookings = self.bookings
+
+	def add(self, booking_id, arrival, status=EMPTY):
+		data.bookings[booking_id] = records.Booking(booking_id=booking_id, arrival=arrival, status=status)
+		return data.bookings[booking_id]
+
+	def test_load(self):
+		self.add(1, self.now + ARRIVAL_HORIZON + 600)
+		self.add(2, self.now + ARRIVAL_HORIZON + 60)
+		self.add(3, self.now + ARRIVAL_HORIZON + 30, COMPLETED)
+		self.add(4, self.now) # Already due, so left to assign_due
+		self.scheduler.load(self.now)
+
+		self.assertEqual([entry[1] for entry in sorted(self.scheduler.deadlines)], [2, 1])
+		self.assertEqual(len(self.widget.timers), 1) # Only ever one timer
+		self.assertAlmostEqual(list(self.widget.timers.values())[0], 60000, delta=1000)
+
+	def test_wake(self):
+		moved = self.add(1, self.now + ARRIVAL_HORIZON + 600)
+		completed = self.add(2, self.now + ARRIVAL_HORIZON + 600)
+		self.scheduler.load(self.now)
+
+		moved["arrival"] = self.now + ARRIVAL_HORIZON - 10
+		self.scheduler.push(moved)
+		completed["status"] = COMPLETED
+		late = self.add(3, self.now + ARRIVAL_HORIZON - 5)
+		self.scheduler.push(late)
+		self.widget.fire()
+
+		self.assertEqual(self.due, [moved, late])
+		# Both entries at the old arrival are stale and dropped
+		self.assertEqual(self.scheduler.deadlines, [])
+		self.assertEqual(self.widget.timers, {})
+
+	def test_push_ignores_unknown_bookings(self):
+		self.scheduler.push(records.Booking(booking_id=5, arrival=self.now + ARRIVAL_HORIZON + 60, status=EMPTY))
+		self.assertEqual(self.scheduler.deadlines, [])
+		self.assertEqual(self.widget.timers, {})
+
+	def test_sleep_is_capped(self):
+		self.add(1, self.now + ARRIVAL_HORIZON + 86400)
+		self.scheduler.load(self.now)
+		self.assertEqual(list(self.widget.timers.values()), [scheduler.MAX_SLEEP])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,51 @@
+"""Checks the bookings in the cache and the load of each waiter stay
+in step as bookings are added, served and deleted"""
+import unittest
+import support, repository, data, service
+from constants import *
+
+class ServiceTest(support.DatabaseTest):
+	def setUp(self):
+		support.DatabaseTest.setUp(self)
+		connection = repository.connection()
+		connection.execute("INSERT INTO staff (member_id, first_name, password, salt, present) " \
+			"VALUES (1, 'Sam', '', '', 1);")
+		connection.execute("INSERT INTO layout_table (table_id, table_number, capacity) VALUES (1, '1', 4);")
+		connection.commit()
+		data.init_db()
+
+		self.booking = service.add_booking("Test", 1, service.now() + 600, 2)
+		data.assign_waiter(self.booking, 1)
+
+	def tearDown(self):
+		data.writer.stop()
+		support.DatabaseTest.tearDown(self)
+
+	def test_completing_frees_the_waiter(self):
+		self.assertEqual(data.loads[1], 1)
+		service.set_status(self.booking, COMPLETED)
+		self.assertEqual(data.loads[1], 0)
+		service.set_status(self.booking, ARRIVED) # Reopened
+		self.assertEqual(data.loads[1], 1)
+
+	def test_completing_a_deleted_booking(self):
+		"""A table can still be showing a booking deleted elsewhere,
+		which used to take its waiter's load below zero"""
+		service.delete_booking(self.booking)
+		self.assertEqual(data.loads[1], 0)
+		self.assertNotIn(self.booking["booking_id"], data.bookings)
+
+		service.set_status(self.booking, COMPLETED)
+		service.delete_booking(self.booking)
+		self.assertEqual(data.loads[1], 0)
+		self.assertEqual(data.bookings_between(1), [])
+
+	def test_due_bookings_get_a_waiter(self):
+		other = service.add_booking("Other", 1, service.now() + 7200, 2)
+		service.set_status(self.booking, COMPLETED)
+		service.assign_due(at=other["arrival"])
+		self.assertEqual(other["member_id"], 1)
+		self.assertEqual(data.loads[1], 1)
+
+if __name__ == "__main__":
+	unittest.main()
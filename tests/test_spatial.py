@@ -0,0 +1,66 @@
+"""Checks the grid of tables finds overlaps and free space"""
+import random, unittest
+import support, spatial
+
+def table(table_id, x, y, width=100, height=100):
+	return {"table_id": table_id, "x_pos": x, "y_pos": y, "width": width, "height": height}
+
+class SpatialIndexTest(unittest.TestCase):
+	def setUp(self):
+		self.space = spatial.SpatialIndex()
+
+	def test_overlaps(self):
+		self.space.update(table(1, 0, 0))
+		self.space.update(table(2, 150, 0))  # Chairs overlap the first table's
+		self.space.update(table(3, 1000, 0))
+		self.assertEqual(self.space.overlaps(1), {2})
+		self.assertEqual(self.space.overlaps(3), set())
+
+		self.space.update(table(2, 500, 0)) # Moved away
+		self.assertEqual(self.space.overlaps(1), set())
+		self.space.remove(3)
+		self.assertEqual(self.space.query((900, -100, 1300, 300)), set())
+
+	def test_empty_floor_keeps_position(self):
+		"""The extent of an empty floor is 0, which used to skip the search
+		and move new tables over by the clearance"""
+		self.assertEqual(self.space.free_position(table(1, 41, 41)), (41, 41))
+
+	def test_free_position_is_free(self):
+		rng = random.Random(1)
+		for id in range(100):
+			new = table(id, rng.randrange(0, 2000), rng.randrange(0, 2000))
+			new["x_pos"], new["y_pos"] = self.space.free_position(new)
+			self.assertFalse(self.space.blocked(spatial.table_bounds(new)), id)
+			self.space.update(new)
+
+	def test_stays_in_area(self):
+		area = (0, 0, 1000, 1000)
+		self.space.update(table(1, 100, 100))
+		x, y = self.space.free_position(table(2, 5000, 120), area)
+		self.assertTrue(spatial.contains(area, spatial.table_bounds(table(2, x, y))))
+		self.assertFalse(self.space.blocked(spatial.table_bounds(table(2, x, y))))
+
+	def test_free_positions_match_one_at_a_time(self):
+		"""Placing a batch gives the same positions as placing each in turn,
+		including once the area is full"""
+		area = (0, 0, 1200, 800)
+		rng = random.Random(2)
+		lost = [table(100 + i, rng.randint(-3000, 5000), rng.randint(-3000, 5000),
+			rng.choice((60, 100)), rng.choice((60, 100))) for i in range(60)]
+
+		one_at_a_time = spatial.SpatialIndex()
+		for other in (self.space, one_at_a_time):
+			for i in range(12):
+				other.update(table(i, 40 + i % 4 * 280, 40 + i // 4 * 250))
+
+		expected = []
+		for new in lost:
+			new = dict(new)
+			new["x_pos"], new["y_pos"] = one_at_a_time.free_position(new, area)
+			one_at_a_time.update(new)
+			expected.append((new["x_pos"], new["y_pos"]))
+		self.assertEqual(self.space.free_positions(lost, area), expected)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,23 @@
+"""Checks chairs are laid out the same one table or a whole floor at a time"""
+import unittest
+import support, tableshapes
+
+class ChairTest(unittest.TestCase):
+	def test_floor_chairs(self):
+		tables = [{"x_pos": x * 300, "y_pos": 50, "width": width, "height": 100, "shape": shape, "capacity": capacity}
+			for x, (shape, width, capacity) in enumerate((
+				(shape, width, capacity) for shape in range(len(tableshapes.SHAPES))
+				for width in (60, 240) for capacity in (2, 8, 40)))]
+		chairs = tableshapes.floor_chairs(tables)
+
+		self.assertEqual(len(chairs), len(tables))
+		for table, points in zip(tables, chairs):
+			fitting = dict(table, capacity=min(table["capacity"], tableshapes.max_chairs(table)))
+			self.assertEqual(points, list(tableshapes.generate_chairs(fitting)))
+			self.assertLessEqual(len(points), table["capacity"])
+
+	def test_no_tables(self):
+		self.assertEqual(tableshapes.floor_chairs([]), [])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,85 @@
+"""Checks the timetable agrees with looking at every booking"""
+import random, unittest
+import support, timetable, records
+from constants import *
+
+class TimetableTest(unittest.TestCase):
+	def setUp(self):
+		self.rng = random.Random(1)
+		self.tables = {id: records.Table(table_id=id, capacity=self.rng.randint(2, 10)) for id in range(1, 21)}
+		self.bookings = {}
+		self.timetable = timetable.Timetable()
+		self.timetable.rebuild_tables(self.tables)
+
+	def add(self, booking_id, table_id, arrival, duration, status=EMPTY):
+		booking = self.bookings[booking_id] = records.Booking(booking_id=booking_id, table_id=table_id,
+			arrival=arrival, duration=duration, status=status)
+		self.timetable.hold(booking)
+		return booking
+
+	def expected(self, party_size, start, end, exclude=None):
+		"""The free tables, found by looking at every booking"""
+		busy = {booking["table_id"] for booking in self.bookings.values() if booking["status"] != COMPLETED
+			and booking["arrival"] < end and booking["arrival"] + booking["duration"] > start
+			and booking["booking_id"] != exclude}
+		return [id for capacity, id in sorted((table["capacity"], id) for id, table in self.tables.items())
+			if capacity >= party_size and id not in busy]
+
+	def test_clashes(self):
+		self.add(1, 1, 1000, 3600)
+		self.assertEqual(self.timetable.clashes(1, 4000, 5000), [1])
+		self.assertEqual(self.timetable.clashes(1, 4600, 5000), []) # Ends as this starts
+		self.assertEqual(self.timetable.clashes(1, 0, 1000), [])
+		self.assertEqual(self.timetable.clashes(1, 0, 2000, exclude=1), [])
+
+	def test_released_bookings_are_free(self):
+		self.add(1, 1, 0, 20000) # Longer than any other
+		self.add(2, 1, 30000, 600)
+		self.timetable.release(1)
+		del self.bookings[1]
+		self.assertEqual(self.timetable.clashes(1, 0, 30000), [])
+		self.assertEqual(self.timetable.clashes(1, 29000, 31000), [2])
+
+	def test_completed_bookings_are_free(self):
+		booking = self.add(1, 1, 0, 3600)
+		booking["status"] = COMPLETED
+		self.timetable.hold(booking)
+		self.assertEqual(self.timetable.clashes(1, 0, 3600), [])
+
+	def test_free_tables(self):
+		"""Random bookings are added, moved and released, and free tables
+		looked for over short times and times covering many slots"""
+		for step in range(3000):
+			if step % 3 or not self.bookings:
+				self.add(step, self.rng.randint(1, 20), self.rng.randint(0, 100000),
+					self.rng.choice((600, 3600, 7200, 20000)), self.rng.choice((EMPTY, EMPTY, COMPLETED)))
+			elif step % 2:
+				booking = self.rng.choice(list(self.bookings.values()))
+				booking["arrival"] = self.rng.randint(0, 100000)
+				self.timetable.hold(booking)
+			else:
+				booking_id = self.rng.choice(list(self.bookings))
+				del self.bookings[booking_id]
+				self.timetable.release(booking_id)
+
+			party_size = self.rng.randint(1, 10)
+			start = self.rng.randint(0, 100000)
+			end = start + self.rng.choice((1, 900, timetable.SLOT_LENGTH, 7200, 30000))
+			exclude = self.rng.choice(list(self.bookings)) if self.bookings and step % 4 == 0 else None
+			self.assertEqual(self.timetable.free_tables(party_size, start, end, exclude),
+				self.expected(party_size, start, end, exclude), step)
+
+	def test_load(self):
+		"""Loading many bookings at once holds them the same as one by one"""
+		for booking_id in range(500):
+			self.add(booking_id, self.rng.randint(1, 20), self.rng.randint(0, 100000), self.rng.choice((600, 7200)))
+		loaded = timetable.Timetable()
+		loaded.rebuild_tables(self.tables)
+		loaded.load([(booking["arrival"], booking["arrival"] + booking["duration"], booking["booking_id"],
+			booking["table_id"]) for booking in self.bookings.values()])
+
+		self.assertEqual(loaded.intervals, self.timetable.intervals)
+		self.assertEqual(loaded.slots, self.timetable.slots)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,48 @@
+"""Checks the least busy present member is always found"""
+import random, unittest
+import support, workload, records
+from constants import *
+
+class WorkloadTest(unittest.TestCase):
+	def test_rebuild(self):
+		members = {id: records.Member(member_id=id, present=id != 3) for id in (1, 2, 3)}
+		bookings = {id: records.Booking(booking_id=id, member_id=member_id, status=status)
+			for id, member_id, status in ((1, 1, EMPTY), (2, 1, ARRIVED), (3, 2, COMPLETED), (4, 9, EMPTY))}
+		loads = workload.WorkloadTracker()
+		loads.rebuild(members, bookings)
+
+		self.assertEqual((loads[1], loads[2], loads[3]), (2, 0, 0))
+		self.assertEqual(loads.least_loaded(), 2) # 3 has no tables, but isn't present
+
+	def test_least_loaded(self):
+		"""Random changes, checked against looking at everyone present"""
+		rng = random.Random(1)
+		loads = workload.WorkloadTracker()
+		present = set()
+		for step in range(2000):
+			member_id = rng.randint(1, 15)
+			action = rng.random()
+			if action < 0.1:
+				loads.add(member_id, True)
+				present.add(member_id)
+			elif action < 0.15:
+				loads.remove(member_id)
+				present.discard(member_id)
+			elif action < 0.3:
+				loads.set_present(member_id, member_id not in present)
+				if member_id in loads.loads:
+					present ^= {member_id}
+			else:
+				loads.change(member_id, rng.choice((1, 1, -1)))
+
+			expected = min(((loads[id], id) for id in present), default=(None, None))[1]
+			self.assertEqual(loads.least_loaded(), expected, step)
+
+	def test_untracked_members_are_ignored(self):
+		loads = workload.WorkloadTracker()
+		loads.change(1, 1)
+		loads.set_present(1, True)
+		self.assertIsNone(loads.least_loaded())
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,54 @@
+"""Checks writes made on the worker thread are saved, and failures reported"""
+import unittest, sqlite3
+import support, repository, writebehind
+
+def insert(name):
+	repository.connection().execute("INSERT INTO written VALUES (?);", (name,))
+	return name
+
+def written():
+	return [row[0] for row in repository.connection().execute("SELECT name FROM written ORDER BY name;")]
+
+class WriteBehindTest(support.DatabaseTest):
+	def setUp(self):
+		support.DatabaseTest.setUp(self)
+		connection = repository.connection()
+		connection.execute("CREATE TABLE written (name TEXT PRIMARY KEY);")
+		connection.commit()
+		self.writer = writebehind.WriteBehind()
+		self.writer.start()
+
+	def tearDown(self):
+		self.writer.stop()
+		support.DatabaseTest.tearDown(self)
+
+	def test_results(self):
+		futures = [self.writer.submit(insert, name) for name in "abc"]
+		self.writer.flush()
+		self.assertEqual([future.result() for future in futures], ["a", "b", "c"])
+		self.assertEqual(written(), ["a", "b", "c"])
+
+	def test_failure_is_reported(self):
+		"""A failing write raises from its future and is kept for the UI,
+		without undoing the writes batched with it"""
+		first = self.writer.submit(insert, "a")
+		failed = self.writer.submit(insert, "a")
+		last = self.writer.submit(insert, "b")
+		self.writer.flush()
+
+		self.assertEqual((first.result(), last.result()), ("a", "b"))
+		self.assertRaises(sqlite3.IntegrityError, failed.result)
+		errors = self.writer.take_errors()
+		self.assertEqual(len(errors), 1)
+		self.assertIsInstance(errors[0], sqlite3.IntegrityError)
+		self.assertEqual(self.writer.take_errors(), [])
+		self.assertEqual(written(), ["a", "b"])
+
+	def test_stop_saves_queued_writes(self):
+		futures = [self.writer.submit(insert, str(i)) for i in range(50)]
+		self.writer.stop()
+		self.assertTrue(all(future.done() for future in futures))
+		self.assertEqual(len(written()), 50)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,156 @@
+import bisect
+from constants import *
+
+# Key the intervals of every table are kept together under, which no table ID can be
+EVERY_TABLE = "*"
+# In seconds, the length of the slots which the tables taken at each time are kept in
+SLOT_LENGTH = 1800
+
+def slots_of(start, end):
+	"""The slots a time from start to end touches"""
+	return range(int(start // SLOT_LENGTH), int(-(-end // SLOT_LENGTH)))
+
+class Timetable:
+	"""Answers which tables are free for a party at a given time.
+
+	The times open bookings take up are kept as sorted (start, end,
+	booking_id, table_id) intervals, for each table and for every table
+	together, along with a bound on the longest booking in each list.
+	Only the few bookings starting shortly before a time then need
+	looking at.
+
+	Which tables are taken at some point in each SLOT_LENGTH slot is
+	also kept, like the cells of spatial.SpatialIndex, so a table taken
+	in a slot wholly inside a time is known to be busy without looking
+	at its bookings. Tables are kept sorted by capacity, so those too
+	small for a party are never looked at"""
+	def __init__(self):
+		self.intervals = {}  # table_id or EVERY_TABLE -> sorted intervals
+		self.longest = {}    # table_id or EVERY_TABLE -> no shorter than any booking held
+		self.held_as = {}    # booking_id -> interval it is held under
+		self.slots = {}      # slot -> {table_id: bookings taking it in the slot}
+		self.capacities = [] # Sorted (capacity, table_id) for every table
+		self.capacity_of = {}
+
+	# Tables
+
+	def rebuild_tables(self, tables):
+		self.capacity_of = {id: table["capacity"] for id, table in tables.items()}
+		self.capacities = sorted((capacity, id) for id, capacity in self.capacity_of.items())
+
+	def set_capacity(self, table):
+		"""Adds a new table, or moves one whose capacity has changed"""
+		if self.capacity_of.get(table["table_id"]) == table["capacity"]: return
+		self.remove_table(table["table_id"])
+
+		self.capacity_of[table["table_id"]] = table["capacity"]
+		bisect.insort(self.capacities, (table["capacity"], table["table_id"]))
+
+	def remove_table(self, table_id):
+		"""Forgets a deleted table. Its bookings stay held, in case they are moved"""
+		if table_id not in self.capacity_of: return
+		key = (self.capacity_of.pop(table_id), table_id)
+		del self.capacities[bisect.bisect_left(self.capacities, key)]
+
+	# Bookings
+
+	def clear_bookings(self):
+		self.intervals.clear()
+		self.longest.clear()
+		self.held_as.clear()
+		self.slots.clear()
+
+	def take(self, interval, amount):
+		"""Counts an interval in, or out of, the slots it touches"""
+		for slot in slots_of(interval[0], interval[1]):
+			tables = self.slots.setdefault(slot, {})
+			tables[interval[3]] = tables.get(interval[3], 0) + amount
+			if not tables[interval[3]]:
+				del tables[interval[3]]
+				if not tables:
+					del self.slots[slot]
+
+	def load(self, intervals):
+		"""Holds many (start, end, booking_id, table_id) intervals of open
+		bookings at once, sorting each list once rather than inserting
+		the bookings one by one"""
+		for interval in intervals:
+			for key in (interval[3], EVERY_TABLE):
+				self.intervals.setdefault(key, []).append(interval)
+				self.longest[key] = max(self.longest.get(key, 0), interval[1] - interval[0])
+			self.held_as[interval[2]] = interval
+			self.take(interval, 1)
+		for intervals in self.intervals.values():
+			intervals.sort()
+
+	def hold(self, booking):
+		"""Takes up the time of an open booking at its table, or moves it
+		if its table, arrival, duration or status have changed"""
+		self.release(booking["booking_id"])
+		if booking["status"] == COMPLETED: return
+
+		interval = (booking["arrival"], booking["arrival"] + booking["duration"],
+			booking["booking_id"], booking["table_id"])
+		for key in (booking["table_id"], EVERY_TABLE):
+			bisect.insort(self.intervals.setdefault(key, []), interval)
+			self.longest[key] = max(self.longest.get(key, 0), booking["duration"])
+		self.held_as[booking["booking_id"]] = interval
+		self.take(interval, 1)
+
+	def release(self, booking_id):
+		"""Frees up the time of a booking, if it was held. The longest
+		duration is left as it is: it only has to be a bound, and working
+		it out again would mean looking at every booking"""
+		if booking_id not in self.held_as: return
+		interval = self.held_as.pop(booking_id)
+		self.take(interval, -1)
+
+		for key in (interval[3], EVERY_TABLE):
+			intervals = self.intervals[key]
+			del intervals[bisect.bisect_left(intervals, interval)]
+
+	# Searching
+
+	def overlapping(self, key, start, end, exclude=None):
+		"""Gives the intervals held under a key overlapping [start, end),
+		other than the excluded booking's"""
+		intervals = self.intervals.get(key)
+		if not intervals:
+			return
+
+		# Nothing starting before this can still be going on at the start
+		high = bisect.bisect_left(intervals, (end, ))
+		for i in range(bisect.bisect_left(intervals, (start - self.longest[key], ), 0, high), high):
+			if intervals[i][1] > start and intervals[i][2] != exclude:
+				yield intervals[i]
+
+	def clashes(self, table_id, start, end, exclude=None):
+		"""Lists the IDs of open bookings at a table overlapping [start, end),
+		other than the excluded one"""
+		return [interval[2] for interval in self.overlapping(table_id, start, end, exclude)]
+
+	def free_tables(self, party_size, start, end, exclude=None):
+		"""Lists the IDs of tables seating at least the party which are free
+		for all of [start, end), ignoring the excluded booking. The smallest
+		tables come first, so big tables are kept for big parties"""
+		inside = range(int(-(-start // SLOT_LENGTH)), int(end // SLOT_LENGTH)) # Slots wholly inside
+		if not inside: # Only a few bookings can overlap so short a time
+			busy = {interval[3] for interval in self.overlapping(EVERY_TABLE, start, end, exclude)}
+		else:
+			busy = set()
+			for slot in inside:
+				busy.update(self.slots.get(slot, ()))
+
+			# Tables only taken in the slots at either end, or only by the
+			# excluded booking, may still be free
+			maybe = set()
+			for slot in set(slots_of(start, end)).difference(inside):
+				maybe.update(self.slots.get(slot, ()))
+			maybe.difference_update(busy)
+			if exclude in self.held_as and self.held_as[exclude][3] in busy:
+				busy.discard(self.held_as[exclude][3])
+				maybe.add(self.held_as[exclude][3])
+			busy.update(table_id for table_id in maybe if self.clashes(table_id, start, end, exclude))
+
+		first = bisect.bisect_left(self.capacities, (party_size, ))
+		return [table_id for capacity, table_id in self.capacities[first:] if table_id not in busy]
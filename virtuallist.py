@@ -0,0 +1,178 @@
+import tkinter, tkinter.font, bisect
+from constants import *
+
+class VirtualList(tkinter.Frame):
+	"""A list of items that only renders the rows which are on screen.
+
+	Rows are kept as an ordered index of (sort key, item ID) pairs, so
+	items can be added, changed and removed without rebuilding the list"""
+	def __init__(self, items, text, sorts, selectcallback, master=None):
+		tkinter.Frame.__init__(self, master)
+		self.items = items   # The cache the IDs refer to, e.g. data.bookings
+		self.text = text     # Gives the text of an item's row
+		self.sorts = sorts   # Sort name -> function giving an item's sort key
+		self.selectcallback = selectcallback
+
+		self.sort = tkinter.StringVar(self, next(iter(sorts)))
+		self.filter = tkinter.StringVar(self)
+
+		self.index = []    # Every item, in sorted order
+		self.key_of = {}   # ID -> the key it is stored under in the index
+		self.rows = []     # The items that pass the filter, in sorted order
+		self.top = 0       # Position in rows of the first row on screen
+		self.count = 1     # How many rows fit on screen
+		self.selected = None
+
+		self.init_widgets()
+
+	def init_widgets(self):
+		"""Initializes the filter box, sort picker and list"""
+		tkinter.Label(self, text="Filter").grid(row=0, column=0, sticky=E)
+		tkinter.Entry(self, textvariable=self.filter).grid(row=0, column=1, sticky=EW)
+		self.filter.trace("w", lambda a, b, c: self.refilter())
+
+		if len(self.sorts) > 1:
+			tkinter.Label(self, text="Sort by").grid(row=1, column=0, sticky=E)
+			tkinter.OptionMenu(self, self.sort, *self.sorts).grid(row=1, column=1, sticky=EW)
+			self.sort.trace("w", lambda a, b, c: self.resort())
+
+		self.listbox = tkinter.Listbox(self, exportselection=False, activestyle="none")
+		self.listbox.grid(row=2, column=0, columnspan=2, sticky=NSEW)
+		self.scrollbar = tkinter.Scrollbar(self, command=self.yview)
+		self.scrollbar.grid(row=2, column=2, sticky=NS)
+
+		self.listbox.bind("<<ListboxSelect>>", self.on_select)
+		self.listbox.bind("<Configure>", self.on_resize)
+		self.listbox.bind("<MouseWheel>", lambda e: self.scroll_to(self.top - e.delta // 120))
+		self.listbox.bind("<Button-4>", lambda e: self.scroll_to(self.top - 1))
+		self.listbox.bind("<Button-5>", lambda e: self.scroll_to(self.top + 1))
+
+		self.linespace = tkinter.font.Font(font=self.listbox["font"]).metrics("linespace") + 1
+
+		self.columnconfigure(1, weight=1)
+		self.rowconfigure(2, weight=1)
+
+	def key(self, id):
+		return (self.sorts[self.sort.get()](self.items[id]), id)
+
+	def matches(self, id):
+		"""Checks whether an item passes the filter box"""
+		return self.filter.get().lower() in self.text(self.items[id]).lower()
+
+	# Changes to the items
+
+	def load(self):
+		"""Rebuilds the index from every item in the cache"""
+		self.key_of = {id: self.key(id) for id in self.items}
+		self.index = sorted(self.key_of.values())
+		self.refilter()
+
+	def insert(self, id):
+		"""Adds a single new item"""
+		self.add_key(id)
+		self.render()
+
+	def remove(self, *ids):
+		"""Removes deleted items"""
+		for id in ids:
+			self.remove_key(id)
+			if self.selected == id:
+				self.selected = None
+		self.render()
+
+	def update(self, id):
+		"""Moves and redraws a single item that has been changed"""
+		self.remove_key(id)
+		self.add_key(id)
+		self.render()
+
+	def refresh(self, ids):
+		"""Brings items in line with the cache after they have been
+		added, changed or deleted elsewhere"""
+		for id in ids:
+			if id in self.key_of:
+				self.remove_key(id)
+			if id in self.items:
+				self.add_key(id)
+			elif self.selected == id:
+				self.selected = None
+		self.render()
+
+	def add_key(self, id):
+		key = self.key_of[id] = self.key(id)
+		bisect.insort(self.index, key)
+		if self.rows is not self.index and self.matches(id):
+			bisect.insort(self.rows, key)
+
+	def remove_key(self, id):
+		key = self.key_of.pop(id)
+		del self.index[bisect.bisect_left(self.index, key)]
+		if self.rows is not self.index:
+			i = bisect.bisect_left(self.rows, key)
+			if i < len(self.rows) and self.rows[i] == key:
+				del self.rows[i]
+
+	def resort(self):
+		"""Reorders every item, after the sort or sort keys change"""
+		self.load()
+
+	def refilter(self):
+		"""Rebuilds the rows to show after the filter changes"""
+		if self.filter.get():
+			self.rows = [key for key in self.index if self.matches(key[1])]
+		else:
+			self.rows = self.index
+		self.top = 0
+		self.render()
+
+	# Displaying and scrolling
+
+	def render(self):
+		"""Redraws the rows which are currently on screen"""
+		self.top = max(min(self.top, len(self.rows) - self.count), 0)
+		shown = self.rows[self.top:self.top + self.count]
+
+		self.listbox.delete(0, END)
+		self.listbox.insert(END, *(self.text(self.items[id]) for key, id in shown))
+
+		for i, (key, id) in enumerate(shown):
+			if id == self.selected:
+				self.listbox.selection_set(i)
+
+		if self.rows:
+			self.scrollbar.set(self.top / len(self.rows), (self.top + len(shown)) / len(self.rows))
+		else:
+			self.scrollbar.set(0, 1)
+
+	def scroll_to(self, top):
+		self.top = top
+		self.render()
+
+	def yview(self, action, amount, unit=None):
+		"""Handles the scrollbar being dragged or clicked"""
+		if action == "moveto":
+			self.scroll_to(int(float(amount) * len(self.rows)))
+		elif unit == "pages":
+			self.scroll_to(self.top + int(amount) * self.count)
+		else:
+			self.scroll_to(self.top + int(amount))
+
+	def on_resize(self, e):
+		count = max(e.height // self.linespace, 1)
+		if count != self.count:
+			self.count = count
+			self.render()
+
+	# Selection
+
+	def on_select(self, e=None):
+		selection = self.listbox.curselection()
+		self.selected = self.rows[self.top + selection[0]][1] if selection else None
+		self.selectcallback(self.selected)
+
+	def select(self, id=None):
+		"""Selects an item, or clears the selection"""
+		self.selected = id
+		self.listbox.selection_clear(0, END)
+		self.render()
+		self.selectcallback(self.selected)
@@ -0,0 +1,97 @@
+from constants import *
+
+class WorkloadTracker:
+	"""Tracks how many tables each member of staff is serving.
+
+	Present members are kept in an indexed min-heap of (load, member_id),
+	so the least busy member can be found without scanning everyone and
+	a member's entry can be moved in place when their load changes"""
+	def __init__(self):
+		self.loads = {}    # member_id -> number of open bookings served
+		self.heap = []     # (load, member_id) for present members only
+		self.position = {} # member_id -> index into heap
+
+	def __getitem__(self, member_id):
+		return self.loads[member_id]
+
+	def rebuild(self, members, bookings):
+		"""Recounts every member's load from the open bookings they are serving"""
+		self.loads = dict.fromkeys(members, 0)
+		for booking in bookings.values():
+			if booking["member_id"] in self.loads and booking["status"] != COMPLETED:
+				self.loads[booking["member_id"]] += 1
+
+		self.heap = [(self.loads[id], id) for id, member in members.items() if member["present"]]
+		self.heap.sort() # A sorted list is already a valid heap
+		self.position = {entry[1]: i for i, entry in enumerate(self.heap)}
+
+	def add(self, member_id, present=False):
+		"""Starts tracking a new member"""
+		self.loads.setdefault(member_id, 0)
+		self.set_present(member_id, present)
+
+	def remove(self, member_id):
+		"""Stops tracking a deleted member"""
+		self.set_present(member_id, False)
+		self.loads.pop(member_id, None)
+
+	def set_present(self, member_id, present):
+		"""Adds or removes a member from the pool that can be assigned tables"""
+		if member_id not in self.loads: return
+
+		if present and member_id not in self.position:
+			self.heap.append((self.loads[member_id], member_id))
+			self.position[member_id] = len(self.heap) - 1
+			self.sift_up(len(self.heap) - 1)
+		elif not present and member_id in self.position:
+			i = self.position.pop(member_id)
+			last = self.heap.pop()
+
+			if i < len(self.heap): # Fill the hole with the last entry
+				self.heap[i] = last
+				self.position[last[1]] = i
+				self.sift_up(i)
+				self.sift_down(self.position[last[1]])
+
+	def change(self, member_id, delta):
+		"""Adjusts a member's load, ignoring members that aren't tracked"""
+		if member_id not in self.loads: return
+		self.loads[member_id] += delta
+
+		if member_id in self.position:
+			i = self.position[member_id]
+			self.heap[i] = (self.loads[member_id], member_id)
+			if delta < 0:
+				self.sift_up(i)
+			else:
+				self.sift_down(i)
+
+	def least_loaded(self):
+		"""Gives the ID of the present member with the fewest tables,
+		preferring lower IDs on a tie, or None if nobody is present"""
+		return self.heap[0][1] if self.heap else None
+
+	def swap(self, i, j):
+		self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+		self.position[self.heap[i][1]] = i
+		self.position[self.heap[j][1]] = j
+
+	def sift_up(self, i):
+		while i > 0:
+			parent = (i - 1) // 2
+			if self.heap[i] >= self.heap[parent]: break
+
+			self.swap(i, parent)
+			i = parent
+
+	def sift_down(self, i):
+		size = len(self.heap)
+		while True:
+			smallest = i
+			for child in (2*i + 1, 2*i + 2):
+				if child < size and self.heap[child] < self.heap[smallest]:
+					smallest = child
+			if smallest == i: break
+
+			self.swap(i, smallest)
+			i = smallest
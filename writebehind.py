@@ -0,0 +1,94 @@
+import repository, sqlite3, threading, queue, concurrent.futures
+from constants import *
+
+class WriteBehind:
+	"""Persists changes to the database on a worker thread.
+
+	Writes are run in the order they were submitted. Any that arrive
+	within WRITE_BATCH_DELAY of each other are committed together in one
+	transaction, so the main thread never waits for the disk"""
+	def __init__(self):
+		self.queue = queue.Queue()
+		self.errors = queue.Queue() # Failed writes, for the UI to report
+		self.thread = None
+
+	def start(self):
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def submit(self, function, *args):
+		"""Queues a repository call, returning a future for its result.
+
+		Only wait on the result when it is needed, e.g. for a new row's ID"""
+		future = concurrent.futures.Future()
+		self.queue.put((function, args, future))
+		return future
+
+	def flush(self):
+		"""Waits until everything submitted so far has been committed"""
+		self.submit(lambda: None).result()
+
+	def stop(self):
+		"""Commits everything still queued and stops the worker"""
+		if self.thread:
+			self.queue.put(None)
+			self.thread.join()
+			self.thread = None
+
+	def take_errors(self):
+		"""Gets the errors from failed writes since this was last called"""
+		errors = []
+		while not self.errors.empty():
+			errors.append(self.errors.get())
+		return errors
+
+	def run(self):
+		running = True
+		while running:
+			batch = [self.queue.get()]
+
+			# Gather up anything else arriving shortly after
+			try:
+				while batch[-1] is not None:
+					batch.append(self.queue.get(timeout=WRITE_BATCH_DELAY))
+			except queue.Empty:
+				pass
+
+			if batch[-1] is None: # Stop once this batch is written
+				batch.pop()
+				running = False
+			self.write(batch)
+
+		repository.close()
+
+	def write(self, batch):
+		"""Runs a batch of writes in a single transaction. Each write gets
+		a savepoint, so one failing doesn't undo the others"""
+		connection = repository.connection()
+		results = []
+
+		repository.local.batch = True # Repositories leave committing to us
+		try:
+			connection.execute("BEGIN;")
+			for function, args, future in batch:
+				connection.execute("SAVEPOINT write;")
+				try:
+					results.append((future, function(*args), None))
+					connection.execute("RELEASE write;")
+				except Exception as error:
+					connection.execute("ROLLBACK TO write;")
+					connection.execute("RELEASE write;")
+					results.append((future, None, error))
+			repository.timed_commit(connection)
+		except sqlite3.Error as error: # The transaction failed, so nothing was saved
+			connection.rollback()
+			results = [(future, None, error) for function, args, future in batch]
+		finally:
+			repository.local.batch = False
+
+		for future, result, error in results:
+			if error:
+				self.errors.put(error)
+				future.set_exception(error)
+			else:
+				future.set_result(result)